@@ -1,14 +1,34 @@
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase
+import asyncio
+import base64
 import json
-from backend_api.config import DB_USER, DB_PASS, URI, DB
+import re
+import zlib
+from backend_api.config import (
+    DB_USER,
+    DB_PASS,
+    URI,
+    DB,
+    COMPANY_SOFT_EXPIRY,
+    COMPANY_HARD_EXPIRY,
+    COMPANY_REFRESH_WORKERS,
+    COMPANY_REFRESH_QUEUE,
+    SENTINEL_ADDRESSES,
+    NEIGHBOURS_PAGE_SIZE,
+)
 import datetime
 
 from .company_information import company_info
+from .metrics import span
+from .refresh_queue import RefreshQueue
+from .single_flight import SingleFlight
 from fastapi.encoders import jsonable_encoder
 import datetime
 import json
 
-driver = GraphDatabase.driver(URI, auth=(DB_USER, DB_PASS))
+driver = AsyncGraphDatabase.driver(URI, auth=(DB_USER, DB_PASS))
+
+company_builds = SingleFlight("company")
 
 
 def make_manager_key(m):
@@ -41,16 +61,21 @@ def make_address_key(loc) -> str | None:
 
 
 # THIS SHOULD ONLY BE RUN AT THE START!
-def create_indexes():
+async def create_indexes():
     cypher_list = [
         "CREATE CONSTRAINT company_id_unique IF NOT EXISTS FOR (c:Company) REQUIRE c.company_id IS UNIQUE",
         "CREATE CONSTRAINT manager_key_unique IF NOT EXISTS FOR (m:Manager) REQUIRE m.manager_key IS UNIQUE",
         "CREATE CONSTRAINT address_key_unique IF NOT EXISTS FOR (a:Address) REQUIRE a.address_key IS UNIQUE",
+        # Glance properties that queries filter on
+        "CREATE INDEX company_risk_level IF NOT EXISTS FOR (c:Company) ON (c.risk_level)",
+        "CREATE INDEX company_deleted IF NOT EXISTS FOR (c:Company) ON (c.deleted)",
+        "CREATE INDEX company_missing_years IF NOT EXISTS FOR (c:Company) ON (c.missing_years)",
+        "CREATE INDEX company_profit_loss IF NOT EXISTS FOR (c:Company) ON (c.profit_loss)",
     ]
 
-    with driver.session(database=DB) as session:
+    async with driver.session(database=DB) as session:
         for c in cypher_list:
-            session.run(c)
+            await session.run(c)
 
 
 # todo: this is just to confirm functionality, must correct it later
@@ -101,18 +126,119 @@ def get_risk_indicators(data):
     }
 
 
-def GET_COMPANY(company_fnr: str):
-    fromdb = SEARCH_COMPANY(company_fnr)
-    if fromdb:
-        timestamp = fromdb["updated_at"]
-        if timestamp > datetime.datetime.now().timestamp() - 30 * 24 * 60 * 60:
-            return fromdb["data"]
-    data = company_info(company_fnr)
-    CREATE_COMPANY(jsonable_encoder(data))
-    return data
+# The glance is stored as typed node properties, so neo4j can filter and aggregate on them
+GLANCE_PROPERTIES = (
+    "company_name",
+    "deleted",
+    "risk_level",
+    "has_masseverwalter",
+    "last_file",
+    "missing_years",
+    "profit_loss",
+)
+
+
+def glance_properties(data) -> dict:
+    glance = get_risk_indicators(data)
+    risk_indicators = data.get("risk_indicators") or {}
+
+    def typed(value, type):
+        return type(value) if value is not None else None
+
+    # Missing values are set to null, which removes an outdated property
+    return {
+        "company_name": glance["company_name"],
+        "deleted": bool(glance["deleted"]),
+        "risk_level": glance["risk_level"],
+        "has_masseverwalter": bool(risk_indicators.get("has_masseverwalter")),
+        "last_file": typed(glance.get("last_file"), str),
+        "missing_years": typed(glance.get("missing_years"), int),
+        "profit_loss": typed(glance.get("profit_loss"), float),
+    }
+
+
+def encode_payload(data) -> bytes:
+    # The full company is only read by SEARCH_COMPANY, compressed it keeps the node small
+    return zlib.compress(json.dumps(data).encode("utf-8"))
+
+
+def decode_payload(payload: bytes):
+    return json.loads(zlib.decompress(payload))
+
+
+def _is_snapshot(fromdb: dict | None) -> bool:
+    # Nodes loaded by database/builddb.py only have the glance properties, not a full company build
+    return bool(fromdb and fromdb["data"] and "basic_info" in fromdb["data"])
+
+
+def _age(fromdb: dict) -> float:
+    return datetime.datetime.now().timestamp() - (fromdb["updated_at"] or 0)
+
+
+def _flight_key(company_fnr: str) -> str:
+    return re.sub(r"\s+", "", company_fnr.lower())
+
+
+async def _build_company(company_fnr: str, fromdb: dict | None):
+    async def build():
+        # Only filings that are new since the stored snapshot are downloaded
+        data = await company_info(
+            company_fnr, fromdb["data"] if _is_snapshot(fromdb) else None
+        )
+        await CREATE_COMPANY(jsonable_encoder(data))
+        return data
+
+    # Everyone opening the same company meanwhile (or refreshing it) waits for this build
+    return await company_builds.do(_flight_key(company_fnr), build)
+
+
+async def REFRESH_COMPANY(company_fnr: str):
+    fromdb = await SEARCH_COMPANY(company_fnr)
+    # Somebody else may have refreshed it while it was queued
+    if _is_snapshot(fromdb) and _age(fromdb) < COMPANY_SOFT_EXPIRY:
+        return
+    await _build_company(company_fnr, fromdb)
+
+
+company_refreshes = RefreshQueue(
+    "company",
+    REFRESH_COMPANY,
+    workers=COMPANY_REFRESH_WORKERS,
+    max_size=COMPANY_REFRESH_QUEUE,
+)
+
+
+async def GET_COMPANY(company_fnr: str):
+    """
+    Snapshots younger than COMPANY_SOFT_EXPIRY are returned as they are, older ones (up to
+    COMPANY_HARD_EXPIRY) too, but marked stale and refreshed in the background.
+    Only unknown or expired companies are built while the caller waits.
+    """
+    fromdb = await SEARCH_COMPANY(company_fnr)
+    if _is_snapshot(fromdb):
+        age = _age(fromdb)
+        if age < COMPANY_HARD_EXPIRY:
+            stale = age >= COMPANY_SOFT_EXPIRY
+            if stale:
+                company_refreshes.submit(company_fnr)
+            return {
+                **fromdb["data"],
+                "snapshot": {"updated_at": fromdb["updated_at"], "stale": stale},
+            }
+
+    return await _build_company(company_fnr, fromdb)
+
+
+# Companies sharing an address or a manager, sentinel addresses (like builddb's UNKNOWN) connect nothing
+NEIGHBOURS = """
+    -[:LOCATED_AT|HAS_MANAGER]->(shared)<-[:LOCATED_AT|HAS_MANAGER]-(other:Company)
+    WHERE other <> c AND NOT coalesce(shared.address_key, '') IN $sentinels
+"""
+
+NETWORK_RISK_FIELDS = ("connected", "masseverwalter", "high_risk", "medium_risk", "low_risk")
 
 
-def CREATE_COMPANY(data):
+async def CREATE_COMPANY(data):
     # data = company_json["result"]
     # print(data)
     company_id = data["basic_info"]["company_number"]
@@ -121,15 +247,12 @@ def CREATE_COMPANY(data):
 
     addr_key = make_address_key(data["location"])
 
-    glance = json.dumps(get_risk_indicators(data))
-    # print(glance)
-
-    information = json.dumps(data)
     cypher = """
     MERGE (c:Company {company_id: $company_id})
-      SET c.data = $information
-      SET c.glance = $glance
+      SET c += $properties
+      SET c.payload = $payload
       SET c.updated_at = $datetime
+      REMOVE c.data, c.glance
 
     WITH c
     OPTIONAL MATCH (a:Address {address_key: $addr_key})
@@ -147,20 +270,79 @@ def CREATE_COMPANY(data):
     RETURN c
     """
 
-    with driver.session(database=DB) as session:
-        session.run(
-            cypher,
-            company_id=company_id,
-            information=information,
-            addr_key=addr_key,
-            mgr_keys=mgr_keys,
-            glance=glance,
-            datetime=datetime.datetime.today().timestamp(),
-        )
-        # print('created company!')
+    with span("neo4j.CREATE_COMPANY"):
+        async with driver.session(database=DB) as session:
+            await session.run(
+                cypher,
+                company_id=company_id,
+                properties=glance_properties(data),
+                payload=encode_payload(data),
+                addr_key=addr_key,
+                mgr_keys=mgr_keys,
+                datetime=datetime.datetime.today().timestamp(),
+            )
+            # print('created company!')
+
+            # The risk (or the connections) of this company changed, so did the network of its neighbours
+            await session.run(
+                f"""
+                MATCH (c:Company {{company_id: $company_id}}){NEIGHBOURS}
+                SET other.network_stale = true
+                """,
+                company_id=company_id,
+                sentinels=SENTINEL_ADDRESSES,
+            )
+
+    await UPDATE_NETWORK_RISK(company_id)
+
+
+async def UPDATE_NETWORK_RISK(company_id: str) -> dict | None:
+    """
+    Counts the neighbours by their stored risk fields and keeps the result on the company
+    """
+    cypher = f"""
+    MATCH (c:Company {{company_id: $company_id}})
+    OPTIONAL MATCH (c){NEIGHBOURS}
+    WITH c, collect(DISTINCT other) AS others
+    SET c.network_connected = size(others),
+        c.network_masseverwalter = size([o IN others WHERE o.has_masseverwalter]),
+        c.network_high_risk = size([o IN others WHERE o.risk_level = 'H']),
+        c.network_medium_risk = size([o IN others WHERE o.risk_level = 'M']),
+        c.network_low_risk = size([o IN others WHERE o.risk_level = 'L']),
+        c.network_stale = false
+    RETURN {", ".join(f"c.network_{field} AS {field}" for field in NETWORK_RISK_FIELDS)}
+    """
 
+    with span("neo4j.UPDATE_NETWORK_RISK"):
+        async with driver.session(database=DB) as session:
+            result = await (
+                await session.run(cypher, company_id=company_id, sentinels=SENTINEL_ADDRESSES)
+            ).single()
+    return dict(result) if result else None
 
-def SEARCH_COMPANY(company_id):
+
+async def GET_NETWORK_RISK(company_id: str) -> dict | None:
+    """
+    Network risk statistics of a company, only recounted when a neighbour changed since
+    """
+    cypher = f"""
+    MATCH (c:Company {{company_id: $company_id}})
+    RETURN c.network_stale AS stale,
+           {", ".join(f"c.network_{field} AS {field}" for field in NETWORK_RISK_FIELDS)}
+    """
+
+    with span("neo4j.GET_NETWORK_RISK"):
+        async with driver.session(database=DB) as session:
+            result = await (await session.run(cypher, company_id=company_id)).single()
+
+    if result is None:
+        return None
+    if result["stale"] is not False:
+        return await UPDATE_NETWORK_RISK(company_id)
+    return {field: result[field] for field in NETWORK_RISK_FIELDS}
+
+
+async def SEARCH_COMPANY(company_id):
 
     # print(company_id)
     company_id = company_id[:-1] + " " + company_id[-1]
@@ -170,78 +352,358 @@ def SEARCH_COMPANY(company_id):
     #   all_companies = session.run("MATCH (c:Company) RETURN c.company_id AS id").values()
     #  print(f"All company IDs in DB: {all_companies}")
 
+    # Only what GET_COMPANY needs, c.data is the JSON of nodes written before the payload
     cypher = """
     MATCH (c:Company {company_id: $company_id})
-    RETURN c AS data
+    RETURN c.payload AS payload, c.data AS data, c.updated_at AS updated_at
     """
 
-    with driver.session(database=DB) as session:
-        result = session.run(cypher, company_id=company_id).single()
-        # print(result)
+    with span("neo4j.SEARCH_COMPANY"):
+        async with driver.session(database=DB) as session:
+            result = await (await session.run(cypher, company_id=company_id)).single()
+            # print(result)
 
-        if result:
-            node = result["data"]
-            data_dict = dict(node)
+            if result:
+                if result["payload"] is not None:
+                    data = decode_payload(result["payload"])
+                else:
+                    data = json.loads(result["data"]) if result["data"] else None
+                return {"data": data, "updated_at": result["updated_at"]}
+            return None
 
-            data_dict["data"] = (
-                json.loads(data_dict["data"]) if "data" in data_dict else None
-            )
-            data_dict["updated_at"] = data_dict.get("updated_at")
-            return data_dict
-        return None
+
+async def GET_COMPANY_NAMES():
+    """
+    Name, location and status of every stored company, for the typeahead index
+    """
+    cypher = """
+    MATCH (c:Company)
+    OPTIONAL MATCH (c)-[:LOCATED_AT]->(a:Address)
+    WITH c, head(collect(a.address_key)) AS location
+    RETURN c.company_id AS fnr, c.company_name AS name, location,
+           CASE WHEN c.deleted THEN 'deleted' ELSE 'active' END AS status
+    """
+
+    with span("neo4j.GET_COMPANY_NAMES"):
+        async with driver.session(database=DB) as session:
+            return await (await session.run(cypher)).data()
 
 
-def GET_NEIGHBOURS(node_id, label):
+NODE_KEYS = {
+    "Company": "company_id",
+    "Address": "address_key",
+    "Manager": "manager_key",
+}
+
+# What a subgraph returns of a company, the payload stays in the database
+COMPANY_PROJECTION = ".company_id, .company_name, .deleted, .risk_level, .last_file, .missing_years, .profit_loss"
+
+
+async def GET_DEGREE(node_id: str, label: str) -> int | None:
+    """
+    Number of relationships of a node, read from the node's degree without expanding them
+    """
+    cypher = f"""
+    MATCH (n:{label} {{{NODE_KEYS[label]}: $node_id}})
+    RETURN COUNT {{ (n)--() }} AS degree
+    """
+
+    with span("neo4j.GET_DEGREE"):
+        async with driver.session(database=DB) as session:
+            result = await (await session.run(cypher, node_id=node_id)).single()
+    return result["degree"] if result else None
+
+
+def encode_cursor(rank: int, element_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([rank, element_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[int, str]:
+    try:
+        rank, element_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(rank), str(element_id)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+
+
+async def GET_NEIGHBOURS(
+    node_id,
+    label,
+    limit: int = NEIGHBOURS_PAGE_SIZE,
+    cursor: str | None = None,
+    order: str | None = None,
+    include_sentinels: bool = False,
+):
     """
     label: Company
     node_id: FNR
+
+    One page of the neighbours of a node, the degree is counted first:
+    order "id" pages in storage order, "risk" puts high risk companies first,
+    "sample" returns a random selection (no further pages).
+    Without an order, nodes with more than one page of neighbours are ranked by risk.
+    Sentinel nodes (SENTINEL_ADDRESSES) are left out unless include_sentinels.
+
+    {neighbours: [{result: ...}], degree, order, next_cursor}
     """
-    # print(label, node_id)
-    # todo
-    node_type = {
-        "Company": "company_id",
-        "Address": "address_key",
-        "Manager": "manager_key",
-    }
+    sentinels = [] if include_sentinels else SENTINEL_ADDRESSES
+    if label == "Address" and node_id in sentinels:
+        return {"neighbours": [], "degree": 0, "order": order, "next_cursor": None}
+
+    degree = await GET_DEGREE(node_id, label)
+    if degree is None:
+        return {"neighbours": [], "degree": 0, "order": order, "next_cursor": None}
+    if order is None:
+        order = "risk" if degree > limit else "id"
+
+    rank, after = decode_cursor(cursor) if cursor else (-1, "")
+    sort = "ORDER BY rand()" if order == "sample" else "ORDER BY rank, id"
 
     cypher = f"""
-        MATCH (n:{label} {{{node_type[label]}: $node_id}})--(connected)
+        MATCH (n:{label} {{{NODE_KEYS[label]}: $node_id}})--(connected)
+        WHERE NOT coalesce(connected.address_key, '') IN $sentinels
+        WITH DISTINCT connected
+        WITH connected, elementId(connected) AS id,
+             CASE WHEN $by_risk THEN
+                 CASE connected.risk_level WHEN 'H' THEN 0 WHEN 'M' THEN 1 WHEN 'L' THEN 2 ELSE 3 END
+             ELSE 0 END AS rank
+        WHERE rank > $rank OR (rank = $rank AND id > $after)
 
         RETURN
         CASE
-             WHEN 'Company' IN labels(connected) THEN connected.glance
+             WHEN 'Company' IN labels(connected)
+             THEN connected {{{COMPANY_PROJECTION}}}
              ELSE connected
-             END AS result
+             END AS result,
+        rank, id
+        {sort}
+        LIMIT $limit
         """
 
-    with driver.session(database=DB) as session:
-        result = session.run(cypher, node_id=node_id).data()
-        print(result)
-        return result
+    with span("neo4j.GET_NEIGHBOURS"):
+        async with driver.session(database=DB) as session:
+            rows = await (
+                await session.run(
+                    cypher,
+                    node_id=node_id,
+                    sentinels=sentinels,
+                    by_risk=order == "risk",
+                    rank=rank,
+                    after=after,
+                    # One more than asked tells if there is a next page
+                    limit=limit + 1,
+                )
+            ).data()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if order != "sample":
+            next_cursor = encode_cursor(rows[-1]["rank"], rows[-1]["id"])
+
+    return {
+        "neighbours": [{"result": row["result"]} for row in rows],
+        "degree": degree,
+        "order": order,
+        "next_cursor": next_cursor,
+    }
 
 
-def GET_ADJ(node_id):
+async def GET_SUBGRAPH(
+    node_id: str,
+    label: str,
+    depth: int,
+    limit: int,
+    fanout: int,
+    labels: list[str],
+) -> dict:
+    """
+    Nodes up to depth hops away from a node and the edges between them, in one query.
+    Every node contributes at most fanout neighbours to the next hop and the whole subgraph
+    has at most limit nodes (closer hops first). labels restricts the nodes that are added.
+
+    {nodes: [{id: "Company:583360 h", type, key, properties}], edges: [{from, to, type}]}
+    """
+    # The subquery only aggregates, so it returns one row even for an empty frontier.
+    # seen is applied outside of it: an aggregate mixed with a variable that isn't
+    # grouped by is rejected by Neo4j 5
+    hop = """
+    CALL {
+        WITH frontier
+        UNWIND frontier AS n
+        CALL {
+            WITH n
+            MATCH (n)-[r]-(m)
+            WHERE any(l IN labels(m) WHERE l IN $labels)
+              AND NOT coalesce(m.address_key, '') IN $sentinels
+            RETURN r, m
+            LIMIT $fanout
+        }
+        RETURN collect(r) AS hop_rels, collect(DISTINCT m) AS hop_nodes
+    }
+    WITH seen, rels + hop_rels AS rels, [x IN hop_nodes WHERE NOT x IN seen] AS hop_nodes
+    WITH seen, rels, hop_nodes[..$limit - size(seen)] AS frontier
+    WITH seen + frontier AS seen, rels, frontier
+    """
+
+    cypher = f"""
+    MATCH (start:{label} {{{NODE_KEYS[label]}: $node_id}})
+    WITH [start] AS frontier, [start] AS seen, [] AS rels
+    {hop * depth}
+    RETURN
+        [n IN seen | {{
+            element_id: elementId(n),
+            type: labels(n)[0],
+            properties: CASE WHEN n:Company THEN n {{{COMPANY_PROJECTION}}} ELSE properties(n) END
+        }}] AS nodes,
+        [r IN rels WHERE startNode(r) IN seen AND endNode(r) IN seen | {{
+            from: elementId(startNode(r)), to: elementId(endNode(r)), type: type(r)
+        }}] AS edges
+    """
+
+    with span("neo4j.GET_SUBGRAPH"):
+        async with driver.session(database=DB) as session:
+            result = await (
+                await session.run(
+                    cypher,
+                    node_id=node_id,
+                    labels=labels,
+                    fanout=fanout,
+                    limit=limit,
+                    sentinels=SENTINEL_ADDRESSES,
+                )
+            ).single()
+
+    if result is None:
+        return {"nodes": [], "edges": []}
+
+    # Same node ids as the graph in network.js
+    ids = {}
+    nodes = []
+    for node in result["nodes"]:
+        key = node["properties"].get(NODE_KEYS.get(node["type"], ""))
+        ids[node["element_id"]] = f"{node['type']}:{key}"
+        nodes.append(
+            {
+                "id": ids[node["element_id"]],
+                "type": node["type"],
+                "key": key,
+                "properties": node["properties"],
+            }
+        )
+
+    edges = {}
+    for edge in result["edges"]:
+        edge = {"from": ids[edge["from"]], "to": ids[edge["to"]], "type": edge["type"]}
+        edges[(edge["from"], edge["to"], edge["type"])] = edge
+
+    return {"nodes": nodes, "edges": list(edges.values())}
+
+
+async def GET_EDGES() -> list[tuple[str, str]]:
+    """
+    Every Company-Manager/Address relationship as ("Company:fnr", "Label:key") pairs,
+    for the in-memory graph projection. Sentinel addresses are left out.
+    """
+    cypher = """
+    MATCH (c:Company)-[:LOCATED_AT|HAS_MANAGER]->(x)
+    WHERE NOT coalesce(x.address_key, '') IN $sentinels
+    RETURN c.company_id AS company, labels(x)[0] AS label,
+           coalesce(x.address_key, x.manager_key) AS key
+    """
+
+    edges = []
+    with span("neo4j.GET_EDGES"):
+        async with driver.session(database=DB) as session:
+            result = await session.run(cypher, sentinels=SENTINEL_ADDRESSES)
+            # Streamed, the full register doesn't fit in one list of records comfortably
+            async for record in result:
+                edges.append((f"Company:{record['company']}", f"{record['label']}:{record['key']}"))
+    return edges
+
+
+async def GET_ADJ(node_id):
     cypher = """
     MATCH (c:Company {company_id: $node_id})
-          -[:LOCATED_AT|HAS_MANAGER]->()
+          -[:LOCATED_AT|HAS_MANAGER]->(shared)
           <-[:LOCATED_AT|HAS_MANAGER]-(other:Company)
-    WHERE c <> other
-    RETURN DISTINCT other
+    WHERE c <> other AND NOT coalesce(shared.address_key, '') IN $sentinels
+    RETURN DISTINCT other {.company_id, .company_name, .risk_level} AS other
     """
 
-    with driver.session(database=DB) as session:
-        result = session.run(cypher, node_id=node_id).data()
-        return result
+    with span("neo4j.GET_ADJ"):
+        async with driver.session(database=DB) as session:
+            result = await (
+                await session.run(cypher, node_id=node_id, sentinels=SENTINEL_ADDRESSES)
+            ).data()
+            return result
 
 
-if __name__ == "__main__":
-    driver.verify_connectivity()
-    # create_indexes()
+async def MIGRATE_COMPANY_PROPERTIES(batch_size: int = 1000):
+    """
+    Moves nodes written before the typed glance properties (c.data and c.glance JSON strings)
+    to the current format. Safe to run again, it only touches nodes that still have c.glance or c.data.
+    """
+    read = """
+    MATCH (c:Company) WHERE c.glance IS NOT NULL OR c.data IS NOT NULL
+    RETURN c.company_id AS company_id, c.data AS data, c.glance AS glance
+    LIMIT $batch_size
+    """
+    write = """
+    UNWIND $rows AS row
+    MATCH (c:Company {company_id: row.company_id})
+    SET c += row.properties, c.payload = row.payload
+    REMOVE c.data, c.glance
+    """
 
-    # SEARCH_COMPANY("583360h")
+    migrated = 0
+    async with driver.session(database=DB) as session:
+        while True:
+            records = await (await session.run(read, batch_size=batch_size)).data()
+            if not records:
+                return migrated
+
+            rows = []
+            for record in records:
+                data = json.loads(record["data"]) if record["data"] else None
+                if data and "basic_info" in data:
+                    properties, payload = glance_properties(data), encode_payload(data)
+                else:
+                    # Written by builddb: only the glance of the bulk export
+                    glance = json.loads(record["glance"]) if record["glance"] else {}
+                    properties = {
+                        key: glance.get(key)
+                        for key in ("company_name", "legal_form", "european_id")
+                    }
+                    payload = None
+                rows.append(
+                    {
+                        "company_id": record["company_id"],
+                        "properties": properties,
+                        "payload": payload,
+                    }
+                )
+
+            await session.run(write, rows=rows)
+            migrated += len(rows)
+            print(f"Migrated {migrated} companies")
+
+
+async def _main():
+    await driver.verify_connectivity()
+    # await create_indexes()
+    # await MIGRATE_COMPANY_PROPERTIES()
+
+    # await SEARCH_COMPANY("583360h")
+
+    print(await GET_NEIGHBOURS("1963-05-06|Gerardus van Loon", "Manager", limit=10))
+
+    async with driver.session(database=DB) as s:
+        res = await (await s.run("MATCH (c:Company) RETURN count(c) AS cnt")).single()
+        print("company count (read check):", res["cnt"])
 
-    print(GET_NEIGHBOURS("1963-05-06|Gerardus van Loon", "Manager"))
+    await driver.close()
 
-    with driver.session(database=DB) as s:
-        res = s.run("MATCH (c:Company) RETURN count(c) AS cnt").single()
-        print("company count (read check):", res["cnt"])
+
+if __name__ == "__main__":
+    asyncio.run(_main())
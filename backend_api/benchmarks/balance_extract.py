@@ -0,0 +1,83 @@
+"""
+Per-document parse time of the balance sheet extraction.
+
+Run: python -m backend_api.benchmarks.balance_extract
+"""
+
+import random
+import timeit
+import xml.etree.ElementTree as ET
+
+from backend_api.company_information import BALANCE_FIELDS, extract_balance, ns
+
+NS = ns["ns0"]
+
+
+def search_balance(balance, term):
+    # The previous implementation: one descendant search per field
+    node = balance.find(f".//ns0:{term}/ns0:POSTENZEILE/ns0:BETRAG", ns)
+    if node is None:
+        return 0.0
+
+    return float(node.text)
+
+
+def legacy_extract(balance):
+    return {
+        field: search_balance(balance, term) for field, term in BALANCE_FIELDS.items()
+    }
+
+
+def add_position(parent, term, rng):
+    position = ET.SubElement(parent, f"{{{NS}}}{term}")
+    line = ET.SubElement(position, f"{{{NS}}}POSTENZEILE")
+    ET.SubElement(line, f"{{{NS}}}BETRAG").text = f"{rng.uniform(-1e6, 1e7):.2f}"
+    ET.SubElement(line, f"{{{NS}}}BETRAG_VJ").text = f"{rng.uniform(-1e6, 1e7):.2f}"
+    return position
+
+
+def make_balance(layout: str, filler: int, seed: int = 0) -> ET.Element:
+    """
+    A balance tree with every field nested like the real reports,
+    plus filler positions (sub items that aren't read) to get to a realistic size.
+    """
+    rng = random.Random(seed)
+    balance = ET.Element(f"{{{NS}}}{layout}")
+
+    # Parents first, so a nested term is a descendant of its shorter prefix
+    parents = {}
+    for term in sorted(BALANCE_FIELDS.values(), key=len):
+        parent = balance
+        for known in sorted(parents, key=len, reverse=True):
+            if term.startswith(known + "_"):
+                parent = parents[known]
+                break
+        parents[term] = add_position(parent, term, rng)
+
+    terms = list(parents)
+    for i in range(filler):
+        add_position(parents[rng.choice(terms)], f"HGB_X_{i}", rng)
+
+    return balance
+
+
+def main():
+    for layout in ("BILANZ", "HGB_Form_2"):
+        for filler in (0, 200, 2000):
+            balance = make_balance(layout, filler)
+            assert legacy_extract(balance) == extract_balance(balance)
+
+            runs = 200
+            legacy = timeit.timeit(lambda: legacy_extract(balance), number=runs) / runs
+            compiled = timeit.timeit(lambda: extract_balance(balance), number=runs) / runs
+
+            print(
+                f"{layout:<11} {filler:>5} filler positions: "
+                f"legacy {legacy * 1e6:8.1f} us/doc, "
+                f"single pass {compiled * 1e6:8.1f} us/doc, "
+                f"{legacy / compiled:4.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
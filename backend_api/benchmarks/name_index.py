@@ -0,0 +1,84 @@
+"""
+Build time and per-query search time of the local name index on generated companies.
+
+Run: python -m backend_api.benchmarks.name_index [companies]
+"""
+
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+
+from backend_api.name_index import NameIndex, NameIndexWriter
+
+TERMS = [
+    "gmbh",
+    "b",
+    "bau gmbh",
+    "gmbh kg",  # common words that are rarely in the same name
+    "mülbau",
+    "bauholdnig",  # misspelled
+    "ba en kg",
+    "zzzz",
+]
+
+
+def generated_companies(count: int, seed: int = 0) -> list[dict]:
+    """
+    Names from a vocabulary with a Zipf distribution plus a legal form,
+    so a few words (and most trigrams) are in a large part of all names, like in the register
+    """
+    rng = random.Random(seed)
+    syllables = "ba bau ber ger hol ding mül ler sig na tra por te in vest im mo bi li en".split()
+    vocabulary = [
+        "".join(rng.choices(syllables, k=rng.randint(2, 4))).capitalize() for _ in range(10000)
+    ]
+    weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(vocabulary))))
+    forms = ["GmbH"] * 6 + ["KG", "AG", "OG", "e.U.", "GmbH & Co KG"]
+    return [
+        {
+            "fnr": f"{i} x",
+            "name": " ".join(
+                rng.choices(vocabulary, cum_weights=weights, k=rng.randint(1, 3))
+                + [rng.choice(forms)]
+            ),
+            "location": "Wien",
+            "status": "deleted" if rng.random() < 0.3 else "active",
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    companies = generated_companies(count)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "name_index.sqlite")
+        start = time.perf_counter()
+        writer = NameIndexWriter(path)
+        for i in range(0, len(companies), 1000):
+            writer.add(companies[i : i + 1000])
+        writer.finish()
+        print(
+            f"{count} companies: built in {time.perf_counter() - start:.1f} s, "
+            f"{os.path.getsize(path) / 1e6:.0f} MB"
+        )
+
+        index = NameIndex(path)
+        for term in TERMS:
+            for limit in (10, 500):
+                results = len(index.search(term, limit))
+                seconds = min(
+                    timeit.repeat(lambda: index.search(term, limit), number=1, repeat=5)
+                )
+                print(
+                    f"{term!r:<14} limit {limit:>3}: {results:>3} results {seconds * 1e3:6.1f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,146 @@
-from zeep import Client
-from zeep.transports import Transport
-from requests import Session
-from .config import API_KEY, WSDL_URL
+import asyncio
+import threading
 
-_session = Session()
-_session.headers.update({'X-API-KEY': f'{API_KEY}', 'Content-Type': 'application/soap+xml;charset=UTF-8'})
-_transport = Transport(session=_session)
-client = Client(wsdl=WSDL_URL, transport=_transport)
-for service in client.wsdl.services.values():
-    for port in service.ports.values():
-        port.binding_options['address'] = "https://justizonline.gv.at/jop/api/at.gv.justiz.fbw/ws"
+import httpx
+from zeep import AsyncClient
+from zeep.transports import AsyncTransport
+from .config import (
+    API_KEY,
+    WSDL_URL,
+    SOAP_POOL_SIZE,
+    SOAP_KEEPALIVE,
+    SOAP_KEEPALIVE_EXPIRY,
+    SOAP_CONNECT_TIMEOUT,
+    SOAP_TIMEOUT,
+)
+from .metrics import span
+
+SERVICE_ADDRESS = "https://justizonline.gv.at/jop/api/at.gv.justiz.fbw/ws"
+HEADERS = {"X-API-KEY": f"{API_KEY}", "Content-Type": "application/soap+xml;charset=UTF-8"}
+
+_client = None
+_loop = None
+_build_lock = threading.Lock()
+
+
+def _build_pool() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=SOAP_POOL_SIZE,
+        max_keepalive_connections=SOAP_KEEPALIVE,
+        keepalive_expiry=SOAP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(SOAP_TIMEOUT, connect=SOAP_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(limits=limits, timeout=timeout, headers=HEADERS)
+
+
+def _build_client() -> AsyncClient:
+    """
+    Build the shared zeep client, once. Loading the WSDL blocks, so it runs in a thread.
+    """
+    global _client
+    with _build_lock:
+        if _client is not None:
+            return _client
+
+        transport = AsyncTransport(
+            client=_build_pool(),
+            wsdl_client=httpx.Client(
+                timeout=httpx.Timeout(SOAP_TIMEOUT, connect=SOAP_CONNECT_TIMEOUT)
+            ),
+        )
+        # AsyncTransport resets the headers of both clients, so they have to be added afterwards
+        transport.client.headers.update(HEADERS)
+        transport.wsdl_client.headers.update(HEADERS)
+
+        client = AsyncClient(wsdl=WSDL_URL, transport=transport)
+        for service in client.wsdl.services.values():
+            for port in service.ports.values():
+                port.binding_options["address"] = SERVICE_ADDRESS
+        _client = client
+        return _client
+
+
+async def _close_pool(pool: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+    # Connections can only be closed on the event loop that opened them
+    if loop.is_running():
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(pool.aclose(), loop))
+        return
+    try:
+        await pool.aclose()
+    except RuntimeError:
+        # That loop is closed already (asyncio.run() returned), its sockets went with it
+        pass
+
+
+async def get_client() -> AsyncClient:
+    """
+    The shared zeep client, the WSDL is loaded off the event loop on first use.
+    Operations run on a pooled httpx.AsyncClient.
+    """
+    global _loop
+    client = _client if _client is not None else await asyncio.to_thread(_build_client)
+
+    # Pooled connections belong to the event loop that opened them (asyncio.run() in scripts and tests)
+    loop = asyncio.get_running_loop()
+    if _loop is not loop:
+        old_loop, _loop = _loop, loop
+        if old_loop is not None:
+            old_pool = client.transport.client
+            client.transport.client = _build_pool()
+            await _close_pool(old_pool, old_loop)
+
+    return client
+
+
+async def start():
+    """
+    Loads the WSDL ahead of the first request, started with the app
+    """
+    try:
+        await get_client()
+    except Exception as e:
+        print(f"Loading the WSDL failed, the first request tries again: {e}")
+
+
+async def call(operation: str, timeout: float | None = None, **params):
+    """
+    Call a SOAP operation, e.g. await call("AUSZUG_V2_", FNR=...).
+    timeout bounds the whole round-trip and defaults to SOAP_TIMEOUT.
+    """
+    service = (await get_client()).service
+    with span(f"soap.{operation}"):
+        return await asyncio.wait_for(
+            getattr(service, operation)(**params), timeout=timeout or SOAP_TIMEOUT
+        )
+
+
+async def gather_limited(coros, limit: int) -> list:
+    """
+    Like asyncio.gather, but with at most limit coroutines in flight.
+    Results keep the order of coros.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return list(await asyncio.gather(*(run(coro) for coro in coros)))
+
+
+async def close():
+    global _client, _loop
+    if _client is None:
+        return
+
+    await _client.transport.aclose()
+    _client.transport.wsdl_client.close()
+    _client = None
+    _loop = None
 
 
 if __name__ == "__main__":
+    client = _build_client()
     for service in client.wsdl.services.values():
         for port in service.ports.values():
             print(f"  Port: {port.name}")
@@ -23,6 +151,3 @@ if __name__ == "__main__":
                 print(f"Input: {operation.input.signature()}")
                 print(f"Output: {operation.output.signature()}")
                 print("-" * 40)
-
-
-
@@ -1,4 +1,12 @@
-from .client import client
+from .client import call, gather_limited
+from .config import SOAP_DOCUMENT_TIMEOUT, DOCUMENT_FANOUT
+from .document_store import document_store
+from .indicators import score_companies
+from .metrics import Counter, span
+
+import asyncio
+import codecs
+import re
 
 import xml.etree.ElementTree as ET
 from xml.dom import minidom
@@ -16,19 +24,30 @@ def json_date(date):
 
 
 #########################LEVEL 1#################################################################
-def company_info(fnr: str):
+async def company_info(fnr: str, previous: dict | None = None):
+    """
+    previous is an earlier result for the same company (a stored snapshot).
+    When given, only balance sheets that were filed since are downloaded.
+    """
     suche_params = {"FNR": fnr, "STICHTAG": date.today(), "UMFANG": "Kurzinformation"}
 
-    info = client.service.AUSZUG_V2_(**suche_params)
-    # print(info)
+    with span("company_info"):
+        # The extract and the document list only depend on the FNR, so both are requested at once
+        info, doc_ids = await asyncio.gather(
+            call("AUSZUG_V2_", **suche_params), get_doc_ids(fnr)
+        )
+        # print(info)
 
-    result = extract_company_data(info)
+        result = await extract_company_data(info, doc_ids, previous)
 
     return result
 
 
-def extract_company_data(info):
+async def extract_company_data(info, doc_ids, previous: dict | None = None):
     """
+    doc_ids is the result of get_doc_ids for the same company,
+    previous an optional earlier result to reuse balance sheets from.
+
     Result has the following structure:
     {
         basic_info: {
@@ -57,6 +76,7 @@ def extract_company_data(info):
         ],
         financial: [
             {
+                document_id: str,
                 submission_date: str(date),
                 fiscal_year: {
                     start: str(date),
@@ -197,11 +217,10 @@ def extract_company_data(info):
     management = extract_management_info(info)
     history = extract_company_history(info)
 
-    pdf_ids, xml_report_ids, total_reports = get_doc_ids(info.FNR)
-    financial = [  # limit to 3 last reports
-        get_xml_data(id) for id in xml_report_ids[-3:]
-    ]
-    calculate_financial_indicators(financial)
+    pdf_ids, xml_report_ids, total_reports = doc_ids
+    financial = await get_financial_years(  # limit to 3 last reports
+        xml_report_ids[-3:], snapshot_financial(previous)
+    )
 
     compliance_indicators, is_deleted = extract_compliance_indicators(
         financial, history, total_reports
@@ -234,146 +253,73 @@ def extract_company_data(info):
     return data
 
 
-def calculate_financial_indicators(financial_years):
+def snapshot_financial(previous: dict | None) -> list[dict] | None:
     """
-    Mutates the passed in list by appending additional data to it
+    The balance sheets of previous if it is a full company build. Nodes loaded by
+    database/builddb.py only hold {glance, location, management}, they are built from scratch.
     """
-    if financial_years:
-        financial_years[0]["trends"] = None
-    else:
-        return
-
-    for year in financial_years:
-        divide_or_none = lambda numerator, denominator: (
-            year[numerator] / year[denominator] if year[denominator] else None
-        )
+    if previous and "basic_info" in previous and isinstance(previous.get("financial"), list):
+        return previous["financial"]
+    return None
 
-        # This one is used for calculation of others
-        year["quick_assets"] = (
-            year["cash_and_bank_balances"] + year["securities"] + year["receivables"]
-        )
-
-        indicators = year["indicators"] = {}
 
-        value = year["current_assets"] - year["deferred_income"]
-        indicators["working_capital"] = {
-            "value": value,
-            "level": "L" if value > 0 else "H",
-        }
+async def get_financial_years(report_ids: list[str], previous: list[dict] | None = None):
+    """
+    Balance sheets of report_ids (oldest to latest) including indicators and trends.
 
-        value = divide_or_none("liabilities", "equity")
-        indicators["debt_to_equity_ratio"] = (
-            None
-            if not value
-            else {
-                "value": value,
-                "level": "L" if value < 1 else "M" if value <= 2 else "H",
-            }
+    previous is the financial list of an earlier result. A filed report never changes, and an
+    amended one is filed under a new KEY (same AZ), so years whose document_id is still listed
+    are reused as they are. Only new reports are downloaded and parsed, and only the indicators
+    of new years and the trends of years whose preceding year changed are recalculated.
+    """
+    known = {
+        year["document_id"]: year for year in previous or [] if year.get("document_id")
+    }
+    new_ids = [id for id in report_ids if id not in known]
+    fetched = dict(
+        zip(
+            new_ids,
+            await gather_limited((get_xml_data(id) for id in new_ids), DOCUMENT_FANOUT),
         )
+    )
+    financial = [known.get(id) or fetched[id] for id in report_ids]
 
-        value = divide_or_none("equity", "total_liabilities")  # wrong
-        indicators["equity_ratio"] = (
-            None
-            if not value
-            else {
-                "value": value,
-                "level": "L" if value > 0.50 else "M" if value >= 0.25 else "H",
-            }
-        )
+    if not known:
+        calculate_financial_indicators(financial)
+        return financial
 
-        value = divide_or_none("current_assets", "deferred_income")
-        indicators["current_ratio"] = (
-            None
-            if not value
-            else {
-                "value": value,
-                "level": "L" if value > 2 else "M" if value >= 1 else "H",
-            }
-        )
+    previous_ids = [year.get("document_id") for year in previous]
+    # (index, the year together with the one before it)
+    outdated = []
+    for i, id in enumerate(report_ids):
+        before = report_ids[i - 1] if i else None
+        if id not in fetched:
+            j = previous_ids.index(id)
+            if before == (previous_ids[j - 1] if j else None):
+                continue
+        outdated.append((i, financial[max(i - 1, 0) : i + 1]))
 
-        value = divide_or_none("cash_and_bank_balances", "deferred_income")
-        indicators["cash_ratio"] = (
-            None
-            if not value
-            else {
-                "value": value,
-                "level": "L" if value > 1 else "M" if value >= 0.2 else "H",
-            }
-        )
+    # Each pair is scored as its own company, its last year carries the result
+    with span("indicators"):
+        scored = score_companies([years for _, years in outdated])
+    for (i, _), result in zip(outdated, scored):
+        financial[i].update(result[-1])
 
-        value = divide_or_none("quick_assets", "deferred_income")
-        indicators["quick_ratio"] = (
-            None
-            if not value
-            else {
-                "value": value,
-                "level": "L" if value > 1 else "M" if value >= 0.5 else "H",
-            }
-        )
+    return financial
 
-        value = divide_or_none("equity", "fixed_assets")
-        indicators["fixed_asset_coverage"] = (
-            None
-            if not value
-            else {
-                "value": value,
-                "level": "L" if value > 1.00 else "M" if value >= 0.50 else "H",
-            }
-        )
 
-        value = year["retained_earnings"] - year["retained_earnings_subitem"]
-        indicators["profit_loss"] = {
-            "value": value,
-            "level": "L" if value >= 0 else "H",
-        }
+def calculate_financial_indicators(financial_years):
+    """
+    Mutates the passed in list by appending additional data to it
+    (quick_assets, indicators and trends, see indicators.score_companies)
+    """
+    if not financial_years:
+        return
 
-    for prev, curr in zip(financial_years, financial_years[1:]):
-
-        def growth_rate_or_none(metric, is_indicator):
-            # Get this man a True...
-            if is_indicator:
-                if (
-                    prev["indicators"][metric] is None
-                    or curr["indicators"][metric] is None
-                ):
-                    return None
-                prev_value = prev["indicators"][metric]["value"]
-                if prev_value == 0:
-                    return None
-
-                return (curr["indicators"][metric]["value"] - prev_value) / prev_value
-
-            if not prev[metric] or not curr[metric]:
-                return None
-            return (curr[metric] - prev[metric]) / prev[metric]
-
-        trends = curr["trends"] = {}
-
-        trends["asset_growth_rate"] = growth_rate_or_none("total_assets", False)
-        trends["equity_growth_rate"] = growth_rate_or_none("equity", False)
-        trends["profit_loss_development"] = growth_rate_or_none("profit_loss", True)
-
-        def trend_or_none(metric, is_indicator):
-            if is_indicator:
-                if (
-                    prev["indicators"][metric] is None
-                    or curr["indicators"][metric] is None
-                ):
-                    return None
-
-                return (
-                    prev["indicators"][metric]["value"]
-                    - curr["indicators"][metric]["value"]
-                )
-            if not prev[metric] or not curr[metric]:
-                return None
-            return prev[metric] - curr[metric]
-
-        trends["equity_ratio_trend"] = trend_or_none("equity_ratio", True)
-        trends["total_assets_trend"] = trend_or_none("total_assets", False)
-        trends["working_capital_trend"] = trend_or_none("working_capital", True)
-        trends["current_ratio_development"] = trend_or_none("current_ratio", True)
-        trends["debt_to_equity_trend"] = trend_or_none("debt_to_equity_ratio", True)
+    with span("indicators"):
+        scored = score_companies([financial_years])[0]
+    for year, result in zip(financial_years, scored):
+        year.update(result)
 
 
 def extract_compliance_indicators(financial, history, total_reports):
@@ -519,31 +465,144 @@ def get_text_or_none(element: ET.Element | None) -> str | None:
     return element.text
 
 
-def get_document_data(id):
-    suche_params = {
-        "KEY": id,
-        # "SICHTAG": datetime.datetime.today()
-    }
+async def get_document_data(id) -> bytes:
+    """
+    Raw content of a filed document (XML or PDF)
+    """
+    # Filed documents are immutable, so every KEY only has to be downloaded once
+    with span("document_store"):
+        content = await asyncio.to_thread(document_store.get, id)
+    if content is None:
+        suche_params = {
+            "KEY": id,
+            # "SICHTAG": datetime.datetime.today()
+        }
 
-    res = client.service.URKUNDE(**suche_params)
-    if id.endswith("XML"):
-        detection = from_bytes(res["DOKUMENT"]["CONTENT"]).best()
-        if detection is None:
-            raise ValueError("Could not detect encoding")
+        res = await call("URKUNDE", timeout=SOAP_DOCUMENT_TIMEOUT, **suche_params)
+        content = res["DOKUMENT"]["CONTENT"]
+        await asyncio.to_thread(document_store.put, id, content)
 
-        return str(detection)
-    else:
-        return res["DOKUMENT"]["CONTENT"]
+    return content
+
+
+xml_decoding = Counter(
+    "bizray_xml_decoding_total",
+    "How XML documents were decoded: declared encoding, plain UTF-8 or detected",
+    ("path",),
+)
+
+_XML_ENCODING_DECLARATION = re.compile(
+    rb"""^\s*<\?xml[^>]*?\sencoding\s*=\s*["'][A-Za-z][A-Za-z0-9._-]*["']"""
+)
+
+
+def parse_xml_document(content: bytes) -> ET.Element:
+    """
+    Parse the raw bytes directly when the encoding is known (declared in the prolog,
+    BOM or valid UTF-8, which is the XML default).
+    Statistical detection only runs when that isn't the case or the declaration was wrong.
+    """
+    path = None
+    with span("xml_encoding"):
+        if content.startswith(
+            (codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+        ) or _XML_ENCODING_DECLARATION.match(content[:256]):
+            path = "declared"
+        else:
+            try:
+                content.decode("utf-8")
+                path = "utf8"
+            except UnicodeDecodeError:
+                pass
+
+    if path is not None:
+        try:
+            with span("xml_parse"):
+                root = ET.fromstring(content)
+            xml_decoding.inc(path=path)
+            return root
+        except (ET.ParseError, LookupError):
+            pass
+
+    with span("xml_encoding_detection"):
+        detection = from_bytes(content).best()
+    if detection is None:
+        raise ValueError("Could not detect encoding")
+
+    xml_decoding.inc(path="detected")
+    with span("xml_parse"):
+        return ET.fromstring(str(detection))
 
 
 ns = {"ns0": "https://finanzonline.bmf.gv.at/bilanz"}
 
+# HGB position of every balance sheet field, same layout for BILANZ and HGB_Form_2
+BALANCE_FIELDS = {
+    "fixed_assets": "HGB_224_2_A",
+    "intangible_assets": "HGB_224_2_A_I",
+    "tangible_assets": "HGB_224_2_A_II",
+    "financial_assets": "HGB_224_2_A_III",
+    "current_assets": "HGB_224_2_B",
+    "inventories": "HGB_224_2_B_I",
+    "receivables": "HGB_224_2_B_II",
+    "securities": "HGB_224_2_B_III",
+    "cash_and_bank_balances": "HGB_224_2_B_IV",
+    "prepaid_expenses": "HGB_224_2_C",
+    "deferred_tax_assets": "HGB_224_2_D",
+    "total_assets": "HGB_224_2",
+    "equity": "HGB_224_3_A",
+    "share_capital": "HGB_229_1_A_I",
+    # Unused
+    # 'share_capital_subitem': "HGB_224_3_A_I_a",
+    # 'share_capital_subitem_detail': "HGB_229_1_A_I_a",
+    "capital_reserves": "HGB_224_3_A_II",
+    "revenue_reserves": "HGB_224_3_A_III",
+    "retained_earnings": "HGB_224_3_A_IV",
+    "retained_earnings_subitem": "HGB_224_3_A_IV_x",
+    "liabilities": "HGB_224_3_C",
+    "deferred_income": "HGB_224_3_D",
+    "deferred_tax_liabilities": "HGB_224_3_E",
+    "total_liabilities": "HGB_224_3",
+}
+# Qualified tag -> field, so elements can be matched without parsing their tag
+_BALANCE_TAGS = {
+    f"{{{ns['ns0']}}}{term}": field for field, term in BALANCE_FIELDS.items()
+}
+
+
+def extract_balance(balance: ET.Element) -> dict[str, float]:
+    """
+    Reads all BALANCE_FIELDS in a single walk over the balance tree.
+    A field takes the amount of the first position (in document order) that has one,
+    the same as balance.find(".//ns0:{term}/ns0:POSTENZEILE/ns0:BETRAG") would.
+    """
+    # Missing positions are 0. Probably wrong but calculations require it.
+    values = dict.fromkeys(BALANCE_FIELDS, 0.0)
+
+    found = set()
+    for element in balance.iter():
+        field = _BALANCE_TAGS.get(element.tag)
+        if field is None or field in found:
+            continue
 
-def get_xml_data(id):
+        amount = element.find("./ns0:POSTENZEILE/ns0:BETRAG", ns)
+        if amount is None:
+            continue
+
+        values[field] = float(amount.text)
+        found.add(field)
+        if len(found) == len(values):
+            break
+
+    return values
+
+
+async def get_xml_data(id):
     global ns
-    xml_content = get_document_data(id)
+    xml_content = await get_document_data(id)
 
-    root = ET.fromstring(xml_content)
+    # Encoding detection on a large Jahresabschluss takes a while, it mustn't block the loop
+    root = await asyncio.to_thread(parse_xml_document, xml_content)
 
     # with open(id + ".xml", "w", encoding="utf-8") as f:
     #     f.write(minidom.parseString(ET.tostring(root)).toprettyxml(indent="  "))
@@ -559,14 +618,6 @@ def get_xml_data(id):
     fiscal_year = general.find("./ns0:GJ", ns)
     director = general.find("./ns0:UNTER", ns)
 
-    def search_balance(term):
-        node = balance.find(f".//ns0:{term}/ns0:POSTENZEILE/ns0:BETRAG", ns)
-        if node is None:
-            # Probably wrong but calculations require it.
-            return 0.0
-
-        return float(node.text)
-
     # pdf files
     # notes = other_info.find('./ns0:VERMERKE', ns)
     # for elem in note.iter():
@@ -580,6 +631,7 @@ def get_xml_data(id):
     #         f.write(decoded)
 
     data = {
+        "document_id": id,
         "submission_date": (
             date_info.find("./ns0:DATUM_ERSTELLUNG", ns).text
             if date_info
@@ -593,39 +645,16 @@ def get_xml_data(id):
         "director_name": director.find("./ns0:V_NAME", ns).text
         + " "
         + director.find("./ns0:Z_NAME", ns).text,
-        "fixed_assets": search_balance("HGB_224_2_A"),
-        "intangible_assets": search_balance("HGB_224_2_A_I"),
-        "tangible_assets": search_balance("HGB_224_2_A_II"),
-        "financial_assets": search_balance("HGB_224_2_A_III"),
-        "current_assets": search_balance("HGB_224_2_B"),
-        "inventories": search_balance("HGB_224_2_B_I"),
-        "receivables": search_balance("HGB_224_2_B_II"),
-        "securities": search_balance("HGB_224_2_B_III"),
-        "cash_and_bank_balances": search_balance("HGB_224_2_B_IV"),
-        "prepaid_expenses": search_balance("HGB_224_2_C"),
-        "deferred_tax_assets": search_balance("HGB_224_2_D"),
-        "total_assets": search_balance("HGB_224_2"),
-        "equity": search_balance("HGB_224_3_A"),
-        "share_capital": search_balance("HGB_229_1_A_I"),
-        # Unused
-        # 'share_capital_subitem': search_balance("HGB_224_3_A_I_a"),
-        # 'share_capital_subitem_detail': search_balance("HGB_229_1_A_I_a"),
-        "capital_reserves": search_balance("HGB_224_3_A_II"),
-        "revenue_reserves": search_balance("HGB_224_3_A_III"),
-        "retained_earnings": search_balance("HGB_224_3_A_IV"),
-        "retained_earnings_subitem": search_balance("HGB_224_3_A_IV_x"),
-        "liabilities": search_balance("HGB_224_3_C"),
-        "deferred_income": search_balance("HGB_224_3_D"),
-        "deferred_tax_liabilities": search_balance("HGB_224_3_E"),
-        "total_liabilities": search_balance("HGB_224_3"),
     }
+    with span("balance_extract"):
+        data.update(extract_balance(balance))
 
     return data
 
 
-def get_doc_ids(fnr) -> tuple[list[dict], list[str], int]:
+async def get_doc_ids(fnr) -> tuple[list[dict], list[str], int]:
     suche_params = {"FNR": fnr, "AZ": ""}
-    results: list = client.service.SUCHEURKUNDE(**suche_params).ERGEBNIS
+    results: list = (await call("SUCHEURKUNDE", **suche_params)).ERGEBNIS
     # The results are divided into 2 sections: PDF and XML
     # Sections are ordered by date from oldest to latest
     # PDFs come first, XMLs come afterwards
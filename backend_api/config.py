@@ -7,8 +7,95 @@ load_dotenv(dotenv_path=dotenv_path)
 API_KEY = os.getenv('API_KEY')
 WSDL_URL = os.getenv('WSDL_URL')
 
+# Upstream SOAP connection pool
+SOAP_POOL_SIZE = int(os.getenv('SOAP_POOL_SIZE', '100'))
+SOAP_KEEPALIVE = int(os.getenv('SOAP_KEEPALIVE', '20'))
+SOAP_KEEPALIVE_EXPIRY = float(os.getenv('SOAP_KEEPALIVE_EXPIRY', '30'))
+# Per-call timeouts in seconds (documents can be large, so they get their own)
+SOAP_CONNECT_TIMEOUT = float(os.getenv('SOAP_CONNECT_TIMEOUT', '5'))
+SOAP_TIMEOUT = float(os.getenv('SOAP_TIMEOUT', '30'))
+SOAP_DOCUMENT_TIMEOUT = float(os.getenv('SOAP_DOCUMENT_TIMEOUT', '60'))
+# How many balance sheet documents one company view fetches at once
+DOCUMENT_FANOUT = int(os.getenv('DOCUMENT_FANOUT', '3'))
+
+# On-disk cache of URKUNDE documents (compressed, LRU evicted above the size cap)
+DOCUMENT_STORE_DIR = os.getenv(
+    'DOCUMENT_STORE_DIR', os.path.join(os.path.dirname(__file__), 'data', 'documents')
+)
+DOCUMENT_STORE_MAX_BYTES = int(os.getenv('DOCUMENT_STORE_MAX_BYTES', str(2 * 1024**3)))
+
+# Name search results, shared by all workers through a SQLite file
+SEARCH_CACHE_PATH = os.getenv(
+    'SEARCH_CACHE_PATH', os.path.join(os.path.dirname(__file__), 'data', 'search_cache.sqlite')
+)
+SEARCH_CACHE_MEMORY_BYTES = int(os.getenv('SEARCH_CACHE_MEMORY_BYTES', str(64 * 1024**2)))
+# Served as is for SEARCH_CACHE_FRESH seconds, then refreshed in the background until expiry
+SEARCH_CACHE_FRESH = float(os.getenv('SEARCH_CACHE_FRESH', '600'))
+SEARCH_CACHE_EXPIRE = float(os.getenv('SEARCH_CACHE_EXPIRE', str(24 * 60 * 60)))
+
+# Local name index built by database/builddb.py, used while it is younger than NAME_INDEX_MAX_AGE
+NAME_INDEX_PATH = os.getenv(
+    'NAME_INDEX_PATH', os.path.join(os.path.dirname(__file__), 'data', 'name_index.sqlite')
+)
+NAME_INDEX_MAX_AGE = float(os.getenv('NAME_INDEX_MAX_AGE', str(45 * 24 * 60 * 60)))
+NAME_INDEX_LIMIT = int(os.getenv('NAME_INDEX_LIMIT', '500'))
+
+# Typeahead index over the name index (or the stored companies), rebuilt every SUGGEST_REFRESH seconds
+SUGGEST_REFRESH = float(os.getenv('SUGGEST_REFRESH', str(60 * 60)))
+SUGGEST_MAX_LIMIT = int(os.getenv('SUGGEST_MAX_LIMIT', '50'))
+
+# Stored company snapshots are served as they are for COMPANY_SOFT_EXPIRY seconds, then still
+# served (marked stale) while a background worker refreshes them, until COMPANY_HARD_EXPIRY
+COMPANY_SOFT_EXPIRY = float(os.getenv('COMPANY_SOFT_EXPIRY', str(30 * 24 * 60 * 60)))
+COMPANY_HARD_EXPIRY = float(os.getenv('COMPANY_HARD_EXPIRY', str(365 * 24 * 60 * 60)))
+COMPANY_REFRESH_WORKERS = int(os.getenv('COMPANY_REFRESH_WORKERS', '4'))
+COMPANY_REFRESH_QUEUE = int(os.getenv('COMPANY_REFRESH_QUEUE', '1000'))
+
+# POST /screen: at most SCREEN_CONCURRENCY lookups in flight over all screenings, SCREEN_MAX_TERMS per request
+SCREEN_CONCURRENCY = int(os.getenv('SCREEN_CONCURRENCY', '16'))
+SCREEN_MAX_TERMS = int(os.getenv('SCREEN_MAX_TERMS', '1000'))
+
+# Background enrichment jobs, persisted in a SQLite file. JOB_WORKERS jobs run at once,
+# sharing JOB_CONCURRENCY company loads, each gets JOB_RETRIES attempts.
+# A job whose worker sent no heartbeat for JOB_STALE_AFTER seconds is taken over by another one.
+JOBS_PATH = os.getenv(
+    'JOBS_PATH', os.path.join(os.path.dirname(__file__), 'data', 'jobs.sqlite')
+)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_CONCURRENCY = int(os.getenv('JOB_CONCURRENCY', '8'))
+JOB_RETRIES = int(os.getenv('JOB_RETRIES', '3'))
+JOB_STALE_AFTER = float(os.getenv('JOB_STALE_AFTER', '120'))
+
+# Addresses shared by so many companies that they mean nothing (builddb uses UNKNOWN for a missing address),
+# left out of traversals
+SENTINEL_ADDRESSES = [
+    key.strip() for key in os.getenv('SENTINEL_ADDRESSES', 'UNKNOWN').split(',') if key.strip()
+]
+# /node: neighbours per page by default and at most
+NEIGHBOURS_PAGE_SIZE = int(os.getenv('NEIGHBOURS_PAGE_SIZE', '100'))
+NEIGHBOURS_MAX_PAGE = int(os.getenv('NEIGHBOURS_MAX_PAGE', '1000'))
+
+# /subgraph: the most hops, nodes and neighbours per node a caller can ask for
+SUBGRAPH_MAX_DEPTH = int(os.getenv('SUBGRAPH_MAX_DEPTH', '4'))
+SUBGRAPH_MAX_NODES = int(os.getenv('SUBGRAPH_MAX_NODES', '500'))
+SUBGRAPH_MAX_FANOUT = int(os.getenv('SUBGRAPH_MAX_FANOUT', '100'))
+
+# In-memory CSR projection of the graph for /graph queries, rebuilt every GRAPH_REFRESH seconds.
+# Traversals don't expand nodes with more than GRAPH_MAX_DEGREE neighbours
+GRAPH_REFRESH = float(os.getenv('GRAPH_REFRESH', str(6 * 60 * 60)))
+GRAPH_MAX_DEPTH = int(os.getenv('GRAPH_MAX_DEPTH', '6'))
+GRAPH_MAX_DEGREE = int(os.getenv('GRAPH_MAX_DEGREE', '1000'))
+# /path: the most paths per pair a caller can ask for, pairs whose paths are kept in memory
+PATH_MAX_RESULTS = int(os.getenv('PATH_MAX_RESULTS', '10'))
+PATH_CACHE_SIZE = int(os.getenv('PATH_CACHE_SIZE', '1024'))
+# /graph/{fnr}/reach: the most companies listed per request
+REACH_MAX_RESULTS = int(os.getenv('REACH_MAX_RESULTS', '1000'))
+
+# Adds a Server-Timing header with the time spent in every stage to each response
+TIMING_HEADER = os.getenv('TIMING_HEADER', '0') == '1'
+
 
 URI = os.getenv('DB_URI')
 DB_USER = os.getenv('DB_USER')
 DB_PASS = os.getenv('DB_PASS')
-DB = 'neo4j'
\ No newline at end of file
+DB = 'neo4j'
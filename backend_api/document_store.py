@@ -0,0 +1,123 @@
+import hashlib
+import os
+import threading
+import time
+import zlib
+
+from .config import DOCUMENT_STORE_DIR, DOCUMENT_STORE_MAX_BYTES
+
+# Every worker writes at most max_bytes / SCAN_FRACTION before it measures the directory again
+SCAN_FRACTION = 64
+
+
+class DocumentStore:
+    """
+    Persistent cache for URKUNDE documents.
+    A filed document never changes once its KEY exists, so entries never expire and are only
+    evicted (least recently used first) when the store grows over max_bytes.
+
+    Files are addressed by the sha256 of the KEY and hold the zlib-compressed content.
+    The file mtime doubles as the LRU timestamp so the order survives restarts and is shared
+    by every worker using the directory. The size is measured on disk before evicting, other
+    workers' writes are only known from there.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Size at the last scan plus what this process wrote since, None before the first scan
+        self._size: int | None = None
+        self._unscanned = 0
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _scan(self) -> list[tuple[int, str, int]]:
+        # [(mtime_ns, path, size), ...], least recently used first
+        files = []
+        if os.path.isdir(self.directory):
+            for prefix in os.scandir(self.directory):
+                if not prefix.is_dir():
+                    continue
+                for entry in os.scandir(prefix.path):
+                    if entry.is_file() and not entry.name.endswith(".tmp"):
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            # Evicted by another worker
+                            continue
+                        files.append((stat.st_mtime_ns, entry.path, stat.st_size))
+
+        files.sort()
+        return files
+
+    @staticmethod
+    def _touch(path: str):
+        # Explicit nanoseconds, the file system clock is too coarse to order quick accesses
+        now = time.time_ns()
+        try:
+            os.utime(path, ns=(now, now))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                content = zlib.decompress(f.read())
+        except (FileNotFoundError, zlib.error):
+            # Missing, evicted by another worker or truncated
+            return None
+
+        self._touch(path)
+        return content
+
+    def put(self, key: str, content: bytes):
+        path = self._path(key)
+        compressed = zlib.compress(content)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        # Atomic, readers never see a partially written document
+        os.replace(tmp_path, path)
+        self._touch(path)
+
+        with self._lock:
+            self._unscanned += len(compressed)
+            if self._size is not None:
+                self._size += len(compressed)
+            if (
+                self._size is None
+                or self._size > self.max_bytes
+                or self._unscanned >= self.max_bytes // SCAN_FRACTION
+            ):
+                self._evict(path)
+
+    def _evict(self, keep: str):
+        # Called with the lock held, never evicts the entry that was just written
+        files = self._scan()
+        size = sum(size for _, _, size in files)
+        for _, path, file_size in files:
+            if size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another worker evicted it first
+                pass
+            size -= file_size
+
+        self._size = size
+        self._unscanned = 0
+
+    def size(self) -> int:
+        return sum(size for _, _, size in self._scan())
+
+
+document_store = DocumentStore(DOCUMENT_STORE_DIR, DOCUMENT_STORE_MAX_BYTES)
@@ -0,0 +1,366 @@
+"""
+Read-only projection of the Company-Manager-Address graph as NumPy CSR arrays.
+
+Nodes are numbered 0..n-1 ("Label:key" ids like network.js), the neighbours of node i
+are indices[indptr[i]:indptr[i + 1]]. Traversals work on whole frontiers at once,
+so a BFS over millions of edges takes milliseconds instead of a Cypher round-trip per hop.
+The projection is rebuilt periodically and swapped in as a whole, readers keep using the
+one they started with.
+"""
+
+import asyncio
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable
+
+import numpy as np
+
+from .config import PATH_CACHE_SIZE
+from .metrics import Counter, span
+
+LABELS = ("Company", "Manager", "Address")
+
+projection_builds = Counter(
+    "bizray_graph_projection_builds_total",
+    "Rebuilds of the in-memory graph projection (done or failed)",
+    ("result",),
+)
+path_cache = Counter(
+    "bizray_graph_path_cache_total",
+    "Path queries answered from the per-projection cache (hit) or searched (miss)",
+    ("result",),
+)
+
+
+class GraphProjection:
+    def __init__(self, edges: Iterable[tuple[str, str]]):
+        """
+        edges: ("Company:583360 h", "Manager:1960-01-01|...") pairs, stored undirected
+        """
+        self.ids: dict[str, int] = {}
+        self.keys: list[str] = []
+        sources, targets = [], []
+
+        for a, b in edges:
+            for key in (a, b):
+                if key not in self.ids:
+                    self.ids[key] = len(self.keys)
+                    self.keys.append(key)
+            sources.append(self.ids[a])
+            targets.append(self.ids[b])
+
+        n = len(self.keys)
+        self.labels = np.array(
+            [LABELS.index(key.split(":", 1)[0]) for key in self.keys], dtype=np.uint8
+        )
+
+        src = np.array(sources + targets, dtype=np.int32)
+        dst = np.array(targets + sources, dtype=np.int32)
+        # One sorted unique int64 per (src, dst) pair: duplicate relationships don't count
+        # twice in the degree and the rows come out in order
+        width = max(n, 1)
+        pairs = np.unique(src.astype(np.int64) * width + dst)
+        src = (pairs // width).astype(np.int32)
+        self.indices = (pairs % width).astype(np.int32)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self.indptr[1:])
+        self._degrees = np.diff(self.indptr)
+
+        self.built_at = time.time()
+        self.component, self.component_sizes = self._components()
+
+        # (a, b, k, max_depth) -> paths, least recently used first. Lives and dies with
+        # the projection, so a rebuild never serves paths from the old graph
+        self._paths: OrderedDict[tuple, list[list[int]]] = OrderedDict()
+        self._paths_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices) // 2
+
+    def degrees(self) -> np.ndarray:
+        return self._degrees
+
+    def _neighbours(self, frontier: np.ndarray) -> np.ndarray:
+        # All neighbours of all frontier nodes, gathered without a Python loop
+        starts = self.indptr[frontier]
+        lengths = self.indptr[frontier + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int32)
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.indices[offsets + np.arange(total)]
+
+    def bfs(self, source: int, max_depth: int | None = None, max_degree: int | None = None) -> np.ndarray:
+        """
+        Hop distance of every node from source, -1 when it isn't reached.
+        Nodes with more than max_degree neighbours are reached but not expanded (supernodes).
+        """
+        distance = np.full(len(self), -1, dtype=np.int32)
+        distance[source] = 0
+        frontier = np.array([source], dtype=np.int32)
+        degrees = self.degrees() if max_degree is not None else None
+
+        depth = 0
+        while len(frontier) and (max_depth is None or depth < max_depth):
+            if degrees is not None and depth > 0:
+                frontier = frontier[degrees[frontier] <= max_degree]
+            neighbours = self._neighbours(frontier)
+            neighbours = np.unique(neighbours[distance[neighbours] < 0])
+            depth += 1
+            distance[neighbours] = depth
+            frontier = neighbours
+        return distance
+
+    def k_hop(self, source: int, k: int, max_degree: int | None = None) -> np.ndarray:
+        """
+        Nodes within k hops of source (source excluded), closest first
+        """
+        distance = self.bfs(source, max_depth=k, max_degree=max_degree)
+        reached = np.flatnonzero(distance > 0)
+        return reached[np.argsort(distance[reached], kind="stable")]
+
+    def reach(self, source: int, k: int, max_degree: int | None = None, limit: int = 100) -> dict:
+        """
+        The companies within k hops of source, closest first, and the size of its cluster
+        """
+        distance = self.bfs(source, max_depth=k, max_degree=max_degree)
+        reached = np.flatnonzero(distance > 0)
+        companies = reached[self.labels[reached] == LABELS.index("Company")]
+        companies = companies[np.argsort(distance[companies], kind="stable")]
+        per_hop = np.bincount(distance[companies], minlength=k + 1)
+
+        return {
+            "company": self.keys[source],
+            "depth": k,
+            "connected_companies": len(companies),
+            "companies_per_hop": {str(hop): int(per_hop[hop]) for hop in range(1, k + 1)},
+            "companies": [
+                {"id": self.keys[i], "hops": int(distance[i])} for i in companies[:limit]
+            ],
+            "component_size": self.component_size(source),
+            "degree": int(self.indptr[source + 1] - self.indptr[source]),
+        }
+
+    def shortest_path(
+        self,
+        source: int,
+        target: int,
+        max_depth: int,
+        max_degree: int | None = None,
+        blocked: np.ndarray | None = None,
+        skip_first: Iterable[int] = (),
+    ) -> list[int] | None:
+        """
+        One shortest path from source to target of at most max_depth hops, None if there is none.
+        Searches from both ends, always expanding the smaller frontier, so it touches about
+        the square root of the nodes a one-sided BFS would. Supernodes are never walked through,
+        blocked nodes are never entered and skip_first are not taken as the first hop.
+        """
+        if source == target:
+            return [source]
+
+        n = len(self)
+        degrees = self.degrees() if max_degree is not None else None
+        distance = (np.full(n, -1, dtype=np.int32), np.full(n, -1, dtype=np.int32))
+        parent = (np.full(n, -1, dtype=np.int32), np.full(n, -1, dtype=np.int32))
+        distance[0][source] = distance[1][target] = 0
+        frontiers = [np.array([source], dtype=np.int32), np.array([target], dtype=np.int32)]
+        depths = [0, 0]
+        skip_first = np.fromiter(skip_first, dtype=np.int32)
+
+        while len(frontiers[0]) and len(frontiers[1]) and depths[0] + depths[1] < max_depth:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            frontier = frontiers[side]
+            if degrees is not None and depths[side] > 0:
+                frontier = frontier[degrees[frontier] <= max_degree]
+
+            neighbours = self._neighbours(frontier)
+            origins = np.repeat(frontier, self.indptr[frontier + 1] - self.indptr[frontier])
+
+            keep = distance[side][neighbours] < 0
+            if blocked is not None:
+                keep &= ~blocked[neighbours]
+            if len(skip_first):
+                # The edges between source and skip_first are gone, in both directions
+                if side == 0 and depths[0] == 0:
+                    keep &= ~np.isin(neighbours, skip_first)
+                elif side == 1:
+                    keep &= ~((neighbours == source) & np.isin(origins, skip_first))
+            neighbours, first = np.unique(neighbours[keep], return_index=True)
+            origins = origins[keep][first]
+
+            depths[side] += 1
+            distance[side][neighbours] = depths[side]
+            parent[side][neighbours] = origins
+            frontiers[side] = neighbours
+
+            # The whole layer is in, so the closest meeting node gives a shortest path.
+            # A supernode can't be the middle of a path either
+            met = neighbours[distance[1 - side][neighbours] >= 0]
+            if degrees is not None:
+                met = met[(degrees[met] <= max_degree) | (met == source) | (met == target)]
+            if len(met):
+                middle = int(met[np.argmin(distance[1 - side][met])])
+                return self._walk(parent[0], middle)[::-1] + self._walk(parent[1], middle)[1:]
+        return None
+
+    @staticmethod
+    def _walk(parent: np.ndarray, node: int) -> list[int]:
+        path = [node]
+        while parent[node] >= 0:
+            node = int(parent[node])
+            path.append(node)
+        return path
+
+    def shortest_paths(
+        self, source: int, target: int, k: int, max_depth: int, max_degree: int | None = None
+    ) -> list[list[int]]:
+        """
+        Up to k loopless paths from source to target, shortest first (Yen's algorithm:
+        every further path branches off a found one at some node and avoids its own prefix)
+        """
+        first = self.shortest_path(source, target, max_depth, max_degree)
+        if first is None:
+            return []
+
+        paths = [first]
+        seen = {tuple(first)}
+        candidates: list[tuple[int, list[int]]] = []
+        blocked = np.zeros(len(self), dtype=bool)
+
+        while len(paths) < k:
+            last = paths[-1]
+            for i in range(len(last) - 1):
+                root = last[: i + 1]
+                skip_first = {path[i + 1] for path in paths if path[: i + 1] == root}
+                blocked[root[:-1]] = True
+                spur = self.shortest_path(
+                    root[-1], target, max_depth - i, max_degree, blocked, skip_first
+                )
+                blocked[root[:-1]] = False
+
+                if spur is not None:
+                    path = root[:-1] + spur
+                    if tuple(path) not in seen:
+                        seen.add(tuple(path))
+                        heapq.heappush(candidates, (len(path), path))
+            if not candidates:
+                break
+            paths.append(heapq.heappop(candidates)[1])
+        return paths
+
+    def paths(
+        self, source: int, target: int, k: int, max_depth: int, max_degree: int | None = None
+    ) -> list[list[int]]:
+        """
+        shortest_paths() through a small LRU cache, a pair asked for in either order
+        shares one entry
+        """
+        swap = source > target
+        key = (min(source, target), max(source, target), k, max_depth, max_degree)
+
+        with self._paths_lock:
+            paths = self._paths.get(key)
+            if paths is not None:
+                self._paths.move_to_end(key)
+        if paths is None:
+            path_cache.inc(result="miss")
+            paths = self.shortest_paths(key[0], key[1], k, max_depth, max_degree)
+            with self._paths_lock:
+                self._paths[key] = paths
+                while len(self._paths) > PATH_CACHE_SIZE:
+                    self._paths.popitem(last=False)
+        else:
+            path_cache.inc(result="hit")
+
+        return [path[::-1] for path in paths] if swap else paths
+
+    def _components(self) -> tuple[np.ndarray, np.ndarray]:
+        # Min-label propagation with pointer jumping, converges in a few passes
+        n = len(self)
+        component = np.arange(n, dtype=np.int32)
+        src = np.repeat(np.arange(n, dtype=np.int32), np.diff(self.indptr))
+        while True:
+            previous = component.copy()
+            np.minimum.at(component, src, component[self.indices])
+            component = component[component]
+            if np.array_equal(component, previous):
+                break
+
+        roots, component = np.unique(component, return_inverse=True)
+        return component.astype(np.int32), np.bincount(component, minlength=len(roots))
+
+    def component_size(self, node: int) -> int:
+        return int(self.component_sizes[self.component[node]])
+
+    def degree_distribution(self, label: str | None = None) -> dict[str, int]:
+        """
+        Number of nodes per degree bucket: "0", "1", "2-3", "4-7", ...
+        """
+        degrees = self.degrees()
+        if label is not None:
+            degrees = degrees[self.labels == LABELS.index(label)]
+
+        buckets = np.zeros(len(degrees), dtype=np.int64)
+        positive = degrees > 0
+        buckets[positive] = np.floor(np.log2(degrees[positive])).astype(np.int64) + 1
+        counts = np.bincount(buckets)
+
+        distribution = {}
+        for bucket, count in enumerate(counts.tolist()):
+            if not count:
+                continue
+            if bucket <= 1:
+                distribution[str(bucket)] = count
+            else:
+                distribution[f"{2 ** (bucket - 1)}-{2 ** bucket - 1}"] = count
+        return distribution
+
+    def stats(self) -> dict:
+        return {
+            "nodes": len(self),
+            "edges": self.edge_count,
+            "companies": int((self.labels == 0).sum()),
+            "components": len(self.component_sizes),
+            "largest_component": int(self.component_sizes.max()) if len(self) else 0,
+            "built_at": self.built_at,
+            "degrees": {label: self.degree_distribution(label) for label in LABELS},
+        }
+
+
+# Replaced as a whole by rebuild()
+graph_projection: GraphProjection | None = None
+
+
+async def rebuild(load_edges):
+    """
+    load_edges: coroutine returning the edge list, e.g. NETWORK.GET_EDGES
+    """
+    global graph_projection
+
+    started = time.perf_counter()
+    edges = await load_edges()
+    with span("graph_projection_build"):
+        projection = await asyncio.to_thread(GraphProjection, edges)
+    graph_projection = projection
+    projection_builds.inc(result="done")
+    print(
+        f"Graph projection: {len(projection)} nodes, {projection.edge_count} edges "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+async def keep_fresh(load_edges, interval: float):
+    while True:
+        try:
+            await rebuild(load_edges)
+        except Exception as e:
+            projection_builds.inc(result="failed")
+            print(f"Graph projection rebuild failed: {e}")
+        await asyncio.sleep(interval)
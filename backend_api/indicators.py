@@ -0,0 +1,241 @@
+"""
+Financial indicators for many companies at once.
+
+Every input field is an array of shape (companies, years), years ordered oldest to latest
+like the financial list of a company. Companies with fewer years are padded and masked out
+with the valid array.
+"""
+
+from typing import Mapping, Sequence
+
+import numpy as np
+
+# Balance sheet fields the indicators are calculated from
+INPUT_FIELDS = (
+    "current_assets",
+    "deferred_income",
+    "liabilities",
+    "equity",
+    "total_liabilities",
+    "cash_and_bank_balances",
+    "securities",
+    "receivables",
+    "fixed_assets",
+    "retained_earnings",
+    "retained_earnings_subitem",
+    "total_assets",
+)
+
+INDICATORS = (
+    "working_capital",
+    "debt_to_equity_ratio",
+    "equity_ratio",
+    "current_ratio",
+    "cash_ratio",
+    "quick_ratio",
+    "fixed_asset_coverage",
+    "profit_loss",
+)
+
+TRENDS = (
+    "asset_growth_rate",
+    "equity_growth_rate",
+    "profit_loss_development",
+    "equity_ratio_trend",
+    "total_assets_trend",
+    "working_capital_trend",
+    "current_ratio_development",
+    "debt_to_equity_trend",
+)
+
+# Level codes, NONE marks an indicator that couldn't be calculated
+NONE, LOW, MEDIUM, HIGH = -1, 0, 1, 2
+LEVEL_NAMES = {LOW: "L", MEDIUM: "M", HIGH: "H"}
+
+
+def financial_arrays(
+    companies: Sequence[Sequence[dict]],
+) -> tuple[dict[str, np.ndarray], np.ndarray]:
+    """
+    Packs the financial years of many companies into (companies, years) arrays.
+    Returns the fields and the valid mask.
+    """
+    width = max((len(years) for years in companies), default=0)
+
+    fields = {
+        field: np.zeros((len(companies), width), dtype=np.float64)
+        for field in INPUT_FIELDS
+    }
+    valid = np.zeros((len(companies), width), dtype=bool)
+
+    for i, years in enumerate(companies):
+        valid[i, : len(years)] = True
+        for field, array in fields.items():
+            array[i, : len(years)] = [year[field] for year in years]
+
+    return fields, valid
+
+
+def _level(low: np.ndarray, medium: np.ndarray) -> np.ndarray:
+    return np.where(low, LOW, np.where(medium, MEDIUM, HIGH)).astype(np.int8)
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # No ratio for a zero denominator, and a ratio of exactly 0 counts as missing as well
+    value = np.divide(
+        numerator,
+        denominator,
+        out=np.zeros_like(numerator),
+        where=denominator != 0,
+    )
+    return value, (denominator != 0) & (value != 0)
+
+
+def _growth(prev: np.ndarray, curr: np.ndarray, present: np.ndarray):
+    value = np.divide(curr - prev, prev, out=np.zeros_like(curr), where=prev != 0)
+    return value, present & (prev != 0)
+
+
+def compute_indicators(
+    fields: Mapping[str, np.ndarray], valid: np.ndarray | None = None
+) -> dict:
+    """
+    Returns:
+    {
+        quick_assets: array,
+        indicators: {name: (values, levels)},   // level NONE where the indicator is null
+        trends: {name: (values, present)}       // the first year never has trends
+    }
+    All arrays have the (companies, years) shape of the input.
+    """
+    f = {field: np.asarray(fields[field], dtype=np.float64) for field in INPUT_FIELDS}
+    shape = f["equity"].shape
+    if valid is None:
+        valid = np.ones(shape, dtype=bool)
+
+    quick_assets = f["cash_and_bank_balances"] + f["securities"] + f["receivables"]
+
+    indicators = {}
+
+    def add(name, value, levels, present=True):
+        # Missing indicators (and padding) get the NONE level
+        indicators[name] = (value, np.where(present & valid, levels, NONE).astype(np.int8))
+
+    value = f["current_assets"] - f["deferred_income"]
+    add("working_capital", value, _level(value > 0, False))
+
+    value, present = _ratio(f["liabilities"], f["equity"])
+    add("debt_to_equity_ratio", value, _level(value < 1, value <= 2), present)
+
+    value, present = _ratio(f["equity"], f["total_liabilities"])  # wrong
+    add("equity_ratio", value, _level(value > 0.50, value >= 0.25), present)
+
+    value, present = _ratio(f["current_assets"], f["deferred_income"])
+    add("current_ratio", value, _level(value > 2, value >= 1), present)
+
+    value, present = _ratio(f["cash_and_bank_balances"], f["deferred_income"])
+    add("cash_ratio", value, _level(value > 1, value >= 0.2), present)
+
+    value, present = _ratio(quick_assets, f["deferred_income"])
+    add("quick_ratio", value, _level(value > 1, value >= 0.5), present)
+
+    value, present = _ratio(f["equity"], f["fixed_assets"])
+    add("fixed_asset_coverage", value, _level(value > 1.00, value >= 0.50), present)
+
+    value = f["retained_earnings"] - f["retained_earnings_subitem"]
+    add("profit_loss", value, _level(value >= 0, False))
+
+    # Trends compare every year with the one before, so they are shifted by a year
+    pairs = valid[:, 1:] & valid[:, :-1]
+
+    def raw(field):
+        return f[field][:, :-1], f[field][:, 1:], pairs & (f[field][:, :-1] != 0) & (
+            f[field][:, 1:] != 0
+        )
+
+    def indicator(name):
+        values, levels = indicators[name]
+        return (
+            values[:, :-1],
+            values[:, 1:],
+            pairs & (levels[:, :-1] != NONE) & (levels[:, 1:] != NONE),
+        )
+
+    shifted = {}
+
+    prev, curr, present = raw("total_assets")
+    shifted["asset_growth_rate"] = _growth(prev, curr, present)
+    prev, curr, present = raw("equity")
+    shifted["equity_growth_rate"] = _growth(prev, curr, present)
+    prev, curr, present = indicator("profit_loss")
+    shifted["profit_loss_development"] = _growth(prev, curr, present)
+
+    prev, curr, present = indicator("equity_ratio")
+    shifted["equity_ratio_trend"] = (prev - curr, present)
+    prev, curr, present = raw("total_assets")
+    shifted["total_assets_trend"] = (prev - curr, present)
+    prev, curr, present = indicator("working_capital")
+    shifted["working_capital_trend"] = (prev - curr, present)
+    prev, curr, present = indicator("current_ratio")
+    shifted["current_ratio_development"] = (prev - curr, present)
+    prev, curr, present = indicator("debt_to_equity_ratio")
+    shifted["debt_to_equity_trend"] = (prev - curr, present)
+
+    trends = {}
+    for name, (value, present) in shifted.items():
+        padded_value = np.zeros(shape, dtype=np.float64)
+        padded_present = np.zeros(shape, dtype=bool)
+        padded_value[:, 1:] = value
+        padded_present[:, 1:] = present
+        trends[name] = (padded_value, padded_present)
+
+    return {"quick_assets": quick_assets, "indicators": indicators, "trends": trends}
+
+
+def score_companies(companies: Sequence[Sequence[dict]]) -> list[list[dict]]:
+    """
+    Calculates quick_assets, indicators and trends for every financial year of every company,
+    in the format of company_information.extract_company_data.
+    """
+    fields, valid = financial_arrays(companies)
+    result = compute_indicators(fields, valid)
+
+    # Converting whole arrays once is a lot cheaper than indexing numpy scalars
+    quick_assets = result["quick_assets"].tolist()
+    indicators = {
+        name: (values.tolist(), levels.tolist())
+        for name, (values, levels) in result["indicators"].items()
+    }
+    trends = {
+        name: (values.tolist(), present.tolist())
+        for name, (values, present) in result["trends"].items()
+    }
+
+    scored = []
+    for i, years in enumerate(companies):
+        company = []
+        for j in range(len(years)):
+            company.append(
+                {
+                    "quick_assets": quick_assets[i][j],
+                    "indicators": {
+                        name: (
+                            {"value": values[i][j], "level": LEVEL_NAMES[levels[i][j]]}
+                            if levels[i][j] != NONE
+                            else None
+                        )
+                        for name, (values, levels) in indicators.items()
+                    },
+                    "trends": (
+                        {
+                            name: values[i][j] if present[i][j] else None
+                            for name, (values, present) in trends.items()
+                        }
+                        if j
+                        else None
+                    ),
+                }
+            )
+        scored.append(company)
+
+    return scored
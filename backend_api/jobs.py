@@ -0,0 +1,378 @@
+"""
+Durable background jobs that load a list of companies (e.g. the neighbours of a company).
+
+Jobs and their items live in a SQLite file, so a restart (or a crashed worker) only
+loses the companies that were in flight: a job whose heartbeat stops is claimed again
+and continues with the items that aren't done yet. Every worker process claims jobs
+from the same file.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Awaitable, Callable
+
+from .metrics import Counter
+
+job_items = Counter(
+    "bizray_job_items_total",
+    "Companies processed by background jobs: done, retried and failed (after the last attempt)",
+    ("kind", "result"),
+)
+
+FINISHED = ("done", "failed")
+
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._db: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Called with _lock held
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(
+                self.path, check_same_thread=False, timeout=10, isolation_level=None
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    planned INTEGER NOT NULL DEFAULT 0,
+                    owner TEXT,
+                    heartbeat REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+                CREATE TABLE IF NOT EXISTS job_items (
+                    job_id TEXT NOT NULL,
+                    fnr TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    PRIMARY KEY (job_id, fnr)
+                );
+                """
+            )
+            self._db = db
+        return self._db
+
+    def submit(self, kind: str, target: str) -> str:
+        """
+        Id of a new job, or of the queued/running job for the same kind and target
+        """
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    "SELECT id FROM jobs WHERE kind = ? AND target = ? AND status IN ('queued', 'running')",
+                    (kind, target),
+                ).fetchone()
+                if row:
+                    id = row[0]
+                else:
+                    id = uuid.uuid4().hex
+                    now = time.time()
+                    db.execute(
+                        "INSERT INTO jobs (id, kind, target, status, created_at, updated_at)"
+                        " VALUES (?, ?, ?, 'queued', ?, ?)",
+                        (id, kind, target, now, now),
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            return id
+
+    def claim(self, owner: str, stale_after: float) -> dict | None:
+        """
+        Oldest queued job, or a running one whose worker stopped sending heartbeats
+        """
+        with self._lock:
+            db = self._connection()
+            now = time.time()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(
+                    """
+                    SELECT id, kind, target, planned FROM jobs
+                    WHERE status = 'queued' OR (status = 'running' AND heartbeat < ?)
+                    ORDER BY created_at LIMIT 1
+                    """,
+                    (now - stale_after,),
+                ).fetchone()
+                if row:
+                    db.execute(
+                        "UPDATE jobs SET status = 'running', owner = ?, heartbeat = ?, updated_at = ? WHERE id = ?",
+                        (owner, now, now, row[0]),
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+        id, kind, target, planned = row
+        return {"id": id, "kind": kind, "target": target, "planned": bool(planned)}
+
+    def plan(self, id: str, fnrs: list[str]):
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN")
+            db.executemany(
+                "INSERT OR IGNORE INTO job_items (job_id, fnr, status) VALUES (?, ?, 'pending')",
+                [(id, fnr) for fnr in fnrs],
+            )
+            db.execute(
+                "UPDATE jobs SET planned = 1, updated_at = ? WHERE id = ?", (time.time(), id)
+            )
+            db.execute("COMMIT")
+
+    def pending(self, id: str) -> list[tuple[str, int]]:
+        with self._lock:
+            return (
+                self._connection()
+                .execute(
+                    "SELECT fnr, attempts FROM job_items WHERE job_id = ? AND status = 'pending'",
+                    (id,),
+                )
+                .fetchall()
+            )
+
+    def update_item(self, id: str, fnr: str, status: str, attempts: int, error: str | None):
+        with self._lock:
+            db = self._connection()
+            now = time.time()
+            db.execute("BEGIN")
+            db.execute(
+                "UPDATE job_items SET status = ?, attempts = ?, error = ? WHERE job_id = ? AND fnr = ?",
+                (status, attempts, error, id, fnr),
+            )
+            db.execute(
+                "UPDATE jobs SET heartbeat = ?, updated_at = ? WHERE id = ?", (now, now, id)
+            )
+            db.execute("COMMIT")
+
+    def heartbeat(self, id: str):
+        with self._lock:
+            self._connection().execute(
+                "UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time(), id)
+            )
+
+    def finish(self, id: str, status: str, error: str | None = None):
+        with self._lock:
+            self._connection().execute(
+                "UPDATE jobs SET status = ?, error = ?, owner = NULL, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), id),
+            )
+
+    def get(self, id: str) -> dict | None:
+        with self._lock:
+            db = self._connection()
+            row = db.execute(
+                "SELECT id, kind, target, status, created_at, updated_at, error FROM jobs WHERE id = ?",
+                (id,),
+            ).fetchone()
+            if row is None:
+                return None
+            counts = dict(
+                db.execute(
+                    "SELECT status, count(*) FROM job_items WHERE job_id = ? GROUP BY status",
+                    (id,),
+                ).fetchall()
+            )
+            failures = db.execute(
+                "SELECT fnr, error FROM job_items WHERE job_id = ? AND status = 'failed' LIMIT 20",
+                (id,),
+            ).fetchall()
+
+        id, kind, target, status, created_at, updated_at, error = row
+        return {
+            "id": id,
+            "kind": kind,
+            "target": target,
+            "status": status,
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "error": error,
+            "total": sum(counts.values()),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "pending": counts.get("pending", 0),
+            "failures": [{"fnr": fnr, "error": error} for fnr, error in failures],
+        }
+
+
+class JobManager:
+    """
+    kinds maps a job kind to a coroutine listing the FNRs of a target,
+    process loads one company. At most concurrency companies are processed at once over
+    all jobs, each gets up to retries attempts with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        kinds: dict[str, Callable[[str], Awaitable[list[str]]]],
+        process: Callable[[str], Awaitable],
+        workers: int,
+        concurrency: int,
+        retries: int,
+        stale_after: float,
+        backoff: float = 1.0,
+    ):
+        self.store = store
+        self.kinds = kinds
+        self.process = process
+        self.workers = workers
+        self.concurrency = concurrency
+        self.retries = retries
+        self.stale_after = stale_after
+        self.backoff = backoff
+
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._tasks: list[asyncio.Task] = []
+        self._semaphore: asyncio.Semaphore | None = None
+        self._wake: asyncio.Event | None = None
+        self._changed: asyncio.Event | None = None
+
+    def start(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._wake = asyncio.Event()
+        self._changed = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _notify(self):
+        # Wakes everybody waiting for a change, the next waiters get a new event
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def submit(self, kind: str, target: str) -> dict:
+        if kind not in self.kinds:
+            raise ValueError(f"Unknown job kind '{kind}'")
+
+        id = await asyncio.to_thread(self.store.submit, kind, target)
+        self._wake.set()
+        return await asyncio.to_thread(self.store.get, id)
+
+    async def get(self, id: str) -> dict | None:
+        return await asyncio.to_thread(self.store.get, id)
+
+    async def watch(self, id: str, poll: float = 1.0) -> AsyncIterator[dict]:
+        """
+        The state of job id every time it changes, until it is finished.
+        Also polls, the job may run in another worker process.
+        """
+        previous = None
+        while True:
+            changed = self._changed
+            job = await self.get(id)
+            if job is None:
+                return
+            if job != previous:
+                yield job
+                previous = job
+            if job["status"] in FINISHED:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), poll)
+            except asyncio.TimeoutError:
+                pass
+
+    async def wait(self, id: str) -> dict | None:
+        job = None
+        async for job in self.watch(id):
+            pass
+        return job
+
+    async def _work(self):
+        while True:
+            job = await asyncio.to_thread(self.store.claim, self.owner, self.stale_after)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), 1.0)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+
+            heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+            try:
+                await self._run(job)
+            except Exception as e:
+                await asyncio.to_thread(self.store.finish, job["id"], "failed", str(e))
+            finally:
+                heartbeat.cancel()
+                self._notify()
+
+    async def _heartbeat(self, id: str):
+        while True:
+            await asyncio.sleep(self.stale_after / 3)
+            await asyncio.to_thread(self.store.heartbeat, id)
+
+    async def _run(self, job: dict):
+        if not job["planned"]:
+            targets = await self._attempt(lambda: self.kinds[job["kind"]](job["target"]))
+            await asyncio.to_thread(self.store.plan, job["id"], list(dict.fromkeys(targets)))
+            self._notify()
+
+        pending = await asyncio.to_thread(self.store.pending, job["id"])
+        await asyncio.gather(
+            *(self._item(job, fnr, attempts) for fnr, attempts in pending)
+        )
+        await asyncio.to_thread(self.store.finish, job["id"], "done")
+
+    async def _attempt(self, fn: Callable[[], Awaitable], attempts: int = 0):
+        while True:
+            try:
+                return await fn()
+            except Exception:
+                attempts += 1
+                if attempts >= self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** (attempts - 1))
+
+    async def _item(self, job: dict, fnr: str, attempts: int):
+        while True:
+            try:
+                async with self._semaphore:
+                    await self.process(fnr)
+            except Exception as e:
+                attempts += 1
+                status = "failed" if attempts >= self.retries else "pending"
+                job_items.inc(kind=job["kind"], result="failed" if status == "failed" else "retried")
+                await asyncio.to_thread(
+                    self.store.update_item, job["id"], fnr, status, attempts, str(e)
+                )
+                self._notify()
+                if status == "failed":
+                    return
+                await asyncio.sleep(self.backoff * 2 ** (attempts - 1))
+                continue
+
+            job_items.inc(kind=job["kind"], result="done")
+            await asyncio.to_thread(
+                self.store.update_item, job["id"], fnr, "done", attempts + 1, None
+            )
+            self._notify()
+            return
@@ -1,121 +1,368 @@
+import asyncio
 import base64
-import re
-from fastapi import FastAPI, HTTPException
+import json
+from contextlib import asynccontextmanager
+from fastapi import Body, FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from zeep.exceptions import Fault
 
-from .search import search
+from . import client, graph_projection, metrics, suggest
+from .config import (
+    TIMING_HEADER,
+    SUGGEST_REFRESH,
+    SUGGEST_MAX_LIMIT,
+    SCREEN_MAX_TERMS,
+    JOBS_PATH,
+    JOB_WORKERS,
+    JOB_CONCURRENCY,
+    JOB_RETRIES,
+    JOB_STALE_AFTER,
+    NEIGHBOURS_PAGE_SIZE,
+    NEIGHBOURS_MAX_PAGE,
+    SUBGRAPH_MAX_DEPTH,
+    SUBGRAPH_MAX_NODES,
+    SUBGRAPH_MAX_FANOUT,
+    GRAPH_REFRESH,
+    GRAPH_MAX_DEPTH,
+    GRAPH_MAX_DEGREE,
+    PATH_MAX_RESULTS,
+    REACH_MAX_RESULTS,
+)
+from .jobs import JobManager, JobStore
+from .screen import screen
+from .search import search, format_company_fnr
 from .company_information import get_document_data
-from .NETWORK import GET_COMPANY, GET_NEIGHBOURS, GET_ADJ
+from .NETWORK import (
+    GET_COMPANY,
+    GET_NEIGHBOURS,
+    GET_ADJ,
+    GET_EDGES,
+    GET_NETWORK_RISK,
+    GET_SUBGRAPH,
+    NODE_KEYS,
+    company_refreshes,
+    driver,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Built in the background, /suggest answers with nothing until the first build is done
+    suggest_task = asyncio.create_task(suggest.keep_fresh(SUGGEST_REFRESH))
+    graph_task = asyncio.create_task(graph_projection.keep_fresh(GET_EDGES, GRAPH_REFRESH))
+    client_task = asyncio.create_task(client.start())
+    # Also picks up the jobs that were running when the app stopped
+    jobs.start()
+    yield
+    suggest_task.cancel()
+    graph_task.cancel()
+    client_task.cancel()
+    await jobs.close()
+    await company_refreshes.close()
+    await client.close()
+    await driver.close()
 
 
 # Boot: uvicorn backend_api.main:app --reload
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def add_timing_header(request: Request, call_next):
+    if not TIMING_HEADER:
+        return await call_next(request)
+
+    timings = metrics.start_request_timing()
+    response = await call_next(request)
+    if timings:
+        response.headers["Server-Timing"] = metrics.server_timing(timings)
+    return response
 
 
 @app.get("/")
-def confirm_connection():
+async def confirm_connection():
     return {
         "Status": "Active",
         "Available endpoints": [
             "/search/{term}",
+            "/suggest?q=term",
             "/view/{company_fnr}",
-            "/node/{node_id}?label=Label",
+            "POST /screen",
+            "POST /jobs/enrich/{company_id}",
+            "POST /jobs/repopulate",
+            "/jobs/{job_id}",
+            "/jobs/{job_id}/events",
+            "/node/{node_id}?label=Label&limit=100&cursor=&order=",
+            "/subgraph/{node_id}?label=Label&depth=2&limit=200",
+            "/graph/stats",
+            "/graph/{company_fnr}/reach?depth=4",
+            "/path/{company_fnr_a}/{company_fnr_b}?k=3&depth=6",
+            "/metrics",
         ],
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(
+        metrics.exposition(), media_type="text/plain; version=0.0.4"
+    )
+
+
 @app.get("/search/{term}")
-def search_companies(term: str, page: int):
+async def search_companies(term: str, page: int):
     try:
-        result = search(term, page)
+        result = await search(term, page)
         return {"result": result}
     except Fault as e:
         raise HTTPException(status_code=400, detail=e.message)
 
 
-def format_company_fnr(fnr):
-    fnr = fnr.strip()
-
-    match = re.fullmatch(r"(\d{1,6})(\w)", fnr)
-    if match:
-        return f"{match.group(1)} {match.group(2)}"
-
-    return fnr
+@app.get("/suggest")
+async def suggest_companies(q: str, limit: int = suggest.TOP):
+    # Answered from memory, never goes to SUCHEFIRMA
+    limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+    return {"result": suggest.suggest(q, limit)}
 
 
 @app.get("/view/{company_fnr}")
-def view_company(company_fnr: str):
+async def view_company(company_fnr: str):
     company_fnr = format_company_fnr(company_fnr)
 
-    company = GET_COMPANY(company_fnr)
+    company = await GET_COMPANY(company_fnr)
+    # Risk counts of the companies sharing an address or a manager, kept up to date in neo4j
+    company["network"] = await GET_NETWORK_RISK(company["basic_info"]["company_number"])
+
+    return {"result": company}
+
+
+@app.post("/screen")
+async def screen_companies(terms: list[str] = Body(...)):
     """
-    companies = GET_ADJ(company_fnr)
-    companies_masseverwalter = 0
-    companies_high_risk = 0
-    companies_medium_risk = 0
-    companies_low_risk = 0
-    print(len(companies))
-    for info in (GET_COMPANY(company["other"]["company_id"]) for company in companies):
-        print(f"looking at company {info["basic_info"]["company_number"]}")
-        if info["risk_indicators"]["has_masseverwalter"]:
-            companies_masseverwalter += 1
-        match info["risk_indicators"]["risk_level"]:
-            case "H":
-                companies_high_risk += 1
-            case "M":
-                companies_medium_risk += 1
-            case "L":
-                companies_low_risk += 1
-
-    company["network"] = {
-        "connected": len(companies),
-        "masseverwalter": companies_masseverwalter,
-        "high_risk": companies_high_risk,
-        "medium_risk": companies_medium_risk,
-        "low_risk": companies_low_risk,
-    }
+    Body: a JSON list of names and FNRs.
+    Streams one JSON line per distinct term as soon as it is screened.
     """
+    if len(terms) > SCREEN_MAX_TERMS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {SCREEN_MAX_TERMS} terms per request"
+        )
 
-    return {"result": company}
+    async def lines():
+        async for result in screen(terms):
+            yield json.dumps(result, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @app.get("/node/{node_id}")
-def get_node_neighbours(node_id: str, label: str):
-    neighbours = GET_NEIGHBOURS(node_id, label)
-    return {"neighbours": neighbours}
+async def get_node_neighbours(
+    node_id: str,
+    label: str,
+    limit: int = NEIGHBOURS_PAGE_SIZE,
+    cursor: str | None = None,
+    order: str | None = None,
+    include_sentinels: bool = False,
+):
+    """
+    One page of neighbours, pass next_cursor of the answer as cursor for the next one.
+    order: id, risk (high risk first) or sample
+    """
+    if label not in NODE_KEYS:
+        raise HTTPException(status_code=400, detail=f"Label must be in {list(NODE_KEYS)}")
+    if order not in (None, "id", "risk", "sample"):
+        raise HTTPException(status_code=400, detail="Order must be id, risk or sample")
+
+    try:
+        return await GET_NEIGHBOURS(
+            node_id,
+            label,
+            limit=max(1, min(limit, NEIGHBOURS_MAX_PAGE)),
+            cursor=cursor,
+            order=order,
+            include_sentinels=include_sentinels,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@app.get("/subgraph/{node_id}")
+async def get_subgraph(
+    node_id: str,
+    label: str = "Company",
+    depth: int = 2,
+    limit: int = 200,
+    fanout: int = 25,
+    labels: str = "Company,Manager,Address",
+):
+    """
+    The neighbourhood of a node up to depth hops in one request.
+    labels: comma separated node labels to include
+    """
+    included = [name for name in labels.split(",") if name in NODE_KEYS]
+    if label not in NODE_KEYS or not included:
+        raise HTTPException(status_code=400, detail=f"Labels must be in {list(NODE_KEYS)}")
+
+    return {
+        "result": await GET_SUBGRAPH(
+            node_id,
+            label,
+            depth=max(1, min(depth, SUBGRAPH_MAX_DEPTH)),
+            limit=max(1, min(limit, SUBGRAPH_MAX_NODES)),
+            fanout=max(1, min(fanout, SUBGRAPH_MAX_FANOUT)),
+            labels=included,
+        )
+    }
+
+
+def get_projection():
+    projection = graph_projection.graph_projection
+    if projection is None:
+        raise HTTPException(status_code=503, detail="The graph projection is still being built")
+    return projection
+
+
+@app.get("/graph/stats")
+async def get_graph_stats():
+    return {"result": get_projection().stats()}
+
+
+@app.get("/graph/{company_fnr}/reach")
+async def get_reach(company_fnr: str, depth: int = 4, limit: int = 100):
+    """
+    Companies connected to a company within depth hops (closest first) and the size of its cluster
+    """
+    projection = get_projection()
+    node = projection.ids.get(f"Company:{format_company_fnr(company_fnr)}")
+    if node is None:
+        raise HTTPException(status_code=404, detail="Company not in the graph")
+
+    with metrics.span("graph_reach"):
+        reach = await asyncio.to_thread(
+            projection.reach,
+            node,
+            max(1, min(depth, GRAPH_MAX_DEPTH)),
+            max_degree=GRAPH_MAX_DEGREE,
+            limit=max(1, min(limit, REACH_MAX_RESULTS)),
+        )
+    return {"result": reach}
+
+
+@app.get("/path/{company_fnr_a}/{company_fnr_b}")
+async def get_path(company_fnr_a: str, company_fnr_b: str, k: int = 1, depth: int = GRAPH_MAX_DEPTH):
+    """
+    The k shortest connections between two companies over shared managers and addresses
+    """
+    projection = get_projection()
+    nodes = []
+    for fnr in (company_fnr_a, company_fnr_b):
+        node = projection.ids.get(f"Company:{format_company_fnr(fnr)}")
+        if node is None:
+            raise HTTPException(status_code=404, detail=f"Company '{fnr}' not in the graph")
+        nodes.append(node)
+
+    depth = max(1, min(depth, GRAPH_MAX_DEPTH))
+    with metrics.span("graph_path"):
+        paths = await asyncio.to_thread(
+            projection.paths,
+            *nodes,
+            k=max(1, min(k, PATH_MAX_RESULTS)),
+            max_depth=depth,
+            max_degree=GRAPH_MAX_DEGREE,
+        )
+
+    return {
+        "result": {
+            "depth": depth,
+            "paths": [
+                {
+                    "length": len(path) - 1,
+                    "nodes": [
+                        {"id": projection.keys[i], "label": projection.keys[i].split(":", 1)[0]}
+                        for i in path
+                    ],
+                }
+                for path in paths
+            ],
+        }
+    }
 
 
 @app.get("/document/{document_id}")
-def get_document(document_id: str):
-    pdf_bytes = get_document_data(document_id)
+async def get_document(document_id: str):
+    pdf_bytes = await get_document_data(document_id)
     encoded = base64.b64encode(pdf_bytes).decode("utf-8")
     return {"result": encoded}
 
 
-@app.get("/repopulate")
-def repop():
-    for i in company_ids:
-        view_company(i)
+async def neighbour_ids(company_id: str) -> list[str]:
+    # The company itself and every company sharing an address or a manager with it
+    return [company_id] + [row["other"]["company_id"] for row in await GET_ADJ(company_id)]
 
 
-@app.post("/enrich/neighbours/{company_id}")
-def enrich_neighbours(company_id: str):
-    neighbours = GET_ADJ(company_id)
+async def repopulation_ids(_: str) -> list[str]:
+    return company_ids
+
+
+jobs = JobManager(
+    JobStore(JOBS_PATH),
+    kinds={"enrich": neighbour_ids, "repopulate": repopulation_ids},
+    process=view_company,
+    workers=JOB_WORKERS,
+    concurrency=JOB_CONCURRENCY,
+    retries=JOB_RETRIES,
+    stale_after=JOB_STALE_AFTER,
+)
 
-    enriched = 0
-    failed = 0
 
-    # include center + neighbours
-    targets = [company_id] + neighbours
+@app.post("/jobs/enrich/{company_id}")
+async def submit_enrichment(company_id: str):
+    return {"result": await jobs.submit("enrich", company_id)}
 
-    for cid in targets:
-        try:
-            view_company(cid)
-            enriched += 1
-        except Exception as e:
-            failed += 1
 
-    return {"center": company_id, "enriched": enriched, "failed": failed}
+@app.post("/jobs/repopulate")
+async def submit_repopulation():
+    return {"result": await jobs.submit("repopulate", "company_ids")}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"result": job}
+
+
+@app.get("/jobs/{job_id}/events")
+async def watch_job(job_id: str):
+    """
+    One JSON line with the job state on every change, until it is finished
+    """
+    if await jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def lines():
+        async for job in jobs.watch(job_id):
+            yield json.dumps(job) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# Kept for existing callers: submit the job and answer when it is finished
+@app.get("/repopulate")
+async def repop():
+    job = await jobs.submit("repopulate", "company_ids")
+    return {"result": await jobs.wait(job["id"])}
+
+
+@app.post("/enrich/neighbours/{company_id}")
+async def enrich_neighbours(company_id: str):
+    job = await jobs.wait((await jobs.submit("enrich", company_id))["id"])
+    return {
+        "center": company_id,
+        "enriched": job["done"],
+        "failed": job["failed"],
+        "job": job["id"],
+    }
 
 
 # to repopulate
@@ -0,0 +1,376 @@
+"""
+Local company name index, built by database/builddb.py from the bulk Auszug export.
+
+A SQLite file with a token table (words of the folded name, searched by prefix) and a
+trigram table (for misspelled queries). Only depends on the standard library so the
+ingestion script can use it without the rest of the backend.
+"""
+
+import heapq
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# Bumped when the file layout changes, older files are ignored until rebuilt
+FORMAT = "2"
+# A query word like "b" matches thousands of words, only the most frequent are searched
+MAX_PREFIX_TOKENS = 64
+# Candidates of the rarest query word checked against the others, at most
+MAX_CANDIDATES = 10000
+CANDIDATE_CHUNK = 500
+# Postings read by the misspelling search, its rarest trigrams are used until this is reached
+MAX_GRAM_POSTINGS = 50000
+
+_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+# Runs of str.isalnum() characters
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _strip_accents(text: str) -> str:
+    if text.isascii():
+        return text
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c)
+    )
+
+
+def _words(text: str) -> list[str]:
+    return _WORD.findall(text)
+
+
+def fold(text: str) -> str:
+    """
+    Case and umlaut folding: "Müller & Söhne GmbH" -> "mueller soehne gmbh"
+    """
+    return " ".join(_words(_strip_accents(text.lower().translate(_UMLAUTS))))
+
+
+def token_variants(word: str) -> set[str]:
+    """
+    Müller is written Mueller and Muller, so both spellings are indexed and searched
+    """
+    word = word.lower()
+    return {
+        fold(word),
+        " ".join(_words(_strip_accents(word.replace("ß", "ss")))),
+    } - {""}
+
+
+def trigrams(folded: str) -> set[str]:
+    padded = f"  {folded} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndexWriter:
+    """
+    Builds a new index next to path and swaps it in with finish(),
+    readers keep using the previous index until then.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.building_path = f"{path}.building"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(self.building_path):
+            os.remove(self.building_path)
+
+        self._db = sqlite3.connect(self.building_path)
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.executescript(
+            """
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE companies (
+                id INTEGER PRIMARY KEY,
+                fnr TEXT NOT NULL,
+                name TEXT NOT NULL,
+                location TEXT,
+                status TEXT NOT NULL,
+                words TEXT NOT NULL
+            );
+            CREATE TABLE tokens (token TEXT NOT NULL, company INTEGER NOT NULL);
+            CREATE TABLE trigrams (gram TEXT NOT NULL, company INTEGER NOT NULL);
+            """
+        )
+        self._next_id = 1
+
+    def add(self, companies: list[dict]):
+        """
+        companies: [{fnr, name, location, status}, ...]
+        """
+        company_rows, token_rows, trigram_rows = [], [], []
+        for company in companies:
+            if not company["fnr"] or not company["name"]:
+                continue
+
+            id = self._next_id
+            self._next_id += 1
+            words = {
+                variant for word in _words(company["name"]) for variant in token_variants(word)
+            }
+            company_rows.append(
+                (
+                    id,
+                    company["fnr"],
+                    company["name"],
+                    company["location"],
+                    company["status"],
+                    "".join(f" {word}" for word in sorted(words)),
+                )
+            )
+            token_rows.extend((word, id) for word in words)
+            trigram_rows.extend((gram, id) for gram in trigrams(fold(company["name"])))
+
+        self._db.executemany("INSERT INTO companies VALUES (?, ?, ?, ?, ?, ?)", company_rows)
+        self._db.executemany("INSERT INTO tokens VALUES (?, ?)", token_rows)
+        self._db.executemany("INSERT INTO trigrams VALUES (?, ?)", trigram_rows)
+        self._db.commit()
+
+    def finish(self):
+        # Company ids become their rank (active first, then shorter names), so every posting
+        # list is stored best first and a search can stop after limit results.
+        # Indexes are cheaper to build once after the bulk load, postings are inserted in
+        # key order so the b-trees are appended to.
+        self._db.executescript(
+            """
+            CREATE TEMP TABLE ranks AS
+                SELECT id AS old, row_number() OVER (
+                    ORDER BY status = 'deleted', length(name), name, id
+                ) AS rank
+                FROM companies;
+            CREATE UNIQUE INDEX temp.ranks_old ON ranks (old);
+
+            CREATE TABLE ranked (
+                id INTEGER PRIMARY KEY,
+                fnr TEXT NOT NULL,
+                name TEXT NOT NULL,
+                location TEXT,
+                status TEXT NOT NULL,
+                words TEXT NOT NULL
+            );
+            INSERT INTO ranked SELECT rank, fnr, name, location, status, words
+                FROM companies JOIN ranks ON old = id ORDER BY rank;
+
+            CREATE TABLE token_postings (
+                token TEXT NOT NULL, company INTEGER NOT NULL, PRIMARY KEY (token, company)
+            ) WITHOUT ROWID;
+            INSERT OR IGNORE INTO token_postings SELECT token, rank
+                FROM tokens JOIN ranks ON old = company ORDER BY token, rank;
+            CREATE TABLE token_counts (token TEXT PRIMARY KEY, n INTEGER NOT NULL) WITHOUT ROWID;
+            INSERT INTO token_counts SELECT token, count(*) FROM token_postings GROUP BY token;
+
+            CREATE TABLE gram_postings (
+                gram TEXT NOT NULL, company INTEGER NOT NULL, PRIMARY KEY (gram, company)
+            ) WITHOUT ROWID;
+            INSERT OR IGNORE INTO gram_postings SELECT gram, rank
+                FROM trigrams JOIN ranks ON old = company ORDER BY gram, rank;
+            CREATE TABLE gram_counts (gram TEXT PRIMARY KEY, n INTEGER NOT NULL) WITHOUT ROWID;
+            INSERT INTO gram_counts SELECT gram, count(*) FROM gram_postings GROUP BY gram;
+
+            DROP TABLE companies;
+            DROP TABLE tokens;
+            DROP TABLE trigrams;
+            ALTER TABLE ranked RENAME TO companies;
+            CREATE INDEX companies_fnr ON companies (fnr);
+            """
+        )
+        self._db.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [("built_at", str(time.time())), ("format", FORMAT)],
+        )
+        self._db.commit()
+        self._db.execute("ANALYZE")
+        self._db.execute("VACUUM")
+        self._db.close()
+        os.replace(self.building_path, self.path)
+
+    def abort(self):
+        self._db.close()
+        os.remove(self.building_path)
+
+
+class NameIndex:
+    """
+    Read side of the index, safe to share between threads (every thread has its own
+    connection, so searches run in parallel). Picks up a rebuilt index file automatically.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self.built_at: float | None = None
+
+    def _connection(self) -> sqlite3.Connection | None:
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+
+        local = self._local
+        if getattr(local, "inode", None) != inode:
+            if getattr(local, "db", None) is not None:
+                local.db.close()
+            db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            meta = dict(db.execute("SELECT key, value FROM meta").fetchall())
+            # An index from before the ranked postings is treated as missing until rebuilt
+            local.db = db if meta.get("format") == FORMAT else None
+            local.inode = inode
+            self.built_at = float(meta["built_at"]) if local.db and "built_at" in meta else None
+        return local.db
+
+    def is_fresh(self, max_age: float) -> bool:
+        if self._connection() is None or self.built_at is None:
+            return False
+        return time.time() - self.built_at < max_age
+
+    def companies(self) -> list[dict]:
+        """
+        Every indexed company: [{fnr, name, location, status}, ...]
+        """
+        db = self._connection()
+        if db is None:
+            return []
+        rows = db.execute("SELECT fnr, name, location, status FROM companies").fetchall()
+
+        return [
+            {"fnr": fnr, "name": name, "location": location, "status": status}
+            for fnr, name, location, status in rows
+        ]
+
+    def search(self, term: str, limit: int) -> list[dict]:
+        """
+        Companies whose name has a word starting with every word of term,
+        or when there is none, names sharing most trigrams with term.
+        Results have the format of search.search_by_name.
+        """
+        words = [token_variants(word) for word in _words(term)]
+        words = [variants for variants in words if variants]
+        if not words:
+            return []
+
+        db = self._connection()
+        if db is None:
+            return []
+
+        rows = self._search_tokens(db, words, limit) or self._search_trigrams(db, term, limit)
+        return [
+            {"fnr": fnr, "status": status, "name": [name], "location": location}
+            for _, fnr, name, location, status in rows
+        ]
+
+    def _prefix_tokens(self, db: sqlite3.Connection, variants: set[str]) -> list[tuple[str, int]]:
+        # The indexed words starting with any spelling of a query word, most frequent first
+        tokens = {}
+        for variant in variants:
+            tokens.update(
+                db.execute(
+                    "SELECT token, n FROM token_counts WHERE token >= ? AND token < ?",
+                    (variant, variant + "\U0010ffff"),
+                ).fetchall()
+            )
+        return sorted(tokens.items(), key=lambda item: -item[1])[:MAX_PREFIX_TOKENS]
+
+    def _search_tokens(
+        self, db: sqlite3.Connection, words: list[set[str]], limit: int
+    ) -> list[tuple]:
+        """
+        The rarest word of the query yields the candidates in rank order, the other words
+        are checked on their indexed words. Stops after limit results or MAX_CANDIDATES.
+        """
+        tokens = [self._prefix_tokens(db, variants) for variants in words]
+        if not all(tokens):
+            return []
+        rarest = min(range(len(words)), key=lambda i: sum(n for _, n in tokens[i]))
+        others = [
+            [f" {variant}" for variant in variants]
+            for i, variants in enumerate(words)
+            if i != rarest
+        ]
+
+        # Every posting list is in rank order, merged they are too
+        candidates = _unique(heapq.merge(*(_postings(db, token) for token, _ in tokens[rarest])))
+
+        ids = []
+        examined = 0
+        while len(ids) < limit and examined < MAX_CANDIDATES:
+            chunk = list(itertools.islice(candidates, CANDIDATE_CHUNK))
+            if not chunk:
+                break
+            examined += len(chunk)
+            found = db.execute(
+                f"SELECT id, words FROM companies WHERE id IN ({','.join('?' * len(chunk))})"
+                f" ORDER BY id",
+                chunk,
+            ).fetchall()
+            ids += [id for id, words in found if _matches(words, others)]
+        if not ids:
+            return []
+
+        ids = ids[:limit]
+        return db.execute(
+            f"SELECT id, fnr, name, location, status FROM companies"
+            f" WHERE id IN ({','.join('?' * len(ids))}) ORDER BY id",
+            ids,
+        ).fetchall()
+
+    def _search_trigrams(self, db: sqlite3.Connection, term: str, limit: int) -> list[tuple]:
+        # Trigrams in a large part of all names ("gmb", " ge") say little about a misspelling
+        # and would make the GROUP BY read most of the table, the rarest ones are used
+        grams = tuple(trigrams(fold(term)))
+        counts = sorted(
+            db.execute(
+                f"SELECT gram, n FROM gram_counts WHERE gram IN ({','.join('?' * len(grams))})",
+                grams,
+            ).fetchall(),
+            key=lambda item: item[1],
+        )
+        rare, postings = [], 0
+        for gram, n in counts:
+            postings += n
+            if postings > MAX_GRAM_POSTINGS:
+                break
+            rare.append(gram)
+        if not rare:
+            return []
+        # Trigrams no name has (the misspelled ones) still count as part of the term
+        needed = max(1, int((len(grams) - (len(counts) - len(rare))) * 0.6))
+
+        return db.execute(
+            f"""
+            SELECT id, fnr, name, location, status FROM companies
+            JOIN (
+                SELECT company, count(*) AS shared FROM gram_postings
+                WHERE gram IN ({",".join("?" * len(rare))})
+                GROUP BY company
+                HAVING shared >= ?
+            ) ON id = company
+            ORDER BY shared DESC, id
+            LIMIT ?
+            """,
+            (*rare, needed, limit),
+        ).fetchall()
+
+
+def _postings(db: sqlite3.Connection, token: str):
+    for (company,) in db.execute(
+        "SELECT company FROM token_postings WHERE token = ? ORDER BY company", (token,)
+    ):
+        yield company
+
+
+def _unique(ids):
+    previous = None
+    for id in ids:
+        if id != previous:
+            yield id
+            previous = id
+
+
+def _matches(words: str, query: list[list[str]]) -> bool:
+    # Same rule as the token search: some indexed word of the name starts with every query word.
+    # words is " word word ...", so " prefix" is found at the start of a word only
+    return all(any(prefix in words for prefix in prefixes) for prefixes in query)
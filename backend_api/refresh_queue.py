@@ -0,0 +1,87 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from .metrics import Counter
+
+refreshes = Counter(
+    "bizray_refresh_queue_total",
+    "Background refreshes: queued, duplicate (already queued), dropped (queue full), done and failed",
+    ("queue", "result"),
+)
+
+
+class RefreshQueue:
+    """
+    Bounded queue of keys refreshed by a small pool of background workers.
+    A key that is already waiting or being refreshed is not queued again, and when the
+    queue is full new keys are dropped (the next stale read queues them again).
+    Workers start with the first submit on the running event loop.
+    """
+
+    def __init__(
+        self, name: str, refresh: Callable[[str], Awaitable], workers: int, max_size: int
+    ):
+        self.name = name
+        self.refresh = refresh
+        self.workers = workers
+        self.max_size = max_size
+
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._pending: set[str] = set()
+
+    def _start(self):
+        loop = asyncio.get_running_loop()
+        if self._tasks and self._tasks[0].get_loop() is loop:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._pending.clear()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    def submit(self, key: str) -> bool:
+        """
+        Queue key for a refresh, False if it is already pending or the queue is full
+        """
+        self._start()
+        if key in self._pending:
+            refreshes.inc(queue=self.name, result="duplicate")
+            return False
+
+        try:
+            self._queue.put_nowait(key)
+        except asyncio.QueueFull:
+            refreshes.inc(queue=self.name, result="dropped")
+            return False
+
+        self._pending.add(key)
+        refreshes.inc(queue=self.name, result="queued")
+        return True
+
+    def is_pending(self, key: str) -> bool:
+        return key in self._pending
+
+    async def _work(self):
+        while True:
+            key = await self._queue.get()
+            try:
+                await self.refresh(key)
+                refreshes.inc(queue=self.name, result="done")
+            except Exception as e:
+                refreshes.inc(queue=self.name, result="failed")
+                print(f"Background refresh of '{key}' failed: {e}")
+            finally:
+                self._pending.discard(key)
+                self._queue.task_done()
+
+    async def join(self):
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._pending.clear()
@@ -0,0 +1,100 @@
+"""
+Bulk screening of counterparties: a list of names and FNRs is resolved to companies
+and their risk glance, every result is handed out as soon as it is ready.
+"""
+
+import asyncio
+from typing import AsyncIterator
+
+from .config import SCREEN_CONCURRENCY
+from .metrics import Counter, span
+from .name_index import fold
+from .NETWORK import GET_COMPANY, get_risk_indicators
+from .search import SearchMode, check_name_search_cache, detect_search_mode, format_company_fnr
+
+screened = Counter(
+    "bizray_screened_total",
+    "Screened terms by outcome (found, not_found, error)",
+    ("result",),
+)
+
+# One budget for all screenings at once, so a big list can't take the whole upstream pool
+_budget: asyncio.Semaphore | None = None
+_budget_loop = None
+
+
+def _get_budget() -> asyncio.Semaphore:
+    global _budget, _budget_loop
+    loop = asyncio.get_running_loop()
+    if _budget is None or _budget_loop is not loop:
+        _budget = asyncio.Semaphore(SCREEN_CONCURRENCY)
+        _budget_loop = loop
+    return _budget
+
+
+def normalize(term: str) -> tuple[SearchMode, str]:
+    """
+    Spellings of the same company map to the same key:
+    "583360h" and "583360 H" are one FNR, "Signa Holding" and "SIGNA  holding" one name
+    """
+    mode = detect_search_mode(term)
+    if mode == SearchMode.FNR:
+        return mode, format_company_fnr(term).lower()
+    return mode, fold(term)
+
+
+def best_match(term: str, companies: list[dict]) -> dict | None:
+    # The exact name if it is there, active companies before deleted ones
+    folded = fold(term)
+    for company in companies:
+        if fold(" ".join(company["name"])) == folded:
+            return company
+    active = [company for company in companies if company["status"] == "active"]
+    return (active or companies or [None])[0]
+
+
+async def screen_one(term: str) -> dict:
+    mode, key = normalize(term)
+    result = {"query": term, "mode": mode.name.lower()}
+
+    async with _get_budget():
+        try:
+            with span("screen"):
+                if mode == SearchMode.FNR:
+                    fnr = key
+                else:
+                    companies = await check_name_search_cache(term)
+                    match = best_match(term, companies)
+                    if match is None:
+                        screened.inc(result="not_found")
+                        return {**result, "error": "No company found"}
+                    fnr = format_company_fnr(match["fnr"])
+                    result["candidates"] = len(companies)
+
+                result["fnr"] = fnr
+                result["glance"] = get_risk_indicators(await GET_COMPANY(fnr))
+        except Exception as e:
+            screened.inc(result="error")
+            return {**result, "error": str(e) or type(e).__name__}
+
+    screened.inc(result="found")
+    return result
+
+
+async def screen(terms: list[str]) -> AsyncIterator[dict]:
+    """
+    Results of every distinct term, in the order they finish
+    """
+    unique = {}
+    for term in terms:
+        if term.strip():
+            unique.setdefault(normalize(term), term.strip())
+
+    tasks = [asyncio.create_task(screen_one(term)) for term in unique.values()]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # The client went away, the rest isn't needed anymore
+        for task in tasks:
+            task.cancel()
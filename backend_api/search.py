@@ -1,8 +1,21 @@
-from .client import client
+from .client import call
+from .config import (
+    SEARCH_CACHE_PATH,
+    SEARCH_CACHE_MEMORY_BYTES,
+    SEARCH_CACHE_FRESH,
+    SEARCH_CACHE_EXPIRE,
+    NAME_INDEX_PATH,
+    NAME_INDEX_MAX_AGE,
+    NAME_INDEX_LIMIT,
+)
+from .metrics import Counter, span
+from .name_index import NameIndex
+from .search_cache import SearchCache
+from .single_flight import SingleFlight
 from math import ceil
-from cachetools import TTLCache
 from datetime import date
 
+import asyncio
 import re
 from enum import Enum
 
@@ -12,20 +25,46 @@ class SearchMode(Enum):
     FNR = 1
 
 
-# LRU cache with 10 minutes of expiry (the time limit is to prevent frequently used items to never update)
-name_search_cache = TTLCache(maxsize=128, ttl=600)
+# In-memory LRU in front of a SQLite file shared by all workers.
+# Results older than 10 minutes are refreshed in the background (to prevent frequently used items to never update)
+name_search_cache = SearchCache(
+    SEARCH_CACHE_PATH,
+    max_bytes=SEARCH_CACHE_MEMORY_BYTES,
+    fresh_for=SEARCH_CACHE_FRESH,
+    expire_after=SEARCH_CACHE_EXPIRE,
+)
 
 
-def check_name_search_cache(term):
-    global name_search_cache
+name_index = NameIndex(NAME_INDEX_PATH)
+
+# Misses and background refreshes of the same term share one SUCHEFIRMA call
+name_searches = SingleFlight("name_search")
+
+name_search_source = Counter(
+    "bizray_name_search_total",
+    "Name searches answered by the local index or by SUCHEFIRMA (through the cache)",
+    ("source",),
+)
+
+
+async def check_name_search_cache(term):
     # Ignore case
     term = term.lower()
-    if term in name_search_cache:
-        return name_search_cache[term]
 
-    result = search_by_name(term)
-    name_search_cache[term] = result
-    return result
+    # The local index answers in milliseconds, SUCHEFIRMA only handles what it doesn't know
+    if name_index.is_fresh(NAME_INDEX_MAX_AGE):
+        with span("name_index"):
+            companies = await asyncio.to_thread(name_index.search, term, NAME_INDEX_LIMIT)
+        if companies:
+            name_search_source.inc(source="index")
+            return companies
+
+    name_search_source.inc(source="soap")
+    return await name_search_cache.get(term, coalesced_search_by_name)
+
+
+async def coalesced_search_by_name(term):
+    return await name_searches.do(term, lambda: search_by_name(term))
 
 
 def detect_search_mode(term: str) -> SearchMode:
@@ -35,10 +74,20 @@ def detect_search_mode(term: str) -> SearchMode:
     )
 
 
-def search(term: str, page: int) -> dict:
+def format_company_fnr(fnr):
+    fnr = fnr.strip()
+
+    match = re.fullmatch(r"(\d{1,6})(\w)", fnr)
+    if match:
+        return f"{match.group(1)} {match.group(2)}"
+
+    return fnr
+
+
+async def search(term: str, page: int) -> dict:
     mode = detect_search_mode(term)
     if mode == SearchMode.NAME:
-        companies = check_name_search_cache(term)
+        companies = await check_name_search_cache(term)
 
         # pagination
         per_page = 15
@@ -53,10 +102,10 @@ def search(term: str, page: int) -> dict:
         return {"total_pages": total_pages, "companies": companies[start:end]}
     # This ideally should redirect towards the company view page and it's not autosuggested
     elif mode == SearchMode.FNR:
-        return {"total_pages": 1, "companies": [search_by_fnr(term)]}
+        return {"total_pages": 1, "companies": [await search_by_fnr(term)]}
 
 
-def search_by_name(company_name) -> list[dict]:
+async def search_by_name(company_name) -> list[dict]:
     # SUCHFIRMA finds the ids of companies with the name like FIRMENWORTLAUT
     suche_params = {
         "FIRMENWORTLAUT": company_name,
@@ -68,7 +117,7 @@ def search_by_name(company_name) -> list[dict]:
         "ORTNR": "",
     }
 
-    suche_response = client.service.SUCHEFIRMA(**suche_params)
+    suche_response = await call("SUCHEFIRMA", **suche_params)
     results = suche_response.ERGEBNIS
 
     print(f"Found {len(results)} companies for '{company_name}'")  # for debugging
@@ -90,14 +139,14 @@ def search_by_name(company_name) -> list[dict]:
     ]
 
 
-def search_by_fnr(company_fnr) -> dict:
+async def search_by_fnr(company_fnr) -> dict:
     suche_params = {
         "FNR": company_fnr,
         "STICHTAG": date.today(),
         "UMFANG": "Kurzinformation",
     }
 
-    suche_response = client.service.AUSZUG_V2_(**suche_params)
+    suche_response = await call("AUSZUG_V2_", **suche_params)
     firma = suche_response.FIRMA
 
     # legal_form_entry = firma.FI_DKZ07[0] if len(firma.FI_DKZ07) > 0 else None
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from .metrics import Counter
+
+search_cache_lookups = Counter(
+    "bizray_search_cache_total",
+    "Search cache lookups: memory or shared hits, stale hits (refreshed in the background) and misses",
+    ("result",),
+)
+
+
+class SearchCache:
+    """
+    Two tier cache for search results:
+    a byte-size bounded in-memory LRU in front of a SQLite (WAL) file that every worker
+    reads and writes, so results survive restarts and are shared between workers.
+
+    Entries younger than fresh_for are served as they are. Until expire_after they are still
+    served (stale-while-revalidate) while one background refresh per key replaces them.
+    """
+
+    def __init__(self, path: str, max_bytes: int, fresh_for: float, expire_after: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+        self.expire_after = expire_after
+
+        # key -> (stored_at, value, size), least recently used first
+        self._memory: OrderedDict[str, tuple[float, list, int]] = OrderedDict()
+        self._memory_bytes = 0
+
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self._puts = 0
+
+        # Keeps a reference to running refreshes, which also dedupes them
+        self._refreshing: dict[str, asyncio.Task] = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        # Called with _db_lock held
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                " key TEXT PRIMARY KEY, stored_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _read_shared(self, key: str) -> tuple[float, str] | None:
+        with self._db_lock:
+            return (
+                self._connection()
+                .execute("SELECT stored_at, value FROM search_cache WHERE key = ?", (key,))
+                .fetchone()
+            )
+
+    def _write_shared(self, key: str, stored_at: float, value: str):
+        with self._db_lock:
+            db = self._connection()
+            db.execute(
+                "INSERT OR REPLACE INTO search_cache (key, stored_at, value) VALUES (?, ?, ?)",
+                (key, stored_at, value),
+            )
+            self._puts += 1
+            # Expired rows are dropped now and then instead of on every write
+            if self._puts % 100 == 0:
+                db.execute(
+                    "DELETE FROM search_cache WHERE stored_at < ?",
+                    (time.time() - self.expire_after,),
+                )
+            db.commit()
+
+    def _remember(self, key: str, stored_at: float, value: list, size: int):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous[2]
+
+        if size > self.max_bytes:
+            return
+        self._memory[key] = (stored_at, value, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes:
+            _, (_, _, evicted) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted
+
+    async def _lookup(self, key: str) -> tuple[float, list] | None:
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            search_cache_lookups.inc(result="memory")
+            return entry[0], entry[1]
+
+        row = await asyncio.to_thread(self._read_shared, key)
+        if row is None:
+            return None
+
+        stored_at, encoded = row
+        value = json.loads(encoded)
+        self._remember(key, stored_at, value, len(encoded))
+        search_cache_lookups.inc(result="shared")
+        return stored_at, value
+
+    async def put(self, key: str, value: list):
+        stored_at = time.time()
+        encoded = json.dumps(value, default=str)
+        self._remember(key, stored_at, value, len(encoded))
+        await asyncio.to_thread(self._write_shared, key, stored_at, encoded)
+
+    async def _refresh(self, key: str, loader: Callable[[str], Awaitable[list]]):
+        try:
+            await self.put(key, await loader(key))
+        except Exception as e:
+            # The stale entry is kept and the next lookup tries again
+            print(f"Search cache refresh for '{key}' failed: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def get(self, key: str, loader: Callable[[str], Awaitable[list]]) -> list:
+        """
+        Cached value of key, loader(key) produces it on a miss
+        """
+        entry = await self._lookup(key)
+        if entry is not None:
+            stored_at, value = entry
+            age = time.time() - stored_at
+            if age < self.fresh_for:
+                return value
+            if age < self.expire_after:
+                search_cache_lookups.inc(result="stale")
+                if key not in self._refreshing:
+                    self._refreshing[key] = asyncio.create_task(self._refresh(key, loader))
+                return value
+
+        search_cache_lookups.inc(result="miss")
+        value = await loader(key)
+        await self.put(key, value)
+        return value
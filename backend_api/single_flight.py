@@ -0,0 +1,44 @@
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+from .metrics import Counter
+
+T = TypeVar("T")
+
+flight_calls = Counter(
+    "bizray_single_flight_total",
+    "Calls through a single flight group, led (did the work) or coalesced (awaited another call)",
+    ("group", "result"),
+)
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one execution:
+    the first caller starts it, everyone arriving before it finishes awaits the same result
+    (or exception). Nothing is cached afterwards.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._running: dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._running.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            flight_calls.inc(group=self.name, result="led")
+            task = asyncio.create_task(fn())
+            self._running[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            flight_calls.inc(group=self.name, result="coalesced")
+
+        # A caller that goes away doesn't cancel the work the others are waiting for
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._running.get(key) is task:
+            del self._running[key]
+        # Retrieved here so a failure nobody awaited anymore isn't logged as unhandled
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,183 @@
+"""
+Typeahead suggestions for company names and FNRs, answered from memory.
+
+Every word of a folded company name starts a key ("signa holding gmbh", "holding gmbh",
+"gmbh"), plus the FNR without its space. Keys are truncated to KEY_BYTES and kept in a
+sorted NumPy bytes array, so a prefix lookup is two binary searches. The best companies
+of the one to three letter prefixes (the huge ranges) are precomputed.
+"""
+
+import asyncio
+import re
+import time
+from typing import Iterable
+
+import numpy as np
+
+from .metrics import Counter, span
+from .name_index import fold
+from .NETWORK import GET_COMPANY_NAMES
+from .search import name_index
+
+KEY_BYTES = 24
+# Prefixes up to this many bytes are answered from the precomputed table
+PRECOMPUTED = 3
+TOP = 10
+
+suggest_builds = Counter(
+    "bizray_suggest_builds_total",
+    "Rebuilds of the typeahead index by source (name index or neo4j)",
+    ("source",),
+)
+
+
+def score(name: str, status: str) -> float:
+    # Active companies first, then shorter (more specific) names
+    return (0.0 if status == "deleted" else 1.0) + 1.0 / (1 + len(name))
+
+
+def _fnr_key(fnr: str) -> str:
+    return re.sub(r"\s+", "", fnr.lower())
+
+
+class SuggestIndex:
+    def __init__(self, companies: Iterable[dict]):
+        """
+        companies: [{fnr, name, location, status}, ...]
+        """
+        # (fnr, name, location, status) tuples, the position is the id used in the arrays
+        self.companies: list[tuple] = []
+        scores, keys, ids = [], [], []
+
+        for company in companies:
+            if not company.get("fnr") or not company.get("name"):
+                continue
+
+            id = len(self.companies)
+            status = company.get("status") or "active"
+            self.companies.append(
+                (company["fnr"], company["name"], company.get("location"), status)
+            )
+            scores.append(score(company["name"], status))
+
+            words = fold(company["name"]).split()
+            for i in range(len(words)):
+                keys.append(" ".join(words[i:]).encode("utf-8")[:KEY_BYTES])
+                ids.append(id)
+            keys.append(_fnr_key(company["fnr"]).encode("utf-8")[:KEY_BYTES])
+            ids.append(id)
+
+        keys = np.array(keys, dtype=f"S{KEY_BYTES}")
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.ids = np.array(ids, dtype=np.uint32)[order]
+        self.scores = np.array(scores, dtype=np.float32)
+
+        self.top: dict[bytes, np.ndarray] = {}
+        for length in range(1, PRECOMPUTED + 1):
+            prefixes = self.keys.astype(f"S{length}")
+            unique, starts = np.unique(prefixes, return_index=True)
+            ends = np.append(starts[1:], len(prefixes))
+            for prefix, start, end in zip(unique.tolist(), starts, ends):
+                # Keys shorter than length were already counted for a shorter prefix
+                if len(prefix) == length:
+                    self.top[prefix] = self._best(start, end, TOP)
+
+    def __len__(self):
+        return len(self.companies)
+
+    def _best(self, start: int, end: int, n: int) -> np.ndarray:
+        ids = self.ids[start:end]
+        # A company has several keys only when a word repeats, so a few more candidates
+        # than n are enough, instead of deduplicating the whole (possibly huge) range
+        k = 2 * n
+        while True:
+            candidates = ids
+            if len(ids) > k:
+                candidates = ids[np.argpartition(-self.scores[ids], k - 1)[:k]]
+            candidates = np.unique(candidates)
+            if len(candidates) >= n or len(ids) <= k:
+                break
+            k *= 2
+
+        best = candidates[np.argsort(-self.scores[candidates], kind="stable")]
+        return best[:n]
+
+    def _match(self, prefix: bytes, n: int) -> list[int]:
+        if not prefix:
+            return []
+        if len(prefix) <= PRECOMPUTED and n <= TOP:
+            return self.top.get(prefix, np.empty(0, dtype=np.uint32))[:n].tolist()
+
+        prefix = prefix[:KEY_BYTES]
+        start = np.searchsorted(self.keys, prefix, side="left")
+        end = np.searchsorted(self.keys, prefix + b"\xff", side="left")
+        return self._best(start, end, n).tolist()
+
+    def suggest(self, query: str, n: int = TOP) -> list[dict]:
+        """
+        Best n companies with a name word or FNR starting with query,
+        in the format of search.search_by_name
+        """
+        folded = fold(query)
+        fnr = _fnr_key(query)
+
+        ids = self._match(folded.encode("utf-8"), n)
+        if fnr != folded:
+            ids += self._match(fnr.encode("utf-8"), n)
+
+        # Keys are truncated, long queries are checked against the whole name
+        if len(folded.encode("utf-8")) > KEY_BYTES:
+            ids = [
+                id
+                for id in ids
+                if folded in fold(self.companies[id][1])
+                or fnr == _fnr_key(self.companies[id][0])
+            ]
+
+        ranked = sorted(set(ids), key=lambda id: -self.scores[id])[:n]
+        return [
+            {"fnr": fnr, "status": status, "name": [name], "location": location}
+            for fnr, name, location, status in (self.companies[id] for id in ranked)
+        ]
+
+
+# Replaced as a whole by rebuild(), requests keep using the previous index until then
+suggest_index = SuggestIndex([])
+
+
+def suggest(query: str, n: int = TOP) -> list[dict]:
+    with span("suggest"):
+        return suggest_index.suggest(query, n)
+
+
+async def rebuild():
+    global suggest_index
+
+    # The bulk export covers every company, neo4j only the ones viewed so far
+    companies = await asyncio.to_thread(name_index.companies)
+    source = "name_index"
+    if not companies:
+        companies = await GET_COMPANY_NAMES()
+        source = "neo4j"
+
+    started = time.perf_counter()
+    index = await asyncio.to_thread(SuggestIndex, companies)
+    suggest_index = index
+    suggest_builds.inc(source=source)
+    print(
+        f"Suggest index: {len(index)} companies from {source} "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+async def keep_fresh(interval: float):
+    """
+    Builds the index and rebuilds it every interval seconds, runs for the lifetime of the app
+    """
+    while True:
+        try:
+            await rebuild()
+        except Exception as e:
+            print(f"Suggest index rebuild failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,49 @@
+import xml.etree.ElementTree as ET
+
+from backend_api.company_information import BALANCE_FIELDS, extract_balance, ns
+
+BALANCE = """
+<ns0:{layout} xmlns:ns0="https://finanzonline.bmf.gv.at/bilanz">
+  <ns0:HGB_224_2>
+    <ns0:POSTENZEILE><ns0:BETRAG>1000.50</ns0:BETRAG></ns0:POSTENZEILE>
+    <ns0:HGB_224_2_A>
+      <ns0:POSTENZEILE><ns0:BETRAG_VJ>1.00</ns0:BETRAG_VJ></ns0:POSTENZEILE>
+      <ns0:HGB_224_2_A_I>
+        <ns0:POSTENZEILE><ns0:BETRAG>200</ns0:BETRAG></ns0:POSTENZEILE>
+      </ns0:HGB_224_2_A_I>
+    </ns0:HGB_224_2_A>
+    <ns0:HGB_224_2_A>
+      <ns0:POSTENZEILE><ns0:BETRAG>300</ns0:BETRAG></ns0:POSTENZEILE>
+    </ns0:HGB_224_2_A>
+  </ns0:HGB_224_2>
+  <ns0:HGB_224_3>
+    <ns0:HGB_224_3_A>
+      <ns0:POSTENZEILE><ns0:BETRAG>-42.10</ns0:BETRAG></ns0:POSTENZEILE>
+      <ns0:POSTENZEILE><ns0:BETRAG>7</ns0:BETRAG></ns0:POSTENZEILE>
+    </ns0:HGB_224_3_A>
+  </ns0:HGB_224_3>
+</ns0:{layout}>
+"""
+
+
+def find_each(balance):
+    values = {}
+    for field, term in BALANCE_FIELDS.items():
+        node = balance.find(f".//ns0:{term}/ns0:POSTENZEILE/ns0:BETRAG", ns)
+        values[field] = float(node.text) if node is not None else 0.0
+    return values
+
+
+def test_matches_descendant_search():
+    for layout in ("BILANZ", "HGB_Form_2"):
+        balance = ET.fromstring(BALANCE.format(layout=layout))
+        values = extract_balance(balance)
+
+        assert values == find_each(balance)
+        assert list(values) == list(BALANCE_FIELDS)
+        assert values["total_assets"] == 1000.5
+        # The first position without an amount is skipped
+        assert values["fixed_assets"] == 300.0
+        assert values["intangible_assets"] == 200.0
+        assert values["equity"] == -42.1
+        assert values["liabilities"] == 0.0
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from backend_api import client
+
+
+class FakePool:
+    def __init__(self):
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+def fake_client(monkeypatch):
+    fake = SimpleNamespace(transport=SimpleNamespace(client=FakePool()))
+    monkeypatch.setattr(client, "_build_pool", FakePool)
+    monkeypatch.setattr(client, "_loop", None)
+    return fake
+
+
+def test_wsdl_is_loaded_off_the_event_loop(monkeypatch):
+    fake = fake_client(monkeypatch)
+    monkeypatch.setattr(client, "_client", None)
+    threads = []
+
+    def build_client():
+        threads.append(threading.current_thread())
+        client._client = fake
+        return fake
+
+    monkeypatch.setattr(client, "_build_client", build_client)
+
+    assert asyncio.run(client.get_client()) is fake
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_pool_of_the_previous_loop_is_closed(monkeypatch):
+    fake = fake_client(monkeypatch)
+    monkeypatch.setattr(client, "_client", fake)
+
+    first = asyncio.run(client.get_client()).transport.client
+    second = asyncio.run(client.get_client()).transport.client
+
+    assert first is not second
+    assert first.closed
+    assert not second.closed
@@ -1,10 +1,12 @@
+import asyncio
+
 from backend_api.company_information import company_info
 from backend_api.search import search_by_name
 from backend_api.tests.config import TEST_COMPANY_NAME
 from config import TEST_COMPANY_FNR
 
 def test_company_info():
-    result = company_info(TEST_COMPANY_FNR)
+    result = asyncio.run(company_info(TEST_COMPANY_FNR))
     assert isinstance(result, dict)
 
     assert "basic_info" in result
@@ -29,13 +31,13 @@ def test_company_info():
 
 # very long but gives a lot of test cases
 def test_bulk_company_info():
-    companies = search_by_name(TEST_COMPANY_NAME)
+    companies = asyncio.run(search_by_name(TEST_COMPANY_NAME))
 
     errors = ""
     for company in companies:
         fnr = company["fnr"]
         try:
-            company_info(fnr)
+            asyncio.run(company_info(fnr))
         except Exception as e:
             errors += f"{fnr}: {e}\n=============================\n"
 
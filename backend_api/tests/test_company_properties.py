@@ -0,0 +1,35 @@
+from backend_api.NETWORK import decode_payload, encode_payload, glance_properties
+
+COMPANY = {
+    "basic_info": {"company_number": "583360 h", "company_name": "SIGNA Holding GmbH", "is_deleted": False},
+    "risk_indicators": {"has_masseverwalter": True, "risk_level": "H"},
+    "compliance_indicators": {"calculations": {"missing_reporting_years": {"value": "2"}}},
+    "financial": [{"submission_date": "2023-09-30", "indicators": {"profit_loss": {"value": -1250}}}],
+}
+
+
+def test_glance_properties_are_typed():
+    assert glance_properties(COMPANY) == {
+        "company_name": "SIGNA Holding GmbH",
+        "deleted": False,
+        "risk_level": "H",
+        "has_masseverwalter": True,
+        "last_file": "2023-09-30",
+        "missing_years": 2,
+        "profit_loss": -1250.0,
+    }
+
+
+def test_missing_financials_clear_the_properties():
+    properties = glance_properties({**COMPANY, "financial": [], "risk_indicators": None})
+
+    assert properties["last_file"] is None
+    assert properties["missing_years"] is None
+    assert properties["profit_loss"] is None
+    assert properties["has_masseverwalter"] is False
+
+
+def test_payload_round_trip():
+    payload = encode_payload(COMPANY)
+    assert isinstance(payload, bytes)
+    assert decode_payload(payload) == COMPANY
@@ -0,0 +1,46 @@
+import os
+
+from backend_api.document_store import DocumentStore
+
+
+def test_round_trip(tmp_path):
+    store = DocumentStore(str(tmp_path), 1024 * 1024)
+    assert store.get("435836_5690342302057_000___000_30_30137347_XML") is None
+
+    store.put("435836_5690342302057_000___000_30_30137347_XML", b"<xml>" * 100)
+    assert store.get("435836_5690342302057_000___000_30_30137347_XML") == b"<xml>" * 100
+    # Stored compressed
+    assert store.size() < 500
+
+
+def test_survives_restart(tmp_path):
+    DocumentStore(str(tmp_path), 1024 * 1024).put("key_PDF", b"%PDF-1.4")
+
+    store = DocumentStore(str(tmp_path), 1024 * 1024)
+    assert store.size() > 0
+    assert store.get("key_PDF") == b"%PDF-1.4"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    # Random bytes don't compress, so every entry takes roughly 1000 bytes
+    store = DocumentStore(str(tmp_path), 2500)
+    store.put("a", os.urandom(1000))
+    store.put("b", os.urandom(1000))
+    store.get("a")
+    store.put("c", os.urandom(1000))
+
+    assert store.get("a") is not None
+    assert store.get("b") is None
+    assert store.get("c") is not None
+    assert store.size() <= 2500
+
+
+def test_workers_share_the_limit(tmp_path):
+    # Two uvicorn workers, every one only knows its own writes
+    workers = [DocumentStore(str(tmp_path), 2500), DocumentStore(str(tmp_path), 2500)]
+    for i in range(6):
+        workers[i % 2].put(str(i), os.urandom(1000))
+
+    assert workers[0].size() <= 2500
+    assert workers[1].get("5") is not None
+    assert workers[0].get("0") is None
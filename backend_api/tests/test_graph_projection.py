@@ -0,0 +1,166 @@
+import asyncio
+
+import numpy as np
+
+from backend_api import graph_projection
+from backend_api.graph_projection import GraphProjection
+
+# A - m1 - B - addr - C, D - m2 (separate cluster), m1 listed twice
+EDGES = [
+    ("Company:a", "Manager:m1"),
+    ("Company:b", "Manager:m1"),
+    ("Company:b", "Manager:m1"),
+    ("Company:b", "Address:addr"),
+    ("Company:c", "Address:addr"),
+    ("Company:d", "Manager:m2"),
+]
+
+
+def node(projection, key):
+    return projection.ids[key]
+
+
+def test_csr_layout():
+    projection = GraphProjection(EDGES)
+    assert len(projection) == 7
+    assert projection.edge_count == 5
+
+    b = node(projection, "Company:b")
+    neighbours = projection.indices[projection.indptr[b] : projection.indptr[b + 1]]
+    assert sorted(projection.keys[i] for i in neighbours) == ["Address:addr", "Manager:m1"]
+    assert projection.degrees()[node(projection, "Manager:m1")] == 2
+
+
+def test_bfs_and_depth():
+    projection = GraphProjection(EDGES)
+    a = node(projection, "Company:a")
+
+    distance = projection.bfs(a)
+    assert distance[node(projection, "Company:b")] == 2
+    assert distance[node(projection, "Company:c")] == 4
+    assert distance[node(projection, "Company:d")] == -1
+
+    distance = projection.bfs(a, max_depth=2)
+    assert distance[node(projection, "Address:addr")] == -1
+
+    reached = projection.k_hop(a, 4)
+    assert [projection.keys[i] for i in reached] == [
+        "Manager:m1",
+        "Company:b",
+        "Address:addr",
+        "Company:c",
+    ]
+
+
+def test_supernodes_are_not_expanded():
+    projection = GraphProjection(EDGES)
+    a = node(projection, "Company:a")
+    distance = projection.bfs(a, max_degree=1)
+    # m1 (degree 2) is reached but the walk doesn't go through it
+    assert distance[node(projection, "Manager:m1")] == 1
+    assert distance[node(projection, "Company:b")] == -1
+
+
+def test_reach():
+    projection = GraphProjection(EDGES)
+    reach = projection.reach(node(projection, "Company:a"), 4, limit=1)
+    assert reach["connected_companies"] == 2
+    assert reach["companies_per_hop"] == {"1": 0, "2": 1, "3": 0, "4": 1}
+    assert reach["companies"] == [{"id": "Company:b", "hops": 2}]
+    assert reach["component_size"] == 5
+    assert reach["degree"] == 1
+
+
+def test_components_and_stats():
+    projection = GraphProjection(EDGES)
+    assert projection.component_size(node(projection, "Company:c")) == 5
+    assert projection.component_size(node(projection, "Manager:m2")) == 2
+
+    stats = projection.stats()
+    assert stats["nodes"] == 7
+    assert stats["companies"] == 4
+    assert stats["components"] == 2
+    assert stats["largest_component"] == 5
+    assert stats["degrees"]["Company"] == {"1": 3, "2-3": 1}
+    assert stats["degrees"]["Manager"] == {"1": 1, "2-3": 1}
+
+
+def test_components_on_a_long_chain():
+    edges = [(f"Company:{i}", f"Address:{i}") for i in range(200)]
+    edges += [(f"Company:{i + 1}", f"Address:{i}") for i in range(199)]
+    projection = GraphProjection(edges)
+    assert len(projection.component_sizes) == 1
+    assert np.all(projection.component == 0)
+
+
+def test_empty_graph():
+    projection = GraphProjection([])
+    assert len(projection) == 0
+    assert projection.stats()["largest_component"] == 0
+
+
+def test_rebuild_swaps_the_projection(monkeypatch):
+    monkeypatch.setattr(graph_projection, "graph_projection", None)
+
+    async def load_edges():
+        return EDGES
+
+    asyncio.run(graph_projection.rebuild(load_edges))
+    assert len(graph_projection.graph_projection) == 7
+
+
+# a and e are linked over m1 (2 hops) and over addr/b/m3 (4 hops), hub is a supernode
+PATH_EDGES = [
+    ("Company:a", "Manager:m1"),
+    ("Company:e", "Manager:m1"),
+    ("Company:a", "Address:addr"),
+    ("Company:b", "Address:addr"),
+    ("Company:b", "Manager:m3"),
+    ("Company:e", "Manager:m3"),
+    ("Company:a", "Address:hub"),
+    ("Company:f", "Address:hub"),
+    ("Company:g", "Address:hub"),
+]
+
+
+def keys(projection, path):
+    return [projection.keys[i] for i in path]
+
+
+def test_shortest_path():
+    projection = GraphProjection(PATH_EDGES)
+    a, e = node(projection, "Company:a"), node(projection, "Company:e")
+    assert keys(projection, projection.shortest_path(a, e, 6)) == [
+        "Company:a",
+        "Manager:m1",
+        "Company:e",
+    ]
+    assert projection.shortest_path(a, e, 1) is None
+    assert projection.shortest_path(a, a, 6) == [a]
+
+
+def test_shortest_paths_in_order():
+    projection = GraphProjection(PATH_EDGES)
+    a, e = node(projection, "Company:a"), node(projection, "Company:e")
+    paths = projection.shortest_paths(a, e, k=5, max_depth=6)
+    assert [keys(projection, path) for path in paths] == [
+        ["Company:a", "Manager:m1", "Company:e"],
+        ["Company:a", "Address:addr", "Company:b", "Manager:m3", "Company:e"],
+    ]
+    assert len(projection.shortest_paths(a, e, k=5, max_depth=3)) == 1
+
+
+def test_paths_avoid_supernodes():
+    projection = GraphProjection(PATH_EDGES)
+    f, g = node(projection, "Company:f"), node(projection, "Company:g")
+    assert len(projection.shortest_paths(f, g, k=3, max_depth=6)) == 1
+    assert projection.shortest_paths(f, g, k=3, max_depth=6, max_degree=2) == []
+
+
+def test_paths_are_cached_for_both_directions():
+    projection = GraphProjection(PATH_EDGES)
+    a, e = node(projection, "Company:a"), node(projection, "Company:e")
+    forward = projection.paths(a, e, k=2, max_depth=6)
+    backward = projection.paths(e, a, k=2, max_depth=6)
+    assert backward == [path[::-1] for path in forward]
+    assert len(projection._paths) == 1
@@ -0,0 +1,88 @@
+import asyncio
+import copy
+import datetime
+import random
+
+from backend_api import NETWORK, company_information
+from backend_api.company_information import get_financial_years, snapshot_financial
+from backend_api.indicators import INPUT_FIELDS
+
+
+def fake_reports(monkeypatch):
+    fetched = []
+
+    async def get_xml_data(id):
+        fetched.append(id)
+        rng = random.Random(id)
+        return {
+            "document_id": id,
+            **{field: rng.choice([0.0, rng.uniform(-1e5, 1e6)]) for field in INPUT_FIELDS},
+        }
+
+    monkeypatch.setattr(company_information, "get_xml_data", get_xml_data)
+    return fetched
+
+
+def test_only_new_reports_are_fetched(monkeypatch):
+    fetched = fake_reports(monkeypatch)
+
+    snapshot = asyncio.run(get_financial_years(["a_XML", "b_XML", "c_XML"]))
+    assert fetched == ["a_XML", "b_XML", "c_XML"]
+
+    fetched.clear()
+    refreshed = asyncio.run(
+        get_financial_years(["b_XML", "c_XML", "d_XML"], copy.deepcopy(snapshot))
+    )
+    assert fetched == ["d_XML"]
+
+    # Same as building from scratch, including the trends of the year that is now first
+    assert refreshed == asyncio.run(get_financial_years(["b_XML", "c_XML", "d_XML"]))
+    assert refreshed[0]["trends"] is None
+
+
+def test_unchanged_reports(monkeypatch):
+    fetched = fake_reports(monkeypatch)
+
+    snapshot = asyncio.run(get_financial_years(["a_XML", "b_XML"]))
+    fetched.clear()
+
+    assert asyncio.run(get_financial_years(["a_XML", "b_XML"], copy.deepcopy(snapshot))) == snapshot
+    assert fetched == []
+
+
+# What database/builddb.py stored before companies had typed properties
+BULK_LOADED = {
+    "glance": {"company_name": "SIGNA Holding GmbH", "company_number": "583360 h"},
+    "location": "Maria-Theresien-Straße 31, 6020 Innsbruck",
+    "management": ["1977-05-20|René Benko"],
+}
+
+
+def test_bulk_loaded_company_is_built_from_scratch(monkeypatch):
+    previous = []
+
+    async def SEARCH_COMPANY(company_fnr):
+        return {"data": BULK_LOADED, "updated_at": datetime.datetime(2000, 1, 1).timestamp()}
+
+    async def company_info(company_fnr, previous_snapshot=None):
+        previous.append(previous_snapshot)
+        return {"basic_info": {"company_number": company_fnr}, "financial": []}
+
+    async def CREATE_COMPANY(data):
+        pass
+
+    monkeypatch.setattr(NETWORK, "SEARCH_COMPANY", SEARCH_COMPANY)
+    monkeypatch.setattr(NETWORK, "company_info", company_info)
+    monkeypatch.setattr(NETWORK, "CREATE_COMPANY", CREATE_COMPANY)
+
+    company = asyncio.run(NETWORK.GET_COMPANY("583360 h"))
+    assert company["basic_info"]["company_number"] == "583360 h"
+    assert previous == [None]
+
+
+def test_only_full_builds_are_reused():
+    assert snapshot_financial(None) is None
+    assert snapshot_financial(BULK_LOADED) is None
+    assert snapshot_financial({"basic_info": {}, "financial": [{"document_id": "a_XML"}]}) == [
+        {"document_id": "a_XML"}
+    ]
@@ -0,0 +1,206 @@
+import copy
+import random
+
+import numpy as np
+
+from backend_api.company_information import calculate_financial_indicators
+from backend_api.indicators import (
+    HIGH,
+    INPUT_FIELDS,
+    NONE,
+    compute_indicators,
+    score_companies,
+)
+
+
+# The per-company implementation the batch engine replaced, kept as the reference
+def reference_financial_indicators(financial_years):
+    """
+    Mutates the passed in list by appending additional data to it
+    """
+    if financial_years:
+        financial_years[0]["trends"] = None
+    else:
+        return
+
+    for year in financial_years:
+        divide_or_none = lambda numerator, denominator: (
+            year[numerator] / year[denominator] if year[denominator] else None
+        )
+
+        # This one is used for calculation of others
+        year["quick_assets"] = (
+            year["cash_and_bank_balances"] + year["securities"] + year["receivables"]
+        )
+
+        indicators = year["indicators"] = {}
+
+        value = year["current_assets"] - year["deferred_income"]
+        indicators["working_capital"] = {
+            "value": value,
+            "level": "L" if value > 0 else "H",
+        }
+
+        value = divide_or_none("liabilities", "equity")
+        indicators["debt_to_equity_ratio"] = (
+            None
+            if not value
+            else {
+                "value": value,
+                "level": "L" if value < 1 else "M" if value <= 2 else "H",
+            }
+        )
+
+        value = divide_or_none("equity", "total_liabilities")  # wrong
+        indicators["equity_ratio"] = (
+            None
+            if not value
+            else {
+                "value": value,
+                "level": "L" if value > 0.50 else "M" if value >= 0.25 else "H",
+            }
+        )
+
+        value = divide_or_none("current_assets", "deferred_income")
+        indicators["current_ratio"] = (
+            None
+            if not value
+            else {
+                "value": value,
+                "level": "L" if value > 2 else "M" if value >= 1 else "H",
+            }
+        )
+
+        value = divide_or_none("cash_and_bank_balances", "deferred_income")
+        indicators["cash_ratio"] = (
+            None
+            if not value
+            else {
+                "value": value,
+                "level": "L" if value > 1 else "M" if value >= 0.2 else "H",
+            }
+        )
+
+        value = divide_or_none("quick_assets", "deferred_income")
+        indicators["quick_ratio"] = (
+            None
+            if not value
+            else {
+                "value": value,
+                "level": "L" if value > 1 else "M" if value >= 0.5 else "H",
+            }
+        )
+
+        value = divide_or_none("equity", "fixed_assets")
+        indicators["fixed_asset_coverage"] = (
+            None
+            if not value
+            else {
+                "value": value,
+                "level": "L" if value > 1.00 else "M" if value >= 0.50 else "H",
+            }
+        )
+
+        value = year["retained_earnings"] - year["retained_earnings_subitem"]
+        indicators["profit_loss"] = {
+            "value": value,
+            "level": "L" if value >= 0 else "H",
+        }
+
+    for prev, curr in zip(financial_years, financial_years[1:]):
+
+        def growth_rate_or_none(metric, is_indicator):
+            # Get this man a True...
+            if is_indicator:
+                if (
+                    prev["indicators"][metric] is None
+                    or curr["indicators"][metric] is None
+                ):
+                    return None
+                prev_value = prev["indicators"][metric]["value"]
+                if prev_value == 0:
+                    return None
+
+                return (curr["indicators"][metric]["value"] - prev_value) / prev_value
+
+            if not prev[metric] or not curr[metric]:
+                return None
+            return (curr[metric] - prev[metric]) / prev[metric]
+
+        trends = curr["trends"] = {}
+
+        trends["asset_growth_rate"] = growth_rate_or_none("total_assets", False)
+        trends["equity_growth_rate"] = growth_rate_or_none("equity", False)
+        trends["profit_loss_development"] = growth_rate_or_none("profit_loss", True)
+
+        def trend_or_none(metric, is_indicator):
+            if is_indicator:
+                if (
+                    prev["indicators"][metric] is None
+                    or curr["indicators"][metric] is None
+                ):
+                    return None
+
+                return (
+                    prev["indicators"][metric]["value"]
+                    - curr["indicators"][metric]["value"]
+                )
+            if not prev[metric] or not curr[metric]:
+                return None
+            return prev[metric] - curr[metric]
+
+        trends["equity_ratio_trend"] = trend_or_none("equity_ratio", True)
+        trends["total_assets_trend"] = trend_or_none("total_assets", False)
+        trends["working_capital_trend"] = trend_or_none("working_capital", True)
+        trends["current_ratio_development"] = trend_or_none("current_ratio", True)
+        trends["debt_to_equity_trend"] = trend_or_none("debt_to_equity_ratio", True)
+
+
+
+def random_year(rng):
+    # Plenty of zeros, they decide whether indicators and trends are null
+    return {
+        field: rng.choice([0.0, 0.0, rng.uniform(-1e5, 1e6), float(rng.randint(1, 3))])
+        for field in INPUT_FIELDS
+    }
+
+
+def test_matches_reference():
+    rng = random.Random(7)
+    companies = [
+        [random_year(rng) for _ in range(rng.randint(0, 4))] for _ in range(500)
+    ]
+
+    for years, scored in zip(companies, score_companies(companies)):
+        expected = copy.deepcopy(years)
+        reference_financial_indicators(expected)
+
+        assert [{**year, **result} for year, result in zip(years, scored)] == expected
+
+
+def test_single_company_wrapper():
+    rng = random.Random(11)
+    years = [random_year(rng) for _ in range(3)]
+    expected = copy.deepcopy(years)
+
+    calculate_financial_indicators(years)
+    reference_financial_indicators(expected)
+
+    assert years == expected
+
+
+def test_arrays():
+    fields = {field: np.ones((2, 3)) for field in INPUT_FIELDS}
+    fields["retained_earnings"] = np.array([[3.0, -1.0, 2.0], [0.0, 0.0, 0.0]])
+    valid = np.array([[True, True, True], [True, False, False]])
+
+    result = compute_indicators(fields, valid)
+
+    values, levels = result["indicators"]["profit_loss"]
+    assert values.shape == (2, 3)
+    assert levels[0, 1] == HIGH
+    assert levels[1, 1] == NONE
+
+    values, present = result["trends"]["profit_loss_development"]
+    assert not present[:, 0].any()
+    assert present[0, 1] and not present[1, 1]
@@ -0,0 +1,77 @@
+import asyncio
+
+from backend_api.jobs import JobManager, JobStore
+
+
+def manager(path, process, **kwargs):
+    async def neighbours(target):
+        return [target, "2 b", "3 c", "2 b"]
+
+    options = {"workers": 2, "concurrency": 2, "retries": 3, "stale_after": 60, "backoff": 0}
+    options.update(kwargs)
+    return JobManager(JobStore(path), {"enrich": neighbours}, process, **options)
+
+
+def test_job_runs_with_retries_and_progress(tmp_path):
+    attempts = {}
+
+    async def process(fnr):
+        attempts[fnr] = attempts.get(fnr, 0) + 1
+        await asyncio.sleep(0.01)
+        # "2 b" works on the second attempt, "3 c" never
+        if fnr == "3 c" or (fnr == "2 b" and attempts[fnr] == 1):
+            raise ValueError(f"{fnr} failed")
+
+    async def run():
+        jobs = manager(str(tmp_path / "jobs.sqlite"), process)
+        jobs.start()
+        job = await jobs.submit("enrich", "1 a")
+        # Same target while it is queued or running: same job
+        assert (await jobs.submit("enrich", "1 a"))["id"] == job["id"]
+
+        states = [state async for state in jobs.watch(job["id"])]
+        await jobs.close()
+        return states
+
+    states = asyncio.run(run())
+    final = states[-1]
+    assert final["status"] == "done"
+    assert (final["total"], final["done"], final["failed"]) == (3, 2, 1)
+    assert final["failures"] == [{"fnr": "3 c", "error": "3 c failed"}]
+    assert attempts == {"1 a": 1, "2 b": 2, "3 c": 3}
+    # Progress was streamed on the way
+    assert len(states) > 2
+
+
+def test_job_survives_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    processed = []
+
+    # A worker claims the job, loads one company and dies
+    store = JobStore(path)
+    id = store.submit("enrich", "1 a")
+    job = store.claim("dead-worker", stale_after=60)
+    store.plan(id, ["1 a", "2 b", "3 c"])
+    store.update_item(id, "1 a", "done", 1, None)
+    store.heartbeat(id)
+    store._db.execute("UPDATE jobs SET heartbeat = 0 WHERE id = ?", (id,))
+
+    async def process(fnr):
+        processed.append(fnr)
+
+    async def run():
+        jobs = manager(path, process)
+        jobs.start()
+        final = await jobs.wait(id)
+        await jobs.close()
+        return final
+
+    final = asyncio.run(run())
+    assert job["id"] == id
+    assert final["status"] == "done"
+    assert final["done"] == 3
+    assert sorted(processed) == ["2 b", "3 c"]
+
+
+def test_unknown_job(tmp_path):
+    assert JobStore(str(tmp_path / "jobs.sqlite")).get("missing") is None
@@ -0,0 +1,53 @@
+import pytest
+
+from backend_api import metrics
+from backend_api.metrics import Counter, Histogram
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """
+    Metrics created by a test go into a fresh registry, so they don't end up in /metrics
+    """
+    registry = []
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    monkeypatch.setattr(
+        metrics, "stage_seconds", Histogram("bizray_stage_seconds", "Stages", ("stage",))
+    )
+    return registry
+
+
+def test_exposition(registry):
+    counter = Counter("test_events_total", "Events", ("kind",))
+    counter.inc(kind="a")
+    counter.inc(2, kind='quote"d')
+    histogram = Histogram("test_seconds", "Durations", buckets=(0.1, 1))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    text = metrics.exposition()
+
+    assert "# TYPE test_events_total counter" in text
+    assert 'test_events_total{kind="a"} 1' in text
+    assert 'test_events_total{kind="quote\\"d"} 2' in text
+    assert "# TYPE test_seconds histogram" in text
+    assert 'test_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_seconds_bucket{le="1.0"} 2' in text
+    assert 'test_seconds_bucket{le="+Inf"} 3' in text
+    assert "test_seconds_count 3" in text
+    assert histogram.value() == (5.55, 3)
+    assert counter in registry and histogram in registry
+
+
+def test_request_timing():
+    timings = metrics.start_request_timing()
+    with metrics.span("test_stage"):
+        pass
+    with metrics.span("test_stage"):
+        pass
+
+    assert [stage for stage, _ in timings] == ["test_stage", "test_stage"]
+    assert metrics.server_timing(timings).startswith("test_stage;dur=")
+    assert 'desc="2x"' in metrics.server_timing(timings)
+    assert metrics.stage_seconds.value(stage="test_stage")[1] == 2
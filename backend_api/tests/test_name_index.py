@@ -0,0 +1,78 @@
+from backend_api.benchmarks.name_index import generated_companies
+from backend_api.name_index import NameIndex, NameIndexWriter, fold
+
+COMPANIES = [
+    {"fnr": "1 a", "name": "Bäckerei Müller GmbH", "location": "Wien", "status": "active"},
+    {"fnr": "2 b", "name": "Mueller Transporte KG", "location": "Graz", "status": "deleted"},
+    {"fnr": "3 c", "name": "SIGNA Holding GmbH", "location": "Innsbruck", "status": "active"},
+    {"fnr": "4 d", "name": "Signa Prime Selection AG", "location": "Wien", "status": "active"},
+]
+
+
+def build(tmp_path):
+    path = str(tmp_path / "name_index.sqlite")
+    writer = NameIndexWriter(path)
+    writer.add(COMPANIES)
+    writer.finish()
+    return NameIndex(path)
+
+
+def fnrs(results):
+    return sorted(result["fnr"] for result in results)
+
+
+def test_fold():
+    assert fold("Bäckerei Müller & Söhne GmbH") == "baeckerei mueller soehne gmbh"
+
+
+def test_prefix_and_umlauts(tmp_path):
+    index = build(tmp_path)
+    assert index.is_fresh(60)
+
+    assert fnrs(index.search("signa", 10)) == ["3 c", "4 d"]
+    assert fnrs(index.search("sig hold", 10)) == ["3 c"]
+    assert fnrs(index.search("müller", 10)) == ["1 a", "2 b"]
+    assert fnrs(index.search("MULLER", 10)) == ["1 a"]
+    assert index.search("signa holding", 10) == [
+        {"fnr": "3 c", "status": "active", "name": ["SIGNA Holding GmbH"], "location": "Innsbruck"}
+    ]
+
+
+def test_misspelled_and_missing(tmp_path):
+    index = build(tmp_path)
+
+    assert fnrs(index.search("signa holdnig", 10)) == ["3 c"]
+    assert index.search("xyzzy", 10) == []
+
+
+def test_missing_index(tmp_path):
+    index = NameIndex(str(tmp_path / "missing.sqlite"))
+    assert not index.is_fresh(60)
+    assert index.search("signa", 10) == []
+
+
+def test_large_index(tmp_path):
+    path = str(tmp_path / "name_index.sqlite")
+    writer = NameIndexWriter(path)
+    writer.add(generated_companies(5000))
+    writer.finish()
+    index = NameIndex(path)
+
+    # Best ranked first: active companies, then shorter names
+    results = index.search("gmbh", 100)
+    assert len(results) == 100
+    assert all(result["status"] == "active" for result in results)
+    lengths = [len(result["name"][0]) for result in results]
+    assert lengths == sorted(lengths)
+
+    # Every word of the term starts a word of the name
+    for result in index.search("gmbh kg", 50):
+        words = fold(result["name"][0]).split()
+        assert any(word.startswith("gmbh") for word in words)
+        assert any(word.startswith("kg") for word in words)
+
+    # A word that starts thousands of words still finds the best ranked names
+    assert len(index.search("b", 20)) == 20
+    # No name word starts with "tertra", the trigram search finds the similar ones
+    assert index.search("tertra gmbh", 20)
+    assert index.search("zzzz", 20) == []
@@ -0,0 +1,91 @@
+import asyncio
+import datetime
+
+from backend_api import NETWORK
+from backend_api.refresh_queue import RefreshQueue
+
+DAY = 24 * 60 * 60
+
+
+def test_dedupe_and_bound():
+    refreshed = []
+
+    async def refresh(key):
+        await asyncio.sleep(0.01)
+        refreshed.append(key)
+
+    async def run():
+        queue = RefreshQueue("test", refresh, workers=1, max_size=2)
+        assert queue.submit("a")
+        await asyncio.sleep(0)  # "a" is being refreshed, "b" and "c" wait
+        assert queue.submit("b")
+        assert not queue.submit("a")
+        assert not queue.submit("b")
+        assert queue.submit("c")
+        assert not queue.submit("d")  # full
+        await queue.join()
+        await queue.close()
+
+    asyncio.run(run())
+    assert refreshed == ["a", "b", "c"]
+
+
+def fake_store(monkeypatch, age):
+    state = {
+        "stored": {
+            "data": {"basic_info": {"company_number": "583360 h"}, "financial": [], "version": 1},
+            "updated_at": datetime.datetime.now().timestamp() - age,
+        },
+        "builds": 0,
+    }
+
+    async def SEARCH_COMPANY(company_fnr):
+        return state["stored"]
+
+    async def company_info(company_fnr, previous=None):
+        state["builds"] += 1
+        await asyncio.sleep(0.01)
+        return {**state["stored"]["data"], "version": 2}
+
+    async def CREATE_COMPANY(data):
+        state["stored"] = {"data": data, "updated_at": datetime.datetime.now().timestamp()}
+
+    monkeypatch.setattr(NETWORK, "SEARCH_COMPANY", SEARCH_COMPANY)
+    monkeypatch.setattr(NETWORK, "company_info", company_info)
+    monkeypatch.setattr(NETWORK, "CREATE_COMPANY", CREATE_COMPANY)
+    return state
+
+
+def test_fresh_snapshot(monkeypatch):
+    state = fake_store(monkeypatch, age=DAY)
+    company = asyncio.run(NETWORK.GET_COMPANY("583360 h"))
+
+    assert company["version"] == 1
+    assert company["snapshot"]["stale"] is False
+    assert state["builds"] == 0
+
+
+def test_stale_snapshot_is_served_and_refreshed(monkeypatch):
+    state = fake_store(monkeypatch, age=60 * DAY)
+
+    async def run():
+        companies = await asyncio.gather(*(NETWORK.GET_COMPANY("583360 h") for _ in range(5)))
+        await NETWORK.company_refreshes.join()
+        refreshed = await NETWORK.GET_COMPANY("583360 h")
+        await NETWORK.company_refreshes.close()
+        return companies, refreshed
+
+    companies, refreshed = asyncio.run(run())
+    assert all(company["version"] == 1 and company["snapshot"]["stale"] for company in companies)
+    assert state["builds"] == 1
+    assert refreshed["version"] == 2
+    assert refreshed["snapshot"]["stale"] is False
+
+
+def test_expired_snapshot_is_rebuilt(monkeypatch):
+    state = fake_store(monkeypatch, age=400 * DAY)
+    company = asyncio.run(NETWORK.GET_COMPANY("583360 h"))
+
+    assert company["version"] == 2
+    assert "snapshot" not in company
+    assert state["builds"] == 1
@@ -0,0 +1,96 @@
+import asyncio
+
+from backend_api import screen as screening
+from backend_api.screen import normalize, screen
+
+COMPANY = {
+    "basic_info": {"company_number": "583360 h", "company_name": "SIGNA Holding GmbH", "is_deleted": False},
+    "risk_indicators": {"risk_level": "H"},
+    "financial": [],
+}
+
+
+def fake_lookups(monkeypatch, limit=2):
+    calls = {"company": [], "name": [], "in_flight": 0, "max_in_flight": 0}
+
+    async def GET_COMPANY(fnr):
+        calls["company"].append(fnr)
+        calls["in_flight"] += 1
+        calls["max_in_flight"] = max(calls["max_in_flight"], calls["in_flight"])
+        await asyncio.sleep(0.01)
+        calls["in_flight"] -= 1
+        if fnr == "1 x":
+            raise ValueError("upstream failed")
+        return COMPANY
+
+    async def check_name_search_cache(term):
+        calls["name"].append(term)
+        if "nobody" in term.lower():
+            return []
+        return [
+            {"fnr": "2 b", "status": "deleted", "name": ["Signa"], "location": "Wien"},
+            {"fnr": "583360 h", "status": "active", "name": ["SIGNA Holding GmbH"], "location": "Wien"},
+        ]
+
+    monkeypatch.setattr(screening, "GET_COMPANY", GET_COMPANY)
+    monkeypatch.setattr(screening, "check_name_search_cache", check_name_search_cache)
+    monkeypatch.setattr(screening, "SCREEN_CONCURRENCY", limit)
+    monkeypatch.setattr(screening, "_budget", None)
+    return calls
+
+
+async def collect(terms):
+    return [result async for result in screen(terms)]
+
+
+def test_normalize():
+    assert normalize("583360h") == normalize(" 583360 h")
+    assert normalize("Signa  Holding") == normalize("SIGNA holding")
+    assert normalize("583360h") != normalize("Signa Holding")
+
+
+def test_dedupe_and_resolve(monkeypatch):
+    calls = fake_lookups(monkeypatch)
+    results = asyncio.run(
+        collect(["583360h", "583360 h", "Signa Holding GmbH", "signa holding gmbh", " "])
+    )
+
+    assert len(results) == 2
+    assert calls["name"] == ["Signa Holding GmbH"]
+    by_mode = {result["mode"]: result for result in results}
+    assert by_mode["fnr"]["fnr"] == "583360 h"
+    # The exact name beats the first (deleted) hit
+    assert by_mode["name"]["fnr"] == "583360 h"
+    assert by_mode["name"]["candidates"] == 2
+    assert by_mode["name"]["glance"]["company_name"] == "SIGNA Holding GmbH"
+    assert by_mode["name"]["glance"]["error"] == "Financial data is unavailable"
+
+
+def test_name_match_uses_the_graph_fnr(monkeypatch):
+    calls = fake_lookups(monkeypatch)
+
+    async def check_name_search_cache(term):
+        return [{"fnr": "583360h", "status": "active", "name": ["SIGNA Holding GmbH"], "location": "Wien"}]
+
+    monkeypatch.setattr(screening, "check_name_search_cache", check_name_search_cache)
+    results = asyncio.run(collect(["SIGNA Holding GmbH"]))
+
+    # Same key as /view and the FNR terms, not the spelling of the search result
+    assert calls["company"] == ["583360 h"]
+    assert results[0]["fnr"] == "583360 h"
+
+
+def test_errors_are_reported_per_term(monkeypatch):
+    fake_lookups(monkeypatch)
+    results = asyncio.run(collect(["1x", "Nobody GmbH", "583360h"]))
+
+    errors = {result["query"]: result.get("error") for result in results}
+    assert errors == {"1x": "upstream failed", "Nobody GmbH": "No company found", "583360h": None}
+
+
+def test_concurrency_budget(monkeypatch):
+    calls = fake_lookups(monkeypatch, limit=3)
+    results = asyncio.run(collect([f"{i} a" for i in range(1, 20)]))
+
+    assert len(results) == 19
+    assert calls["max_in_flight"] == 3
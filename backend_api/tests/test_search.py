@@ -1,9 +1,11 @@
+import asyncio
+
 from backend_api.search import search_by_name, search_by_fnr
 from config import TEST_COMPANY_NAME, TEST_COMPANY_FNR
 
 
 def test_search_by_name_output():
-    result = search_by_name(TEST_COMPANY_NAME)
+    result = asyncio.run(search_by_name(TEST_COMPANY_NAME))
     assert isinstance(result, list)
     unit = result[0]
     assert isinstance(unit, dict)
@@ -30,7 +32,7 @@ def test_search_by_name_output():
     assert "text" in unit["responsible_court"]
 
 def test_search_by_fnr_output():
-    company = search_by_fnr(TEST_COMPANY_FNR)
+    company = asyncio.run(search_by_fnr(TEST_COMPANY_FNR))
     assert isinstance(company, dict)
 
     assert "fnr" in company
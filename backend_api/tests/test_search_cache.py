@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+from backend_api.search_cache import SearchCache
+
+RESULT = [{"fnr": "583360h", "status": "active", "name": ["SIGNA"], "location": "Wien"}]
+
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, term):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return [{**RESULT[0], "call": self.calls}]
+
+
+def test_hit_and_shared_tier(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    loader = Loader()
+
+    async def run():
+        cache = SearchCache(path, 1024 * 1024, fresh_for=60, expire_after=3600)
+        first = await cache.get("signa", loader)
+        assert await cache.get("signa", loader) == first
+
+        # Another worker (or a restart) reads it from the file
+        other = SearchCache(path, 1024 * 1024, fresh_for=60, expire_after=3600)
+        assert await other.get("signa", loader) == first
+
+    asyncio.run(run())
+    assert loader.calls == 1
+
+
+def test_stale_while_revalidate(tmp_path):
+    loader = Loader()
+
+    async def run():
+        cache = SearchCache(str(tmp_path / "cache.sqlite"), 1024 * 1024, fresh_for=60, expire_after=3600)
+        await cache.put("signa", RESULT)
+        # Make it stale
+        stored_at, value, size = cache._memory["signa"]
+        cache._memory["signa"] = (time.time() - 120, value, size)
+
+        # Served instantly, refreshed once in the background
+        assert await cache.get("signa", loader) == RESULT
+        assert await cache.get("signa", loader) == RESULT
+        await asyncio.gather(*cache._refreshing.values())
+
+        assert (await cache.get("signa", loader))[0]["call"] == 1
+
+    asyncio.run(run())
+    assert loader.calls == 1
+
+
+def test_memory_is_bounded_by_bytes(tmp_path):
+    async def run():
+        cache = SearchCache(str(tmp_path / "cache.sqlite"), 200, fresh_for=60, expire_after=3600)
+        for term in ("a", "b", "c"):
+            await cache.put(term, RESULT)
+
+        assert cache._memory_bytes <= 200
+        assert "a" not in cache._memory
+        assert "c" in cache._memory
+        # Still in the shared tier
+        assert await cache.get("a", Loader()) == RESULT
+
+    asyncio.run(run())
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from backend_api.single_flight import SingleFlight, flight_calls
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test_share")
+    calls = []
+
+    async def build(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return {"fnr": key}
+
+    async def run():
+        results = await asyncio.gather(
+            *(flight.do("583360h", lambda: build("583360h")) for _ in range(10)),
+            flight.do("435836k", lambda: build("435836k")),
+        )
+        # Finished, the next call runs again
+        await flight.do("583360h", lambda: build("583360h"))
+        return results
+
+    results = asyncio.run(run())
+    assert calls == ["583360h", "435836k", "583360h"]
+    assert all(result is results[0] for result in results[:10])
+    assert flight_calls.value(group="test_share", result="coalesced") == 9
+    assert flight_calls.value(group="test_share", result="led") == 3
+
+
+def test_errors_reach_every_caller():
+    flight = SingleFlight("test_errors")
+
+    async def build():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def run():
+        return await asyncio.gather(
+            *(flight.do("x", build) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert [type(result) for result in results] == [ValueError] * 3
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    flight = SingleFlight("test_cancel")
+
+    async def build():
+        await asyncio.sleep(0.02)
+        return 42
+
+    async def run():
+        first = asyncio.create_task(flight.do("x", build))
+        second = asyncio.create_task(flight.do("x", build))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == 42
@@ -0,0 +1,182 @@
+import asyncio
+import os
+
+import pytest
+from neo4j import AsyncGraphDatabase
+
+from backend_api import NETWORK
+from backend_api.config import DB
+
+# A Neo4j 5 database the queries are compiled against (docker-compose in database/)
+NEO4J_TEST_URI = os.getenv("NEO4J_TEST_URI")
+NEO4J_TEST_AUTH = (
+    os.getenv("NEO4J_TEST_USER", "neo4j"),
+    os.getenv("NEO4J_TEST_PASSWORD", "test1234567"),
+)
+
+
+class FakeResult:
+    def __init__(self, record):
+        self.record = record
+
+    async def single(self):
+        return self.record
+
+    async def data(self):
+        return self.record
+
+
+class FakeSession:
+    def __init__(self, record, queries):
+        self.record = record
+        self.queries = queries
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, cypher, **params):
+        self.queries.append((cypher, params))
+        return FakeResult(self.record)
+
+
+class FakeDriver:
+    def __init__(self, record, *more):
+        # One query per session, answered with the records in order (the last one repeats)
+        self.records = [record, *more]
+        self.queries = []
+
+    def session(self, database=None):
+        record = self.records.pop(0) if len(self.records) > 1 else self.records[0]
+        return FakeSession(record, self.queries)
+
+
+RECORD = {
+    "nodes": [
+        {"element_id": "1", "type": "Company", "properties": {"company_id": "583360 h", "risk_level": "H"}},
+        {"element_id": "2", "type": "Manager", "properties": {"manager_key": "1960-01-01|René Benko"}},
+        {"element_id": "3", "type": "Company", "properties": {"company_id": "435836 k", "risk_level": None}},
+    ],
+    "edges": [
+        {"from": "1", "to": "2", "type": "HAS_MANAGER"},
+        {"from": "3", "to": "2", "type": "HAS_MANAGER"},
+        # Reached from both sides
+        {"from": "1", "to": "2", "type": "HAS_MANAGER"},
+    ],
+}
+
+
+def test_subgraph(monkeypatch):
+    driver = FakeDriver(RECORD)
+    monkeypatch.setattr(NETWORK, "driver", driver)
+
+    subgraph = asyncio.run(
+        NETWORK.GET_SUBGRAPH("583360 h", "Company", depth=3, limit=50, fanout=10, labels=["Company", "Manager"])
+    )
+
+    assert [node["id"] for node in subgraph["nodes"]] == [
+        "Company:583360 h",
+        "Manager:1960-01-01|René Benko",
+        "Company:435836 k",
+    ]
+    assert subgraph["edges"] == [
+        {"from": "Company:583360 h", "to": "Manager:1960-01-01|René Benko", "type": "HAS_MANAGER"},
+        {"from": "Company:435836 k", "to": "Manager:1960-01-01|René Benko", "type": "HAS_MANAGER"},
+    ]
+
+    cypher, params = driver.queries[0]
+    # One query, one expansion per hop
+    assert cypher.count("LIMIT $fanout") == 3
+    assert params == {
+        "node_id": "583360 h",
+        "labels": ["Company", "Manager"],
+        "fanout": 10,
+        "limit": 50,
+        "sentinels": ["UNKNOWN"],
+    }
+
+
+def test_missing_node(monkeypatch):
+    monkeypatch.setattr(NETWORK, "driver", FakeDriver(None))
+    assert asyncio.run(NETWORK.GET_SUBGRAPH("1 x", "Company", 2, 50, 10, ["Company"])) == {"nodes": [], "edges": []}
+
+
+def neighbour_rows(ids, rank=0):
+    return [{"result": {"company_id": id}, "rank": rank, "id": f"4:{id}"} for id in ids]
+
+
+def test_small_nodes_are_returned_whole(monkeypatch):
+    driver = FakeDriver({"degree": 2}, neighbour_rows(["a", "b"]))
+    monkeypatch.setattr(NETWORK, "driver", driver)
+
+    page = asyncio.run(NETWORK.GET_NEIGHBOURS("583360 h", "Company", limit=100))
+    assert page == {
+        "neighbours": [{"result": {"company_id": "a"}}, {"result": {"company_id": "b"}}],
+        "degree": 2,
+        "order": "id",
+        "next_cursor": None,
+    }
+    cypher, params = driver.queries[1]
+    assert params["sentinels"] == ["UNKNOWN"]
+    assert params["by_risk"] is False
+
+
+def test_supernodes_are_paged_by_risk(monkeypatch):
+    driver = FakeDriver({"degree": 5000}, neighbour_rows(["a", "b", "c"], rank=1))
+    monkeypatch.setattr(NETWORK, "driver", driver)
+
+    page = asyncio.run(NETWORK.GET_NEIGHBOURS("Somestreet 1, 1010 Wien", "Address", limit=2))
+    assert page["order"] == "risk"
+    assert len(page["neighbours"]) == 2
+    assert NETWORK.decode_cursor(page["next_cursor"]) == (1, "4:b")
+    # Asked for one more row to know there is a next page
+    assert driver.queries[1][1]["limit"] == 3
+
+    driver = FakeDriver({"degree": 5000}, neighbour_rows(["c"], rank=1))
+    monkeypatch.setattr(NETWORK, "driver", driver)
+    page = asyncio.run(
+        NETWORK.GET_NEIGHBOURS("Somestreet 1, 1010 Wien", "Address", limit=2, cursor=page["next_cursor"])
+    )
+    assert page["next_cursor"] is None
+    assert (driver.queries[1][1]["rank"], driver.queries[1][1]["after"]) == (1, "4:b")
+
+
+def test_sentinels_are_not_expanded(monkeypatch):
+    driver = FakeDriver(None)
+    monkeypatch.setattr(NETWORK, "driver", driver)
+
+    page = asyncio.run(NETWORK.GET_NEIGHBOURS("UNKNOWN", "Address"))
+    assert page["neighbours"] == []
+    assert driver.queries == []
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        NETWORK.decode_cursor("not a cursor")
+
+
+@pytest.mark.skipif(not NEO4J_TEST_URI, reason="needs a Neo4j 5 database in NEO4J_TEST_URI")
+def test_queries_compile(monkeypatch):
+    """
+    The fakes above only see the Cypher text, the database has to plan it
+    """
+    driver = FakeDriver(None, None, {"degree": 5000}, [], {"degree": 5000}, [])
+    monkeypatch.setattr(NETWORK, "driver", driver)
+
+    async def run():
+        await NETWORK.GET_SUBGRAPH("583360 h", "Company", 1, 50, 10, ["Company", "Manager", "Address"])
+        await NETWORK.GET_SUBGRAPH("583360 h", "Company", 3, 50, 10, ["Company", "Manager", "Address"])
+        await NETWORK.GET_NEIGHBOURS("Somestreet 1, 1010 Wien", "Address", limit=2, order="risk")
+        await NETWORK.GET_NEIGHBOURS(
+            "583360 h", "Company", limit=2, order="sample", cursor=NETWORK.encode_cursor(1, "4:b")
+        )
+
+        async with AsyncGraphDatabase.driver(NEO4J_TEST_URI, auth=NEO4J_TEST_AUTH) as real:
+            async with real.session(database=DB) as session:
+                for cypher, params in driver.queries:
+                    await (await session.run(f"EXPLAIN {cypher}", **params)).consume()
+
+    asyncio.run(run())
+    assert len(driver.queries) == 6
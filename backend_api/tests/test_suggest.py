@@ -0,0 +1,48 @@
+from backend_api.suggest import SuggestIndex
+
+COMPANIES = [
+    {"fnr": "583360 h", "name": "SIGNA Holding GmbH", "location": "Innsbruck", "status": "active"},
+    {"fnr": "435836 k", "name": "Signa Prime Selection AG", "location": "Wien", "status": "active"},
+    {"fnr": "12345 a", "name": "Signa", "location": "Wien", "status": "deleted"},
+    {"fnr": "570748 k", "name": "Bäckerei Müller GmbH", "location": "Graz", "status": "active"},
+    {"fnr": "284723 k", "name": "Sigmund Freud Privatuniversität Wien GmbH", "location": "Wien", "status": "active"},
+]
+
+
+def fnrs(results):
+    return [result["fnr"] for result in results]
+
+
+def test_name_prefixes():
+    index = SuggestIndex(COMPANIES)
+    assert len(index) == 5
+
+    # Active before deleted, shorter names first
+    assert fnrs(index.suggest("signa")) == ["583360 h", "435836 k", "12345 a"]
+    assert fnrs(index.suggest("SIG")) == ["583360 h", "435836 k", "284723 k", "12345 a"]
+    assert fnrs(index.suggest("sig", 2)) == ["583360 h", "435836 k"]
+    # Any word of the name, umlauts folded
+    assert fnrs(index.suggest("prime sel")) == ["435836 k"]
+    assert fnrs(index.suggest("müll")) == ["570748 k"]
+    assert fnrs(index.suggest("baeckerei")) == ["570748 k"]
+    assert index.suggest("holding") == [
+        {"fnr": "583360 h", "status": "active", "name": ["SIGNA Holding GmbH"], "location": "Innsbruck"}
+    ]
+
+
+def test_fnr_prefixes():
+    index = SuggestIndex(COMPANIES)
+
+    assert fnrs(index.suggest("583360")) == ["583360 h"]
+    assert fnrs(index.suggest("583360h")) == ["583360 h"]
+    assert fnrs(index.suggest("583360 h")) == ["583360 h"]
+
+
+def test_long_queries_and_misses():
+    index = SuggestIndex(COMPANIES)
+
+    assert fnrs(index.suggest("sigmund freud privatuniversitaet")) == ["284723 k"]
+    assert index.suggest("sigmund freud privatuniversitaet graz") == []
+    assert index.suggest("xyz") == []
+    assert index.suggest("") == []
+    assert SuggestIndex([]).suggest("signa") == []
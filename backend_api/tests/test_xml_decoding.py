@@ -0,0 +1,28 @@
+from backend_api.company_information import parse_xml_document, xml_decoding
+
+TEXT = "Gesellschaft für Bäckerei Müller und Söhne"
+
+
+def test_declared_encoding():
+    before = xml_decoding.value(path="declared")
+    content = f'<?xml version="1.0" encoding="ISO-8859-1"?><a>{TEXT}</a>'.encode("latin-1")
+
+    assert parse_xml_document(content).text == TEXT
+    assert xml_decoding.value(path="declared") == before + 1
+
+
+def test_undeclared_utf8():
+    before = xml_decoding.value(path="utf8")
+    content = f"<a>{TEXT}</a>".encode("utf-8")
+
+    assert parse_xml_document(content).text == TEXT
+    assert xml_decoding.value(path="utf8") == before + 1
+
+
+def test_detection_fallback():
+    before = xml_decoding.value(path="detected")
+    # Not UTF-8 and nothing declared
+    content = f"<a>{TEXT} {TEXT} {TEXT}</a>".encode("cp1252")
+
+    assert parse_xml_document(content).text.startswith(TEXT)
+    assert xml_decoding.value(path="detected") == before + 1
@@ -1,15 +1,43 @@
 import zipfile
 import io
-import json
 import os
+import sys
+import argparse
+import csv
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from neo4j import GraphDatabase
 import xml.etree.ElementTree as ET
 import datetime
 from types import SimpleNamespace
 
+# The name index format is shared with the backend
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from backend_api.name_index import NameIndexWriter
+
 
 BATCH_SIZE = 1000
-PROGRESS_FILE = "progress.txt"
+# Zip entries per task of a parse process
+PARSE_CHUNK = 200
+# Content hash of every company as last written, what makes the next run a delta,
+# and how far into the zip a stopped run got
+STATE_PATH = os.getenv("BUILDDB_STATE", "state.sqlite")
+# Where the backend looks for it by default
+NAME_INDEX_PATH = os.getenv(
+    "NAME_INDEX_PATH",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "..",
+        "backend_api",
+        "data",
+        "name_index.sqlite",
+    ),
+)
 
 NEO4J_URI = "bolt://localhost:7687"
 NEO4J_AUTH = ("neo4j", "test1234567")
@@ -21,43 +49,262 @@ driver = GraphDatabase.driver(
 )
 
 
+# Same as the backend (NETWORK.create_indexes), also what keeps concurrent writers
+# from merging the same manager or address twice
+CONSTRAINTS = [
+    "CREATE CONSTRAINT company_id_unique IF NOT EXISTS FOR (c:Company) REQUIRE c.company_id IS UNIQUE",
+    "CREATE CONSTRAINT manager_key_unique IF NOT EXISTS FOR (m:Manager) REQUIRE m.manager_key IS UNIQUE",
+    "CREATE CONSTRAINT address_key_unique IF NOT EXISTS FOR (a:Address) REQUIRE a.address_key IS UNIQUE",
+]
+
+
+# What an Auszug without an address is located at, connects nothing (the backend's
+# SENTINEL_ADDRESSES)
+UNKNOWN_ADDRESS = "UNKNOWN"
+
 CYPHER = """
 UNWIND $rows AS row
 
 MERGE (c:Company {company_id: row.company_id})
-SET c.data   = row.information,
-    c.glance = row.glance,
-    c.updated_at = $datetime
+SET c += row.properties,
+    // A company the backend already built keeps its payload and timestamp
+    c.updated_at = CASE WHEN c.payload IS NULL THEN $datetime ELSE c.updated_at END
+
+// All relationships of a company the backend never built were written here,
+// runs from before they were tagged left them without a source
+WITH c, row
+CALL {
+  WITH c
+  MATCH (c)-[untagged:LOCATED_AT|HAS_MANAGER]->()
+  WHERE c.payload IS NULL AND untagged.source IS NULL
+  SET untagged.source = 'builddb'
+}
+
+// A changed company loses the address and managers it doesn't have anymore. Only the
+// relationships written here, the backend builds its own keys for the ones it adds.
+// Like NETWORK.CREATE_COMPANY, the companies on both sides of a removed or added
+// relationship get their network risk recomputed
+CALL {
+  WITH c, row
+  MATCH (c)-[old:LOCATED_AT|HAS_MANAGER {source: 'builddb'}]->(shared)
+  WHERE CASE
+    WHEN shared:Address THEN shared.address_key <> row.addr_key
+    ELSE NOT shared.manager_key IN row.mgr_keys
+  END
+  DELETE old
+  SET c.network_stale = true
+  WITH c, shared
+  MATCH (shared)<-[:LOCATED_AT|HAS_MANAGER]-(other:Company)
+  WHERE other <> c AND NOT coalesce(shared.address_key, '') IN $sentinels
+  SET other.network_stale = true
+}
+
+WITH c, row,
+  [key IN [row.addr_key]
+    WHERE NOT EXISTS { (c)-[:LOCATED_AT]->(:Address {address_key: key}) }] AS new_addresses,
+  [key IN row.mgr_keys
+    WHERE NOT EXISTS { (c)-[:HAS_MANAGER]->(:Manager {manager_key: key}) }] AS new_managers
 
 MERGE (a:Address {address_key: row.addr_key})
-MERGE (c)-[:LOCATED_AT]->(a)
+MERGE (c)-[located:LOCATED_AT]->(a)
+  ON CREATE SET located.source = 'builddb'
 
-WITH c, row
-UNWIND row.mgr_keys AS mk
+WITH c, row, new_addresses, new_managers
+CALL {
+  WITH c, row
+  UNWIND row.mgr_keys AS mk
   MERGE (m:Manager {manager_key: mk})
-  MERGE (c)-[:HAS_MANAGER]->(m)
+  MERGE (c)-[manages:HAS_MANAGER]->(m)
+    ON CREATE SET manages.source = 'builddb'
+}
+CALL {
+  WITH c, new_addresses, new_managers
+  WITH *
+  WHERE size(new_addresses) + size(new_managers) > 0
+  SET c.network_stale = true
+  WITH *
+  MATCH (c)-[:LOCATED_AT|HAS_MANAGER]->(shared)<-[:LOCATED_AT|HAS_MANAGER]-(other:Company)
+  WHERE other <> c
+    AND NOT coalesce(shared.address_key, '') IN $sentinels
+    AND (shared.address_key IN new_addresses OR shared.manager_key IN new_managers)
+  SET other.network_stale = true
+}
 """
 
 
+def create_constraints():
+    with driver.session() as session:
+        for statement in CONSTRAINTS:
+            session.run(statement)
+
+
 def write_batch(batch):
     with driver.session() as session:
-        session.run(
-            CYPHER, rows=batch, datetime=datetime.datetime(2000, 1, 1).timestamp()
+        # Retried on transient errors, e.g. a deadlock between writers merging the same manager
+        session.execute_write(
+            lambda tx: tx.run(
+                CYPHER,
+                rows=batch,
+                datetime=datetime.datetime(2000, 1, 1).timestamp(),
+                sentinels=[UNKNOWN_ADDRESS],
+            ).consume()
         )  # if it breaks we can blame y2k
 
 
-# in case of crash
-def load_processed():
-    if not os.path.exists(PROGRESS_FILE):
-        return set()
-    with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
-        return set(line.strip() for line in f if line.strip())
+class IngestState:
+    """
+    Content hash of every company as it was last written. A company whose hash didn't change
+    since is skipped, so a new export only writes what changed.
+    The checkpoint of a zip is the number of its entries whose companies are all committed,
+    a run that was stopped continues from there instead of parsing the zip again.
+    Hashes and checkpoint are stored together, once their batch is committed.
+    """
 
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS companies (company_id TEXT PRIMARY KEY, hash TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                zip TEXT PRIMARY KEY,
+                entries INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            """
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def changed(self, rows):
+        """
+        The rows that are new or differ from what was written last time
+        """
+        stored = {}
+        with self._lock:
+            # SQLite allows 999 parameters per query
+            for start in range(0, len(rows), 900):
+                ids = [row["company_id"] for row in rows[start : start + 900]]
+                stored.update(
+                    self._db.execute(
+                        f"SELECT company_id, hash FROM companies WHERE company_id IN ({','.join('?' * len(ids))})",
+                        ids,
+                    ).fetchall()
+                )
+        return [row for row in rows if stored.get(row["company_id"]) != row["hash"]]
+
+    def commit(self, rows, zip=None, entries=None):
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO companies (company_id, hash) VALUES (?, ?)",
+                [(row["company_id"], row["hash"]) for row in rows],
+            )
+            if zip is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO checkpoints (zip, entries, updated_at) VALUES (?, ?, ?)",
+                    (zip, entries, datetime.datetime.now().timestamp()),
+                )
+
+    def checkpoint(self, zip):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT entries FROM checkpoints WHERE zip = ?", (zip,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def finish(self, zip):
+        # The whole zip is in, the next run of it is a delta again
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM checkpoints WHERE zip = ?", (zip,))
+
+    def reset(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM companies")
+            self._db.execute("DELETE FROM checkpoints")
+
+    def close(self):
+        self._db.close()
+
+
+class BatchWriter:
+    """
+    Writer threads committing batches while the zip is still being parsed.
+    put() blocks while max_queued batches are waiting, close() waits for the rest.
 
-def mark_processed(company_ids):
-    with open(PROGRESS_FILE, "a", encoding="utf-8") as f:
-        for fnr in company_ids:
-            f.write(fnr + "\n")
+    Batches commit out of order, the checkpoint of the zip only moves up to the
+    entries of the last batch that all batches before it are committed.
+    """
+
+    def __init__(self, writers, max_queued, state, zip):
+        self.state = state
+        self.zip = zip
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._next = 0
+        # Batch number -> entries it completes, of the batches committed ahead of an earlier one
+        self._done = {}
+        self._committed = 0
+        self.total = 0
+        self.error = None
+        self._threads = [
+            threading.Thread(target=self._work, daemon=True) for _ in range(writers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, batch, entries):
+        """
+        entries: the zip entries that are done once batch is committed.
+        An empty batch only moves the checkpoint.
+        """
+        item = (self._next, batch, entries)
+        self._next += 1
+        while True:
+            if self.error:
+                raise self.error
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            # After a failure the rest is only drained, so put() and close() don't hang
+            if self.error:
+                continue
+            number, batch, entries = item
+            try:
+                if batch:
+                    write_batch(batch)
+            except Exception as e:
+                self.error = e
+                continue
+
+            with self._lock:
+                self._done[number] = entries
+                checkpoint = None
+                while self._committed in self._done:
+                    checkpoint = self._done.pop(self._committed)
+                    self._committed += 1
+                self.state.commit(
+                    batch, self.zip if checkpoint is not None else None, checkpoint
+                )
+                if batch:
+                    self.total += len(batch)
+                    print(f"Wrote {self.total} companies")
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self.error:
+            raise self.error
 
 
 def json_date(date):
@@ -161,6 +408,28 @@ def extract_management_info(root):
     return management_list
 
 
+def extract_search_info(root, glance):
+    """
+    Row of the name index, in the format of the SUCHEFIRMA results
+    """
+    seat = root.findtext("ns1:FIRMA/ns1:FI_DKZ06/ns1:SITZ", default=None, namespaces=NS)
+
+    # Same as the backend: the last registered event of a deleted company is its deletion
+    events = root.findall("ns1:VOLLZ", NS)
+    last_event = (
+        events[-1].findtext("ns1:ANTRAGSTEXT", default="", namespaces=NS)
+        if events
+        else ""
+    )
+
+    return {
+        "fnr": glance["company_number"],
+        "name": glance["company_name"],
+        "location": seat,
+        "status": "deleted" if "löschung" in last_event.lower() else "active",
+    }
+
+
 def find_zip_path():
     for filename in os.listdir("."):
         if filename.startswith("auszuege") and filename.endswith(".zip"):
@@ -168,62 +437,352 @@ def find_zip_path():
     raise Exception("Zip could not be found")
 
 
-def process_zip(zip_path, processed):
-    batch = []
-    total = 0
+def parse_entry(data):
+    """
+    (name index row, graph row) of one Auszug, None if it isn't valid XML.
+    The graph row is None for an entry without an FNR.
+    """
+    try:
+        root = ET.fromstring(data)
+    except ET.ParseError:
+        return None
+
+    glance = extract_glance(root)
+    company_id = glance["company_number"]
+    search_info = extract_search_info(root, glance)
+    if not company_id:
+        return search_info, None
+
+    row = {
+        "company_id": company_id,
+        # Same typed properties as the backend's glance (backend_api.NETWORK.glance_properties)
+        "properties": {
+            "company_name": glance["company_name"],
+            "legal_form": glance["legal_form"],
+            "european_id": glance["european_id"],
+            "deleted": search_info["status"] == "deleted",
+        },
+        "addr_key": extract_location_info(root) or UNKNOWN_ADDRESS,
+        "mgr_keys": extract_management_info(root),
+    }
+    row["hash"] = content_hash(row)
+    return search_info, row
+
+
+def content_hash(row):
+    # Everything that ends up in the graph, the order of the managers doesn't matter
+    content = [row["properties"], row["addr_key"], sorted(set(row["mgr_keys"]))]
+    return hashlib.blake2b(
+        json.dumps(content, sort_keys=True, ensure_ascii=False).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+# The zip as opened by each parse process
+_zip = None
+
+
+def _open_zip(zip_path):
+    global _zip
+    _zip = zipfile.ZipFile(zip_path, "r")
+
+
+def parse_entries(names):
+    # Runs in a parse process, which also reads and decompresses the entries itself
+    return [parse_entry(_zip.read(name)) for name in names]
+
 
+def zip_key(zip_path):
+    # The same export under the same name, what a checkpoint belongs to
+    return f"{os.path.basename(zip_path)}:{os.path.getsize(zip_path)}"
+
+
+def parse_zip(zip_path, workers, start=0):
+    """
+    (entry number, parsed entry) in zip order, from entry start on.
+    At most two chunks per process are in flight, so parsing can't run away from the writers.
+    """
     with zipfile.ZipFile(zip_path, "r") as zf:
-        for entry in zf.infolist():
-            if entry.is_dir():
-                continue
+        names = [
+            entry.filename
+            for entry in zf.infolist()
+            if not entry.is_dir() and entry.filename.endswith(".xml")
+        ]
+
+    def results(future, first):
+        for entry, parsed in enumerate(future.result(), first):
+            if parsed:
+                yield entry, parsed
+
+    with ProcessPoolExecutor(
+        workers, initializer=_open_zip, initargs=(zip_path,)
+    ) as pool:
+        pending = deque()
+        try:
+            for first in range(start, len(names), PARSE_CHUNK):
+                pending.append(
+                    (pool.submit(parse_entries, names[first : first + PARSE_CHUNK]), first)
+                )
+                if len(pending) >= 2 * workers:
+                    yield from results(*pending.popleft())
+            while pending:
+                yield from results(*pending.popleft())
+        finally:
+            for future, _ in pending:
+                future.cancel()
+
+
+def company_rows(zip_path, name_index, workers, start=0):
+    """
+    (entry number, graph row) of the zip, the name index (if any) is filled on the way
+    """
+    index_batch = []
+    for entry, (search_info, row) in parse_zip(zip_path, workers, start):
+        # The index is rebuilt from the whole export, including companies already in the graph
+        if name_index is not None:
+            index_batch.append(search_info)
+            if len(index_batch) >= BATCH_SIZE:
+                name_index.add(index_batch)
+                index_batch.clear()
 
-            if not entry.filename.endswith(".xml"):
-                continue
+        if row is not None:
+            yield entry, row
 
-            with zf.open(entry) as f:
-                try:
-                    root = ET.fromstring(f.read())
-                except ET.ParseError:
-                    continue
+    if index_batch:
+        name_index.add(index_batch)
 
-                glance = extract_glance(root)
-                company_id = glance["company_number"]
 
-                if not company_id or company_id in processed:
-                    continue
+def process_zip(zip_path, state, name_index, workers=1, writers=1, full=False):
+    """
+    Writes the companies that changed since the last run (all of them with full).
+    A stopped run of the same zip continues after the last committed batch.
+    """
+    checkpoint = zip_key(zip_path)
+    start = state.checkpoint(checkpoint)
+    if start:
+        print(f"Continuing after entry {start}")
 
-                location = extract_location_info(root)
-                managers = extract_management_info(root)
+    batch = []
+    unchecked = []
+    unchanged = 0
+    entries = start
+    writer = BatchWriter(writers, max_queued=2 * writers, state=state, zip=checkpoint)
+
+    def check():
+        nonlocal unchanged
+        changed = list(unchecked) if full else state.changed(unchecked)
+        unchanged += len(unchecked) - len(changed)
+        unchecked.clear()
+        return changed
+
+    try:
+        for entry, row in company_rows(zip_path, name_index, workers, start):
+            unchecked.append(row)
+            entries = entry + 1
+            if len(unchecked) >= BATCH_SIZE:
+                batch.extend(check())
+                # Also when nothing changed, so the checkpoint moves over unchanged stretches
+                if len(batch) >= BATCH_SIZE or not batch:
+                    writer.put(batch, entries)
+                    batch = []
+
+        batch.extend(check())
+        writer.put(batch, entries)
+    finally:
+        # Also on Ctrl+C: what was parsed and queued is still committed
+        writer.close()
+
+    state.finish(checkpoint)
+    print(f"Wrote {writer.total} companies, {unchanged} unchanged (final)")
+
+
+class BulkExport:
+    """
+    CSV files for `neo4j-admin database import full`, written in one pass over the zip.
+    Managers and addresses are shared by many companies but must be written once,
+    the keys written so far are kept (a hash of them could collide and drop a node).
+    """
 
-                row = {
-                    "company_id": company_id,
-                    "information": json.dumps(
-                        {"glance": glance, "location": location, "management": managers}
-                    ),
-                    "glance": json.dumps(glance),
-                    "addr_key": location or "UNKNOWN",
-                    "mgr_keys": managers,
-                }
+    # file -> header, in the importer's format
+    FILES = {
+        "companies": [
+            "company_id:ID(Company)",
+            "company_name",
+            "legal_form",
+            "european_id",
+            "deleted:boolean",
+            "updated_at:double",
+        ],
+        "addresses": ["address_key:ID(Address)"],
+        "managers": ["manager_key:ID(Manager)"],
+        "located_at": [":START_ID(Company)", ":END_ID(Address)", "source"],
+        "has_manager": [":START_ID(Company)", ":END_ID(Manager)", "source"],
+    }
 
-                batch.append(row)
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._files = {}
+        self._writers = {}
+        for name, header in self.FILES.items():
+            f = open(os.path.join(directory, f"{name}.csv"), "w", encoding="utf-8", newline="")
+            self._files[name] = f
+            self._writers[name] = csv.writer(f)
+            self._writers[name].writerow(header)
+
+        self._seen = {"companies": set(), "addresses": set(), "managers": set()}
+        self.updated_at = datetime.datetime(2000, 1, 1).timestamp()
+
+    def _first(self, name, key):
+        if key in self._seen[name]:
+            return False
+        self._seen[name].add(key)
+        return True
+
+    def add(self, row):
+        """
+        False for a company that was already exported
+        """
+        company_id = row["company_id"]
+        if not self._first("companies", company_id):
+            return False
+
+        properties = row["properties"]
+        self._writers["companies"].writerow(
+            [
+                company_id,
+                properties["company_name"],
+                properties["legal_form"],
+                properties["european_id"],
+                "true" if properties["deleted"] else "false",
+                self.updated_at,
+            ]
+        )
+
+        if self._first("addresses", row["addr_key"]):
+            self._writers["addresses"].writerow([row["addr_key"]])
+        self._writers["located_at"].writerow([company_id, row["addr_key"], "builddb"])
+
+        for manager_key in dict.fromkeys(row["mgr_keys"]):
+            if self._first("managers", manager_key):
+                self._writers["managers"].writerow([manager_key])
+            self._writers["has_manager"].writerow([company_id, manager_key, "builddb"])
+        return True
+
+    @property
+    def companies(self):
+        return len(self._seen["companies"])
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+
+    def command(self, database="neo4j"):
+        """
+        The import to run against the stopped database, paths as mounted in the container
+        """
+        return (
+            "neo4j-admin database import full --overwrite-destination --id-type=string"
+            " --nodes=Company=/import/companies.csv"
+            " --nodes=Address=/import/addresses.csv"
+            " --nodes=Manager=/import/managers.csv"
+            " --relationships=LOCATED_AT=/import/located_at.csv"
+            " --relationships=HAS_MANAGER=/import/has_manager.csv"
+            f" {database}"
+        )
 
-                if len(batch) >= BATCH_SIZE:
-                    write_batch(batch)
-                    mark_processed([r["company_id"] for r in batch])
-                    processed.update(r["company_id"] for r in batch)
-                    total += len(batch)
-                    print(f"Inserted {total} companies")
-                    batch.clear()
 
-    if batch:
-        write_batch(batch)
-        mark_processed(r["company_id"] for r in batch)
-        total += len(batch)
-        print(f"Inserted {total} companies (final)")
+def export_zip(zip_path, state, name_index, directory, workers=1):
+    """
+    The export replaces the whole database, so it also becomes the state the next delta
+    run compares with
+    """
+    export = BulkExport(directory)
+    exported = []
+    state.reset()
+    try:
+        for _, row in company_rows(zip_path, name_index, workers):
+            if not export.add(row):
+                continue
+            exported.append(row)
+            if len(exported) >= BATCH_SIZE:
+                state.commit(exported)
+                exported.clear()
+            if export.companies % 100000 == 0:
+                print(f"Exported {export.companies} companies")
+        state.commit(exported)
+    finally:
+        export.close()
+
+    print(f"Exported {export.companies} companies to {directory}, import them with")
+    print(f"  {export.command()}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load an auszuege zip into Neo4j")
+    parser.add_argument("zip", nargs="?", help="defaults to the auszuege*.zip in this directory")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="processes parsing the XML entries (default: one per core)",
+    )
+    parser.add_argument(
+        "--writers",
+        type=int,
+        default=2,
+        help="threads committing batches to Neo4j (default: 2)",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="write every company, not only the ones that changed since the last run",
+    )
+    parser.add_argument(
+        "--bulk-export",
+        metavar="DIRECTORY",
+        nargs="?",
+        const=os.path.join(os.path.dirname(os.path.abspath(__file__)), "import"),
+        help="write neo4j-admin import CSVs for a fresh database instead of writing to Neo4j"
+        " (default directory: ./import, mounted by docker-compose)",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    zip_path = find_zip_path()
-    processed = load_processed()
-    process_zip(zip_path, processed)
-    driver.close()
+    args = parse_args()
+    zip_path = args.zip or find_zip_path()
+    state = IngestState(STATE_PATH)
+    # A resumed run doesn't read the whole zip, the index of the last complete run stays
+    resume = not args.bulk_export and state.checkpoint(zip_key(zip_path))
+    name_index = None if resume else NameIndexWriter(NAME_INDEX_PATH)
+    try:
+        if args.bulk_export:
+            export_zip(
+                zip_path, state, name_index, args.bulk_export, workers=max(1, args.workers)
+            )
+        else:
+            create_constraints()
+            process_zip(
+                zip_path,
+                state,
+                name_index,
+                workers=max(1, args.workers),
+                writers=max(1, args.writers),
+                full=args.full,
+            )
+    except KeyboardInterrupt:
+        # The index of an incomplete run is dropped, the backend keeps the previous one
+        if name_index is not None:
+            name_index.abort()
+        if args.bulk_export:
+            print("Stopped, the export is incomplete")
+        else:
+            print("Stopped, run it again to continue after the last committed batch")
+        sys.exit(130)
+    finally:
+        state.close()
+        driver.close()
+
+    # Only a complete index replaces the one the backend uses
+    if name_index is not None:
+        name_index.finish()
@@ -0,0 +1,250 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+import zipfile
+
+import pytest
+from neo4j import GraphDatabase
+
+from database import builddb
+
+NS = "ns://firmenbuch.justiz.gv.at/Abfrage/v2/AuszugResponse"
+
+NEO4J_TEST_URI = os.getenv("NEO4J_TEST_URI")
+NEO4J_TEST_AUTH = (
+    os.getenv("NEO4J_TEST_USER", "neo4j"),
+    os.getenv("NEO4J_TEST_PASSWORD", "test1234567"),
+)
+
+
+def auszug(fnr, name, street="Hauptplatz 1", managers=("Anna Muster",)):
+    persons = "".join(
+        f'<ns1:PER ns1:PNR="{i}"><ns1:PE_DKZ02>'
+        f"<ns1:NAME_FORMATIERT>{manager}</ns1:NAME_FORMATIERT>"
+        f"<ns1:GEBURTSDATUM>19800101</ns1:GEBURTSDATUM>"
+        f'</ns1:PE_DKZ02></ns1:PER><ns1:FUN ns1:PNR="{i}"/>'
+        for i, manager in enumerate(managers)
+    )
+    return (
+        f'<ns1:AUSZUG xmlns:ns1="{NS}" ns1:FNR="{fnr}"><ns1:FIRMA>'
+        f"<ns1:FI_DKZ02><ns1:BEZEICHNUNG>{name}</ns1:BEZEICHNUNG></ns1:FI_DKZ02>"
+        f"<ns1:FI_DKZ03><ns1:STRASSE>{street}</ns1:STRASSE>"
+        f"<ns1:PLZ>1010</ns1:PLZ><ns1:ORT>Wien</ns1:ORT></ns1:FI_DKZ03>"
+        f"</ns1:FIRMA>{persons}</ns1:AUSZUG>"
+    )
+
+
+def write_zip(path, entries):
+    with zipfile.ZipFile(path, "w") as zf:
+        for i, entry in enumerate(entries):
+            zf.writestr(f"{i}.xml", entry)
+    return str(path)
+
+
+def companies(count):
+    return [auszug(f"{i} a", f"Firma {i} GmbH", managers=[f"Person {i}"]) for i in range(count)]
+
+
+def record_writes(monkeypatch):
+    written = []
+    monkeypatch.setattr(builddb, "write_batch", lambda batch: written.extend(batch))
+    return written
+
+
+def ids(rows):
+    return sorted(row["company_id"] for row in rows)
+
+
+def test_content_hash():
+    _, row = builddb.parse_entry(auszug("1 a", "Firma GmbH", managers=["A", "B"]))
+    _, same = builddb.parse_entry(auszug("1 a", "Firma GmbH", managers=["B", "A", "B"]))
+    _, moved = builddb.parse_entry(auszug("1 a", "Firma GmbH", "Ring 2", managers=["A", "B"]))
+
+    assert row["hash"] == same["hash"]
+    assert row["hash"] != moved["hash"]
+
+
+def test_only_changed_companies_are_written(tmp_path, monkeypatch):
+    written = record_writes(monkeypatch)
+    state = builddb.IngestState(str(tmp_path / "state.sqlite"))
+    entries = companies(5)
+
+    builddb.process_zip(write_zip(tmp_path / "auszuege1.zip", entries), state, None)
+    assert ids(written) == ["0 a", "1 a", "2 a", "3 a", "4 a"]
+
+    # Unchanged companies are skipped
+    written.clear()
+    builddb.process_zip(write_zip(tmp_path / "auszuege2.zip", entries), state, None)
+    assert written == []
+
+    # Changed ones are written again
+    entries[1] = auszug("1 a", "Firma 1 GmbH", street="Ring 2", managers=["Person 1"])
+    entries[3] = auszug("3 a", "Firma 3 GmbH", managers=["Person 3", "Person 4"])
+    builddb.process_zip(write_zip(tmp_path / "auszuege3.zip", entries), state, None)
+    assert ids(written) == ["1 a", "3 a"]
+
+    # full writes everything
+    written.clear()
+    builddb.process_zip(write_zip(tmp_path / "auszuege4.zip", entries), state, None, full=True)
+    assert ids(written) == ["0 a", "1 a", "2 a", "3 a", "4 a"]
+
+
+def test_checkpoint_waits_for_earlier_batches(tmp_path, monkeypatch):
+    release = threading.Event()
+    written = []
+
+    def write_batch(batch):
+        # The first batch is slow, the second one commits before it
+        if batch[0]["company_id"] == "0 a":
+            assert release.wait(10)
+        written.append(batch[0]["company_id"])
+
+    monkeypatch.setattr(builddb, "write_batch", write_batch)
+    state = builddb.IngestState(str(tmp_path / "state.sqlite"))
+    rows = [builddb.parse_entry(entry)[1] for entry in companies(3)]
+
+    writer = builddb.BatchWriter(3, max_queued=3, state=state, zip="auszuege.zip")
+    writer.put([rows[0]], 10)
+    writer.put([rows[1]], 20)
+    writer.put([rows[2]], 30)
+    deadline = time.monotonic() + 10
+    while len(written) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert sorted(written) == ["1 a", "2 a"]
+    # Entries 0-9 aren't committed yet, so nothing after them counts
+    assert state.checkpoint("auszuege.zip") == 0
+
+    release.set()
+    writer.close()
+    assert state.checkpoint("auszuege.zip") == 30
+
+
+def test_stopped_run_resumes_from_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(builddb, "BATCH_SIZE", 2)
+    path = write_zip(tmp_path / "auszuege.zip", companies(6))
+    state = builddb.IngestState(str(tmp_path / "state.sqlite"))
+
+    def write_batch(batch):
+        if "3 a" in ids(batch):
+            raise RuntimeError("Neo4j went away")
+
+    monkeypatch.setattr(builddb, "write_batch", write_batch)
+    with pytest.raises(RuntimeError):
+        builddb.process_zip(path, state, None)
+    # The batch of entries 0 and 1 is committed, the one of 2 and 3 isn't
+    assert state.checkpoint(builddb.zip_key(path)) == 2
+
+    # full writes every company it reads, so only the entries after the checkpoint are read
+    written = record_writes(monkeypatch)
+    builddb.process_zip(path, state, None, full=True)
+    assert ids(written) == ["2 a", "3 a", "4 a", "5 a"]
+    assert state.checkpoint(builddb.zip_key(path)) == 0
+    assert state.changed([builddb.parse_entry(entry)[1] for entry in companies(6)]) == []
+
+
+class NameIndex:
+    def __init__(self):
+        self.rows = []
+
+    def add(self, companies):
+        self.rows.extend(companies)
+
+
+def test_parallel_run_matches_single_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(builddb, "PARSE_CHUNK", 3)
+    monkeypatch.setattr(builddb, "BATCH_SIZE", 4)
+    entries = companies(20)
+    entries[5] = "<not xml"
+    entries[9] = auszug("", "Ohne FNR GmbH")
+    path = write_zip(tmp_path / "auszuege.zip", entries)
+
+    runs = []
+    for workers in (1, 3):
+        written = record_writes(monkeypatch)
+        name_index = NameIndex()
+        state_path = str(tmp_path / f"state{workers}.sqlite")
+        state = builddb.IngestState(state_path)
+        builddb.process_zip(path, state, name_index, workers=workers, writers=workers)
+        state.close()
+
+        with sqlite3.connect(state_path) as db:
+            stored = db.execute("SELECT company_id, hash FROM companies ORDER BY 1").fetchall()
+        runs.append(
+            (sorted(written, key=lambda row: row["company_id"]), name_index.rows, stored)
+        )
+
+    assert runs[0] == runs[1]
+    written, index_rows, stored = runs[0]
+    assert len(written) == len(stored) == 18
+    # The name index gets every valid entry in zip order, also the one without an FNR
+    assert [row["name"] for row in index_rows] == [
+        "Ohne FNR GmbH" if i == 9 else f"Firma {i} GmbH" for i in range(20) if i != 5
+    ]
+
+
+def read_csv(directory, name):
+    with open(os.path.join(directory, f"{name}.csv"), encoding="utf-8", newline="") as f:
+        header, *rows = csv.reader(f)
+    return header, rows
+
+
+def test_bulk_export(tmp_path):
+    entries = [
+        auszug("1 a", "Erste GmbH", managers=["Anna Muster", "Berta Beispiel"]),
+        # Same address and one of the managers
+        auszug("2 b", "Zweite GmbH", managers=["Anna Muster"]),
+        auszug("3 c", "Dritte GmbH", street="Ring 2", managers=[]),
+        # The same company twice in the export
+        auszug("1 a", "Erste GmbH", managers=["Anna Muster", "Berta Beispiel"]),
+    ]
+    directory = str(tmp_path / "import")
+    state = builddb.IngestState(str(tmp_path / "state.sqlite"))
+    builddb.export_zip(write_zip(tmp_path / "auszuege.zip", entries), state, None, directory)
+
+    nodes = {}
+    groups = [("companies", "Company"), ("addresses", "Address"), ("managers", "Manager")]
+    for name, group in groups:
+        header, rows = read_csv(directory, name)
+        # One ID column per node file, in the group the relationships refer to
+        assert [column for column in header if ":ID(" in column] == [header[0]]
+        assert header[0].endswith(f":ID({group})")
+        assert all(len(row) == len(header) for row in rows)
+        ids = [row[0] for row in rows]
+        assert len(ids) == len(set(ids))
+        nodes[group] = set(ids)
+
+    assert nodes["Company"] == {"1 a", "2 b", "3 c"}
+    assert nodes["Address"] == {"Hauptplatz 1, 1010 Wien", "Ring 2, 1010 Wien"}
+    assert nodes["Manager"] == {"1980-01-01|Anna Muster", "1980-01-01|Berta Beispiel"}
+
+    for name, end, count in [("located_at", "Address", 3), ("has_manager", "Manager", 3)]:
+        header, rows = read_csv(directory, name)
+        assert header[:2] == [":START_ID(Company)", f":END_ID({end})"]
+        assert all(len(row) == len(header) for row in rows)
+        assert len(rows) == count
+        assert all(row[0] in nodes["Company"] and row[1] in nodes[end] for row in rows)
+
+    # Every file is part of the import command
+    export = builddb.BulkExport(str(tmp_path / "other"))
+    export.close()
+    command = export.command()
+    for name in builddb.BulkExport.FILES:
+        assert f"/import/{name}.csv" in command
+
+    # The export is the state the next delta run compares with
+    assert state.changed([builddb.parse_entry(entry)[1] for entry in entries]) == []
+
+
+@pytest.mark.skipif(not NEO4J_TEST_URI, reason="NEO4J_TEST_URI is not set")
+def test_cypher_compiles():
+    with GraphDatabase.driver(NEO4J_TEST_URI, auth=NEO4J_TEST_AUTH) as driver:
+        with driver.session() as session:
+            session.run(
+                f"EXPLAIN {builddb.CYPHER}",
+                rows=[],
+                datetime=0.0,
+                sentinels=[builddb.UNKNOWN_ADDRESS],
+            ).consume()
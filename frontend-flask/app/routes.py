@@ -1,4 +1,10 @@
-from .utils import fetch_companies, get_company_data, get_node_neighbours
+from .utils import (
+    fetch_companies,
+    get_company_data,
+    get_node_neighbours,
+    get_subgraph,
+    get_suggestions,
+)
 from flask import (
     Blueprint,
     render_template,
@@ -265,6 +271,18 @@ def export_balance_sheet_year_pdf(fnr: str, idx: int):
     return resp
 
 
+@main.route("/api/suggest")
+def api_suggest():
+    """
+    Typeahead for the search box, proxies to the FastAPI /suggest endpoint.
+    """
+    term = request.args.get("q", "").strip()
+    if not term:
+        return {"result": []}
+
+    return {"result": get_suggestions(term)}
+
+
 @main.route("/api/network")
 def api_network():
     """
@@ -284,3 +302,20 @@ def api_network():
     except Exception as e:
         print(f"/api/network error: {e}")
         return {"neighbours": []}, 500
+
+
+@main.route("/api/subgraph")
+def api_subgraph():
+    """
+    Neighbourhood of a node in one request, proxies to the FastAPI /subgraph endpoint.
+    """
+    key = request.args.get("key")
+    if not key:
+        return {"nodes": [], "edges": []}, 400
+
+    params = {
+        name: request.args[name]
+        for name in ("depth", "limit", "fanout", "labels")
+        if name in request.args
+    }
+    return get_subgraph(key, request.args.get("label", "Company"), **params)
@@ -75,6 +75,34 @@
 
     });
 
+  // Typeahead: the newest answer wins, older ones arriving late are dropped
+  let suggestTimer = null;
+  let suggestRequest = 0;
+  $(document).on('input', '#search-form .searchText', function () {
+    const term = $(this).val().trim();
+    const list = $('#company-suggestions');
+    clearTimeout(suggestTimer);
+    if (term.length < 2) {
+      list.empty();
+      return;
+    }
+
+    suggestTimer = setTimeout(function () {
+      const request = ++suggestRequest;
+      $.getJSON('/api/suggest', { q: term }, function (data) {
+        if (request !== suggestRequest) return;
+        list.empty();
+        (data.result || []).forEach(function (company) {
+          // Picking a suggestion searches by its register ID
+          $('<option>')
+            .attr('value', company.fnr)
+            .text(company.name[0] + (company.location ? ' (' + company.location + ')' : ''))
+            .appendTo(list);
+        });
+      });
+    }, 80);
+  });
+
   // Search button spinner
   $(document).on('submit', '#search-form', function () {
     const btn = $('#search-btn');
@@ -167,7 +167,8 @@
   // Supports:
   // { "result": { "address_key": "..." } }
   // { "result": { "manager_key": "..." } }
-  // { "result": "{\"company_id\": \"627820s\", ...}" }
+  // { "result": { "company_id": "627820s", "company_name": ..., "risk_level": ... } }
+  // { "result": "{\"company_id\": \"627820s\", ...}" } (glance JSON of older backends)
   // Normalises one neighbour entry coming from the backend
   function parseNeighbour(neighbour) {
     if (!neighbour) return null;
@@ -246,7 +247,7 @@
       };
     }
 
-    // --- COMPANY NODE AS FULL OBJECT (if backend ever returns it) ---
+    // --- COMPANY NODE: its glance properties ---
     if (payload.company_id) {
       const id = payload.company_id;
       const name = payload.company_name || id;
@@ -258,6 +259,10 @@
         extra: {
           companyId: id,
           companyName: name,
+          deleted: payload.deleted,
+          last_file: payload.last_file,
+          missing_years: payload.missing_years,
+          profit_loss: payload.profit_loss,
           risk_level: risk
         }
       };
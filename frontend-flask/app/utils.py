@@ -31,6 +31,18 @@ def fetch_companies(term: str, page: int):
         return []
 
 
+def get_suggestions(term: str, limit: int = 10):
+    # Answered from the backend's in-memory index, short timeout since it runs on every keystroke
+    url = "http://127.0.0.1:8000/suggest"
+    try:
+        resp = requests.get(url, params={"q": term, "limit": limit}, timeout=2)
+        resp.raise_for_status()
+        return response_to_data(resp)
+    except Exception as e:
+        print(f"API error (get_suggestions): {e}")
+        return []
+
+
 def get_company_data(fnr):
     res = requests.get(f"http://127.0.0.1:8000/view/{fnr}")
     if res.status_code != 200:
@@ -39,6 +51,21 @@ def get_company_data(fnr):
     return response_to_data(res)
 
 
+def get_subgraph(key: str, label: str = "Company", **params):
+    """
+    Call the FastAPI /subgraph endpoint: {"nodes": [...], "edges": [...]}
+    params: depth, limit, fanout, labels
+    """
+    url = f"http://127.0.0.1:8000/subgraph/{key}"
+    try:
+        res = requests.get(url, params={"label": label, **params}, timeout=15)
+        res.raise_for_status()
+        return response_to_data(res)
+    except Exception as e:
+        print(f"API error (get_subgraph): {e}")
+        return {"nodes": [], "edges": []}
+
+
 def get_node_neighbours(key: str, label: str = "Company"):
     """
     Call the FastAPI /node endpoint and return its raw JSON.